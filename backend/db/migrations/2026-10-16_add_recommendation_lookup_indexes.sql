@@ -0,0 +1,17 @@
+-- Migration: partial indexes for the recommendation API feature lookups
+-- The ML API resolves the target year and fetches features per
+-- (barangay_id, season, year) on approved rows only, and averages approved
+-- prices per (barangay_id, year, month). These indexes let those predicates
+-- use index scans instead of scanning the whole tables.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS barangay_yields_approved_lookup_idx
+  ON barangay_yields (barangay_id, season, year)
+  WHERE status = 'approved';
+
+CREATE INDEX IF NOT EXISTS barangay_crop_prices_approved_lookup_idx
+  ON barangay_crop_prices (barangay_id, year, month)
+  WHERE status = 'approved';
+
+COMMIT;
@@ -160,7 +160,8 @@ const callRecommendationApi = async ({ barangayId, season, year, topK = 3 }) =>
   try {
     const response = await fetch(ML_API_URL, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      // Lets the ML API drop the request instead of computing it after we have given up.
+      headers: { "Content-Type": "application/json", "X-Deadline-Ms": String(ML_API_TIMEOUT_MS) },
       body: JSON.stringify({
         barangay_id: barangayId,
         season,
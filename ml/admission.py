@@ -0,0 +1,283 @@
+"""Admission control and request deadlines for the recommendation API.
+
+The Node backend gives up on a recommendation after ``ML_API_TIMEOUT_MS``, but
+Flask keeps computing the abandoned request. Under overload the abandoned work
+piles up, every request waits behind it and they all time out. This module
+bounds that work:
+
+* :class:`AdmissionController` lets at most ``max_concurrent`` requests run
+  the expensive part of a request (feature fetch and inference) at once.
+  Up to ``max_queue`` more wait in FIFO order for at most ``queue_timeout``
+  seconds: a freed slot is handed straight to the oldest waiter, and new
+  arrivals only skip the queue when it is empty. Anything beyond that is refused at once with
+  :class:`AdmissionRejected`, which the API turns into ``503`` plus the
+  ``Retry-After`` estimate from :meth:`AdmissionController.retry_after`.
+* Clients send the time they are willing to wait in the ``X-Deadline-Ms``
+  header. :func:`deadline_from_header` turns it into an absolute
+  ``time.perf_counter()`` deadline. Queued requests stop waiting when it
+  passes, and :func:`check_deadline` raises :class:`DeadlineExceeded` when
+  it is too late to start the next stage.
+
+Settings are read from ``ML_ADMISSION_*`` environment variables by
+:meth:`AdmissionSettings.from_env`. :class:`AsyncAdmissionController` applies
+the same limits, queue order and counters to coroutines on one event loop
+(``async_api.py``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Deque, Dict, Optional
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when the queue is full or a queued request waited too long for a slot."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when the client's deadline passed before a stage could start."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def deadline_from_header(raw: Optional[str], started: float) -> Optional[float]:
+    """Absolute ``perf_counter`` deadline for a request that arrived at ``started``.
+
+    ``raw`` is the client's remaining budget in milliseconds. A relative value
+    is used so that clock skew between hosts does not matter. Missing,
+    unparsable or negative values mean no deadline.
+    """
+
+    if raw is None:
+        return None
+    try:
+        budget_ms = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(budget_ms) or budget_ms < 0:
+        return None
+    return started + budget_ms / 1000.0
+
+
+def check_deadline(deadline: Optional[float], stage: str) -> None:
+    """Raise :class:`DeadlineExceeded` when ``deadline`` has passed before ``stage``."""
+
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise DeadlineExceeded(f"deadline passed before {stage}")
+
+
+@dataclass(frozen=True)
+class AdmissionSettings:
+    """Concurrency and queue limits for :class:`AdmissionController`."""
+
+    max_concurrent: int = 8
+    max_queue: int = 32
+    queue_timeout: float = 2.0
+
+    def __post_init__(self) -> None:
+        if self.max_concurrent < 0:
+            raise ValueError("max_concurrent must not be negative")
+        if self.max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionSettings":
+        defaults = cls()
+        return cls(
+            max_concurrent=max(0, _env_int("ML_ADMISSION_MAX_CONCURRENT", defaults.max_concurrent)),
+            max_queue=max(0, _env_int("ML_ADMISSION_MAX_QUEUE", defaults.max_queue)),
+            queue_timeout=max(0.0, _env_float("ML_ADMISSION_QUEUE_TIMEOUT", defaults.queue_timeout)),
+        )
+
+
+class _Waiter:
+    """A queued request; ``granted`` is set by the release that hands it a slot."""
+
+    __slots__ = ("cond", "granted")
+
+    def __init__(self, lock: Lock) -> None:
+        self.cond = Condition(lock)
+        self.granted = False
+
+
+class _AdmissionState:
+    """Slots, queue, counters and hold-time estimate shared by both controllers."""
+
+    # Weight of the newest sample in the moving average of slot hold times.
+    HOLD_TIME_ALPHA = 0.2
+
+    def __init__(self, settings: Optional[AdmissionSettings] = None) -> None:
+        self.settings = settings or AdmissionSettings()
+        self._lock = Lock()
+        self._active = 0
+        self._queue: Deque = deque()
+        self._hold_seconds = 0.0
+        self._counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "deadline_expired": 0,
+        }
+
+    def _admit_now(self, deadline: Optional[float]) -> bool:
+        """Check a new arrival; true when it takes a free slot, false when it must queue.
+
+        Raises like ``acquire`` when the deadline has passed or the queue is full.
+        """
+
+        settings = self.settings
+        if deadline is not None and time.perf_counter() >= deadline:
+            self._counters["deadline_expired"] += 1
+            raise DeadlineExceeded("deadline passed before admission")
+        if not settings.enabled or (self._active < settings.max_concurrent and not self._queue):
+            self._active += 1
+            return True
+        if len(self._queue) >= settings.max_queue:
+            self._counters["rejected_queue_full"] += 1
+            raise AdmissionRejected(f"{self._active} requests running and {len(self._queue)} queued")
+        self._counters["queued"] += 1
+        return False
+
+    def _queue_limit(self, deadline: Optional[float]) -> float:
+        limit = time.perf_counter() + self.settings.queue_timeout
+        return limit if deadline is None else min(limit, deadline)
+
+    def _give_up(self, limit: float, deadline: Optional[float]) -> Exception:
+        """Exception for a waiter whose ``limit`` passed; count it as a deadline or queue timeout."""
+
+        if deadline is not None and limit >= deadline:
+            self._counters["deadline_expired"] += 1
+            return DeadlineExceeded("deadline passed while queued")
+        self._counters["rejected_queue_timeout"] += 1
+        return AdmissionRejected(f"no slot freed up within {self.settings.queue_timeout:g}s")
+
+    def _record_hold(self, acquired_at: float) -> None:
+        held = time.perf_counter() - acquired_at
+        alpha = self.HOLD_TIME_ALPHA
+        self._hold_seconds = held if self._hold_seconds == 0 else (1 - alpha) * self._hold_seconds + alpha * held
+
+    def _admitted(self) -> float:
+        self._counters["admitted"] += 1
+        return time.perf_counter()
+
+    def _retry_after(self) -> int:
+        # Time for the running and queued requests to drain, as whole seconds in [1, 30].
+        slots = max(1, self.settings.max_concurrent)
+        estimate = self._hold_seconds * (self._active + len(self._queue)) / slots
+        return int(min(30, max(1, math.ceil(estimate))))
+
+    def retry_after(self) -> int:
+        with self._lock:
+            return self._retry_after()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_concurrent": self.settings.max_concurrent,
+                "max_queue": self.settings.max_queue,
+                "queue_timeout": self.settings.queue_timeout,
+                "active": self._active,
+                "waiting": len(self._queue),
+                "avg_hold_seconds": round(self._hold_seconds, 6),
+                **self._counters,
+            }
+
+
+class AdmissionController(_AdmissionState):
+    """Counting limiter with a bounded FIFO queue; ``max_concurrent=0`` admits everything."""
+
+    def acquire(self, deadline: Optional[float] = None) -> float:
+        """Take a slot, waiting in the queue if needed; returns the acquisition time.
+
+        Raises :class:`AdmissionRejected` when the queue is full or no slot
+        frees up within ``queue_timeout``, and :class:`DeadlineExceeded` when
+        ``deadline`` passes first.
+        """
+
+        with self._lock:
+            if self._admit_now(deadline):
+                return self._admitted()
+            waiter = _Waiter(self._lock)
+            self._queue.append(waiter)
+            limit = self._queue_limit(deadline)
+            while not waiter.granted:
+                remaining = limit - time.perf_counter()
+                if remaining <= 0:
+                    self._queue.remove(waiter)
+                    raise self._give_up(limit, deadline)
+                waiter.cond.wait(remaining)
+            # release() handed this waiter its slot without decrementing _active.
+            return self._admitted()
+
+    def release(self, acquired_at: float) -> None:
+        with self._lock:
+            self._record_hold(acquired_at)
+            if self._queue:
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                waiter.cond.notify()
+            else:
+                self._active -= 1
+
+
+class AsyncAdmissionController(_AdmissionState):
+    """:class:`AdmissionController` for coroutines; every call must come from the same event loop."""
+
+    async def acquire(self, deadline: Optional[float] = None) -> float:
+        """Take a slot, waiting in the queue if needed; raises like :meth:`AdmissionController.acquire`."""
+
+        if self._admit_now(deadline):
+            return self._admitted()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.append(waiter)
+        limit = self._queue_limit(deadline)
+        try:
+            # asyncio.wait never cancels ``waiter``, and unlike wait_for it does not
+            # swallow a cancellation that arrives as the slot is granted.
+            await asyncio.wait((waiter,), timeout=max(0.0, limit - time.perf_counter()))
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._hand_over()  # granted just before the caller went away
+            else:
+                self._queue.remove(waiter)
+            raise
+        if not waiter.done():
+            self._queue.remove(waiter)
+            raise self._give_up(limit, deadline)
+        # release() handed this waiter its slot without decrementing _active.
+        return self._admitted()
+
+    def release(self, acquired_at: float) -> None:
+        self._record_hold(acquired_at)
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        if self._queue:
+            self._queue.popleft().set_result(None)
+        else:
+            self._active -= 1
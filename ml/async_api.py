@@ -0,0 +1,465 @@
+"""asyncio serving mode for the recommendation API (aiohttp + asyncpg).
+
+Serves ``POST /recommend``, ``GET /health`` and ``GET /cache/stats`` like
+the Flask app in ``recommendation_api.py`` (payload, response body,
+``fields`` / ``include_metadata``, ETag/304, gzip, response cache, snapshots
+and cache-miss coalescing), but one process keeps many requests in flight:
+
+* Feature rows are fetched with asyncpg, so a slow query parks its coroutine
+  instead of a worker thread. asyncpg prepares and caches the statement per
+  connection, like the Flask path's ``PREPARE``/``EXECUTE``.
+* Feature engineering and ``predict_proba`` run on a bounded thread pool
+  (``ML_ASYNC_INFERENCE_WORKERS``); NumPy releases the GIL for most of the
+  forest evaluation, and the event loop never runs CPU-bound work itself.
+* Occasional blocking helpers shared with the Flask app (model loading,
+  snapshot re-validation, the data watermark) run on the loop's default
+  executor.
+* The feature fetch and inference are admitted by an
+  :class:`~admission.AsyncAdmissionController` with the Flask app's
+  ``ML_ADMISSION_*`` limits (``503`` plus ``Retry-After`` when the queue is
+  full), and ``X-Deadline-Ms`` is checked before each of them (``504``).
+* A ``model`` field or ``X-Model-Version`` header pins a non-production
+  version from the model registry, as in the Flask app: pinned requests skip
+  the response cache and snapshots, and live production results are shadow
+  scored against ``ML_SHADOW_MODEL``.
+* Identical cache misses are coalesced by an
+  :class:`~singleflight.AsyncSingleFlight` keyed like the Flask app's
+  ``_coalesced``, so only the first runs the query and the model.
+
+Not served here, only by the Flask app: ``/metrics``, ``/recommend/batch``,
+``/recommend/map``, ``/model``, ``/models``, ``/admin/reload`` and
+``/admin/shadow``. ``/health`` reports this server's own pools and limits and
+has no ``startup`` report.
+
+Run with::
+
+    $ python async_api.py --port 5001
+
+Requires the optional ``aiohttp`` and ``asyncpg`` packages.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import asyncpg
+    from aiohttp import web
+except ImportError as exc:  # pragma: no cover - optional dependency
+    raise ImportError("async_api.py requires the 'aiohttp' and 'asyncpg' packages") from exc
+
+from admission import (
+    DEADLINE_HEADER,
+    AdmissionRejected,
+    AdmissionSettings,
+    AsyncAdmissionController,
+    DeadlineExceeded,
+    check_deadline,
+    deadline_from_header,
+)
+from recommendation_api import (
+    FEATURE_LOOKUPS_TOTAL,
+    FEATURE_QUERY,
+    FEATURE_STORE,
+    MODEL_REGISTRY,
+    MODEL_STORE,
+    MODEL_VERSION_HEADER,
+    RESPONSE_CACHE,
+    SEASON_DB_LABELS,
+    SEASON_MONTHS,
+    _attach_feature_metrics,
+    _data_watermark,
+    _db_config,
+    _encode_body,
+    _etag_for,
+    _feature_store_ready,
+    _is_production,
+    _model_version,
+    _parse_recommend_payload,
+    _parse_response_options,
+    _prepare_feature_frame,
+    _recommendation_body,
+    _resolve_model_name,
+    _shape_response,
+    _snapshot_at,
+    _submit_shadow,
+)
+from singleflight import AsyncSingleFlight, SingleFlightTimeout
+from train_model import generate_recommendations
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+INFERENCE_WORKERS = int(os.getenv("ML_ASYNC_INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+DB_POOL_MIN = int(os.getenv("ML_ASYNC_DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("ML_ASYNC_DB_POOL_MAX", "20"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("ML_ASYNC_DB_TIMEOUT", "5"))
+
+DB_POOL_KEY = web.AppKey("db_pool", asyncpg.Pool)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+
+ADMISSION = AsyncAdmissionController(AdmissionSettings.from_env())
+INFLIGHT = AsyncSingleFlight(timeout=float(os.getenv("ML_COALESCE_TIMEOUT", "10")))
+
+NO_DATA_BODY = {
+    "success": False,
+    "error": "No approved data found for the requested barangay/season/year.",
+}
+
+
+def _error_body(error: str, details: Optional[str] = None) -> Dict[str, object]:
+    body: Dict[str, object] = {"success": False, "error": error}
+    if details is not None:
+        body["details"] = details
+    return body
+
+
+def _error(status: int, error: str, details: Optional[str] = None) -> web.Response:
+    return web.json_response(_error_body(error, details), status=status)
+
+
+def _json_response(request: web.Request, body: object, status: int = 200, etag: Optional[str] = None) -> web.Response:
+    payload, gzipped = _encode_body(body, "gzip" in request.headers.get("Accept-Encoding", ""))
+    response = web.Response(body=payload, status=status, content_type="application/json")
+    if etag:
+        response.headers["ETag"] = f'W/"{etag}"'
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+@web.middleware
+async def _request_context(request: web.Request, handler) -> web.StreamResponse:
+    """Parse ``X-Deadline-Ms`` into ``request["deadline"]``; give every ``503`` a ``Retry-After``."""
+
+    request["deadline"] = deadline_from_header(request.headers.get(DEADLINE_HEADER), time.perf_counter())
+    response = await handler(request)
+    if response.status == 503 and "Retry-After" not in response.headers:
+        response.headers["Retry-After"] = str(ADMISSION.retry_after())
+    return response
+
+
+async def _admitted(
+    deadline: Optional[float], compute: Callable[[], Awaitable[Tuple[Dict[str, object], int]]]
+) -> Tuple[Dict[str, object], int]:
+    """Await ``compute`` holding an :data:`ADMISSION` slot; refusals become ``503``/``504`` bodies."""
+
+    try:
+        acquired_at = await ADMISSION.acquire(deadline)
+    except AdmissionRejected as exc:
+        return {"success": False, "error": "Server overloaded, retry shortly", "details": str(exc)}, 503
+    except DeadlineExceeded as exc:
+        return {"success": False, "error": "Request deadline exceeded", "details": str(exc)}, 504
+    try:
+        return await compute()
+    except DeadlineExceeded as exc:
+        return {"success": False, "error": "Request deadline exceeded", "details": str(exc)}, 504
+    finally:
+        ADMISSION.release(acquired_at)
+
+
+async def _coalesced(
+    key: Hashable, compute: Callable[[], Awaitable[Tuple[Dict[str, object], int]]], deadline: Optional[float]
+) -> Tuple[Tuple[Dict[str, object], int], bool]:
+    """``INFLIGHT.do(key, compute)``, but a follower waits no longer than its own ``deadline``.
+
+    A follower whose deadline passes first gets the ``504`` body of
+    :func:`_admitted`; one that gives up earlier still raises
+    :class:`SingleFlightTimeout`.
+    """
+
+    timeout = INFLIGHT.timeout
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.perf_counter())
+    try:
+        return await INFLIGHT.do(key, compute, timeout=timeout)
+    except SingleFlightTimeout:
+        if deadline is None or time.perf_counter() < deadline:
+            raise
+    body = _error_body(
+        "Request deadline exceeded", "deadline passed while waiting for an identical in-flight request"
+    )
+    return (body, 504), False
+
+
+def _etag_matches(request: web.Request, etag: Optional[str]) -> bool:
+    if not etag:
+        return False
+    return any(candidate.value in (etag, "*") for candidate in request.if_none_match or ())
+
+
+async def _fetch_feature_frame(pool: asyncpg.Pool, barangay_id: int, season: str, year: int) -> pd.DataFrame:
+    # A loaded feature store answers in microseconds, so it is read on the loop.
+    if FEATURE_STORE.ready:
+        FEATURE_LOOKUPS_TOTAL.inc(source="store")
+        return FEATURE_STORE.frame([(barangay_id, season, year)])
+    FEATURE_LOOKUPS_TOTAL.inc(source="database")
+    async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as conn:
+        rows = await conn.fetch(FEATURE_QUERY, barangay_id, SEASON_DB_LABELS[season], SEASON_MONTHS[season], year)
+    if not rows:
+        return pd.DataFrame()
+    # coerce_float turns NUMERIC (Decimal) columns into floats, as pd.read_sql_query does.
+    return pd.DataFrame.from_records([tuple(row) for row in rows], columns=list(rows[0].keys()), coerce_float=True)
+
+
+def _artifact_for(model_path):
+    """Production artifacts, or those of the pinned ``model_path`` from the registry; blocks on a load."""
+
+    return MODEL_STORE.get() if _is_production(model_path) else MODEL_REGISTRY.get(model_path)
+
+
+def _score(
+    artifact,
+    feature_frame: pd.DataFrame,
+    barangay_id: int,
+    season: str,
+    year: int,
+    top_k: int,
+    shadow: bool = True,
+) -> List[Dict[str, object]]:
+    """CPU-bound part of a live request; runs on the inference pool."""
+
+    engineered = _prepare_feature_frame(feature_frame, barangay_id, season, year)
+    if engineered.empty:
+        raise ValueError("Prepared feature frame is empty after preprocessing.")
+    predict_started = time.perf_counter()
+    recommendations = generate_recommendations(artifact.predictor, engineered, artifact.feature_columns, top_k=top_k)
+    predict_seconds = time.perf_counter() - predict_started
+    enriched = _attach_feature_metrics(recommendations, engineered)
+    if shadow:
+        _submit_shadow(artifact.model_path, engineered, recommendations, predict_seconds, top_k)
+    return enriched
+
+
+async def _compute_live(
+    app: web.Application,
+    artifact,
+    barangay_id: int,
+    season: str,
+    year: int,
+    top_k: int,
+    cache_version,
+    deadline: Optional[float],
+    pinned: bool = False,
+) -> Tuple[Dict[str, object], int]:
+    """Fetch, score and cache one key; ``(body, status)`` for success and failures alike.
+
+    Raises :class:`DeadlineExceeded` instead of fetching or predicting past ``deadline``.
+    ``pinned`` results (a non-production version) skip the response cache and
+    shadow scoring.
+    """
+
+    cache_key = (barangay_id, season, year, top_k)
+    check_deadline(deadline, "fetching features")
+    try:
+        feature_frame = await _fetch_feature_frame(app[DB_POOL_KEY], barangay_id, season, year)
+    except asyncio.TimeoutError as exc:
+        LOGGER.warning("Database pool exhausted: %s", exc)
+        return _error_body("Database connections exhausted, retry shortly", str(exc) or "acquire timed out"), 503
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to fetch features for barangay=%s season=%s year=%s", barangay_id, season, year)
+        return _error_body("Failed to fetch reference data", str(exc)), 500
+
+    if feature_frame.empty:
+        if not pinned:
+            RESPONSE_CACHE.put(cache_key, cache_version, (NO_DATA_BODY, 404))
+        return NO_DATA_BODY, 404
+
+    check_deadline(deadline, "inference")
+    try:
+        predictions = await asyncio.get_running_loop().run_in_executor(
+            app[EXECUTOR_KEY], _score, artifact, feature_frame, barangay_id, season, year, top_k, not pinned
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to generate recommendations")
+        return _error_body("Model inference failed", str(exc)), 500
+
+    body = _recommendation_body(
+        artifact.model_path, artifact.loaded_at, artifact.metadata, barangay_id, season, year, predictions, "live"
+    )
+    if not pinned:
+        RESPONSE_CACHE.put(cache_key, cache_version, (body, 200))
+    return body, 200
+
+
+async def recommend(request: web.Request) -> web.Response:
+    loop = asyncio.get_running_loop()
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+
+    try:
+        barangay_id, season, year, top_k = _parse_recommend_payload(payload)
+        fields, include_metadata = _parse_response_options(payload, request.query)
+        requested_model = payload.get("model") or request.headers.get(MODEL_VERSION_HEADER)
+        requested_path = None
+        if requested_model:
+            requested_path = await loop.run_in_executor(None, _resolve_model_name, requested_model)
+    except (TypeError, ValueError) as exc:
+        return _error(400, "Invalid request payload", str(exc))
+
+    try:
+        if requested_path is None and MODEL_STORE.current is not None:
+            artifact = MODEL_STORE.current
+        else:
+            artifact = await loop.run_in_executor(None, _artifact_for, requested_path)
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to load model artifacts")
+        return _error(500, "Model artifacts unavailable", str(exc))
+
+    # The watermark is part of the cache version, so a cached body always matches its ETag.
+    cache_key = (barangay_id, season, year, top_k)
+    watermark = await loop.run_in_executor(None, _data_watermark)
+    cache_version = (_model_version(artifact.model_path, artifact.loaded_at), watermark)
+    etag = _etag_for(*cache_version, cache_key, fields, include_metadata)
+    if _etag_matches(request, etag):
+        return web.Response(status=304, headers={"ETag": f'W/"{etag}"'})
+
+    deadline = request["deadline"]
+    if not _is_production(artifact.model_path):
+        # The response cache and snapshots only hold production results.
+        body, status = await _admitted(
+            deadline,
+            lambda: _compute_live(
+                request.app, artifact, barangay_id, season, year, top_k, cache_version, deadline, pinned=True
+            ),
+        )
+        if status != 200:
+            return _json_response(request, body, status)
+        return _json_response(request, _shape_response(body, fields, include_metadata), 200, etag)
+
+    cached = RESPONSE_CACHE.get(cache_key, cache_version)
+    if cached is not None:
+        body, status = cached
+        response = _json_response(
+            request,
+            _shape_response(body, fields, include_metadata),
+            status,
+            etag if status == 200 else None,
+        )
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    snapshot = await loop.run_in_executor(None, _snapshot_at, artifact.model_path, watermark)
+    snapshot_predictions = snapshot.lookup(barangay_id, season, year, top_k) if snapshot else None
+    if snapshot_predictions is not None:
+        if not snapshot_predictions:
+            return _json_response(request, NO_DATA_BODY, 404)
+        body = _recommendation_body(
+            artifact.model_path,
+            artifact.loaded_at,
+            artifact.metadata,
+            barangay_id,
+            season,
+            year,
+            snapshot_predictions,
+            "snapshot",
+        )
+        return _json_response(request, _shape_response(body, fields, include_metadata), 200, etag)
+
+    def compute():
+        return _admitted(
+            deadline,
+            lambda: _compute_live(request.app, artifact, barangay_id, season, year, top_k, cache_version, deadline),
+        )
+
+    try:
+        (body, status), shared = await _coalesced((cache_version, cache_key), compute, deadline)
+    except SingleFlightTimeout as exc:
+        LOGGER.warning("Gave up waiting for a coalesced request: %s", exc)
+        response = _error(503, "Timed out waiting for an identical in-flight request", str(exc))
+        response.headers["Retry-After"] = "1"
+        return response
+
+    if shared and status == 504 and (deadline is None or time.perf_counter() < deadline):
+        # The request we waited on ran out of time; ours has not, so do the work ourselves.
+        body, status = await compute()
+    if status != 200:
+        return _json_response(request, body, status)
+    return _json_response(request, _shape_response(body, fields, include_metadata), 200, etag)
+
+
+async def cache_stats(request: web.Request) -> web.Response:
+    payload = {"success": True, "response_cache": RESPONSE_CACHE.stats(), "coalescing": INFLIGHT.stats()}
+    return web.json_response(payload)
+
+
+async def health(request: web.Request) -> web.Response:
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, MODEL_STORE.get)
+        status = 200
+        payload = {"success": True, "message": "ready"}
+    except Exception as exc:  # pylint: disable=broad-except
+        status = 503
+        payload = {"success": False, "message": str(exc)}
+
+    pool = request.app[DB_POOL_KEY]
+    payload["db_pool"] = {
+        "size": pool.get_size(),
+        "idle": pool.get_idle_size(),
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+    }
+    payload["model_store"] = MODEL_STORE.stats()
+    payload["feature_store"] = FEATURE_STORE.stats()
+    payload["admission"] = ADMISSION.stats()
+    return web.json_response(payload, status=status)
+
+
+async def _on_startup(app: web.Application) -> None:
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    db_config = _db_config()
+    app[DB_POOL_KEY] = await asyncpg.create_pool(
+        host=db_config["host"],
+        port=int(db_config["port"]),
+        database=db_config["database"],
+        user=db_config["user"],
+        password=db_config["password"],
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+    )
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, MODEL_STORE.get)
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Model not loaded at startup; /recommend will retry", exc_info=True)
+    await asyncio.get_running_loop().run_in_executor(None, _feature_store_ready)
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    await app[DB_POOL_KEY].close()
+    app[EXECUTOR_KEY].shutdown(wait=False)
+
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[_request_context])
+    app.router.add_post("/recommend", recommend)
+    app.router.add_get("/health", health)
+    app.router.add_get("/cache/stats", cache_stats)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve crop recommendations with aiohttp/asyncpg.")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Benchmark per-request feature fetch time for the recommendation API.
+
+Compares the original serving data access (up to two ``MAX(year)`` lookups
+followed by the feature CTE, with ``LOWER(season)`` predicates and a fresh
+parse/plan per query) against the current single-statement, server-side
+prepared path in ``recommendation_api._fetch_feature_frame``. Both run over
+the same pooled-style autocommit connection, so the numbers isolate query
+shape and round trips rather than connection setup.
+
+Examples
+--------
+    $ python bench_feature_fetch.py --requests 500
+    $ python bench_feature_fetch.py --requests 200 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from recommendation_api import _fetch_feature_frame
+from train_model import get_connection, resolve_db_config
+
+
+def legacy_determine_target_year(conn, barangay_id: int, season: str, year: int) -> Optional[int]:
+    query = """
+        SELECT MAX(year) AS latest_year
+        FROM barangay_yields
+        WHERE status = 'approved'
+          AND barangay_id = %s
+          AND LOWER(season) = LOWER(%s)
+          AND year <= %s
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(query, (barangay_id, season, year))
+        row = cursor.fetchone()
+        latest_year = row[0] if row else None
+
+    if latest_year is None:
+        fallback_query = """
+            SELECT MAX(year) AS latest_year
+            FROM barangay_yields
+            WHERE status = 'approved'
+              AND barangay_id = %s
+              AND LOWER(season) = LOWER(%s)
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(fallback_query, (barangay_id, season))
+            row = cursor.fetchone()
+            latest_year = row[0] if row else None
+
+    return latest_year
+
+
+def legacy_fetch_feature_frame(conn, barangay_id: int, season: str, year: int) -> pd.DataFrame:
+    target_year = legacy_determine_target_year(conn, barangay_id, season, year)
+    if target_year is None:
+        return pd.DataFrame()
+
+    query = """
+        WITH price_lookup AS (
+            SELECT
+                p.barangay_id,
+                p.crop_id,
+                p.year,
+                AVG(p.price_per_kg) AS avg_price_per_kg
+            FROM barangay_crop_prices p
+            WHERE p.status = 'approved'
+              AND p.barangay_id = %s
+              AND ((%s = 'wet' AND p.month BETWEEN 6 AND 11)
+                   OR (%s = 'dry' AND (p.month = 12 OR p.month BETWEEN 1 AND 5)))
+            GROUP BY p.barangay_id, p.crop_id, p.year
+        ), ranked_records AS (
+            SELECT
+                y.barangay_id,
+                COALESCE(b.adm3_en, CONCAT('Barangay ', y.barangay_id)) AS barangay_name,
+                y.crop_id,
+                COALESCE(c.crop_name, CONCAT('Crop ', y.crop_id)) AS crop_name,
+                y.year,
+                LOWER(y.season) AS season,
+                y.total_yield,
+                y.total_area_planted_ha,
+                y.yield_per_hectare,
+                COALESCE(pl.avg_price_per_kg, 0) AS avg_price_per_kg,
+                ROW_NUMBER() OVER (
+                    PARTITION BY y.crop_id
+                    ORDER BY y.year DESC
+                ) AS row_rank
+            FROM barangay_yields y
+            LEFT JOIN barangays b USING (barangay_id)
+            LEFT JOIN crops c USING (crop_id)
+            LEFT JOIN price_lookup pl
+              ON pl.barangay_id = y.barangay_id
+             AND pl.crop_id = y.crop_id
+             AND pl.year = y.year
+            WHERE y.status = 'approved'
+              AND y.barangay_id = %s
+              AND LOWER(y.season) = LOWER(%s)
+              AND y.year = %s
+        )
+        SELECT
+            barangay_id,
+            barangay_name,
+            crop_id,
+            crop_name,
+            %s AS year,
+            %s AS season,
+            total_yield,
+            total_area_planted_ha,
+            yield_per_hectare,
+            avg_price_per_kg
+        FROM ranked_records
+        WHERE row_rank = 1
+        ORDER BY crop_id
+    """
+
+    params = (barangay_id, season, season, barangay_id, season, target_year, year, season)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark recommendation feature fetch queries.")
+    parser.add_argument("--requests", type=int, default=300, help="Timed requests per variant.")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per variant before measuring.")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the request mix.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON only.")
+    parser.add_argument("--host", type=str, default=None, help="PostgreSQL host override.")
+    parser.add_argument("--port", type=str, default=None, help="PostgreSQL port override.")
+    parser.add_argument("--database", type=str, default=None, help="PostgreSQL database name override.")
+    parser.add_argument("--user", type=str, default=None, help="PostgreSQL user override.")
+    parser.add_argument("--password", type=str, default=None, help="PostgreSQL password override.")
+    return parser.parse_args()
+
+
+def sample_requests(conn, count: int, seed: int) -> List[Tuple[int, str, int]]:
+    """Random mix of in-range and future years so both fallback branches are exercised."""
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT barangay_id, year FROM barangay_yields WHERE status = 'approved'"
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        raise SystemExit("No approved yield records found in the database.")
+
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        barangay_id, year = rng.choice(rows)
+        requests.append((int(barangay_id), rng.choice(("wet", "dry")), int(year) + rng.choice((0, 0, 1))))
+    return requests
+
+
+def time_variant(
+    conn,
+    fetch: Callable[..., pd.DataFrame],
+    requests: List[Tuple[int, str, int]],
+    warmup: int,
+) -> Dict[str, float]:
+    for barangay_id, season, year in requests[:warmup]:
+        fetch(conn, barangay_id, season, year)
+
+    durations = []
+    for barangay_id, season, year in requests:
+        started = time.perf_counter()
+        fetch(conn, barangay_id, season, year)
+        durations.append((time.perf_counter() - started) * 1000)
+
+    durations.sort()
+    return {
+        "requests": len(durations),
+        "mean_ms": round(statistics.fmean(durations), 4),
+        "p50_ms": round(durations[len(durations) // 2], 4),
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 4),
+        "max_ms": round(durations[-1], 4),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+
+    conn = get_connection(resolve_db_config(args))
+    conn.autocommit = True
+    try:
+        requests = sample_requests(conn, args.requests, args.seed)
+
+        mismatches = 0
+        for barangay_id, season, year in requests[: min(50, len(requests))]:
+            before = legacy_fetch_feature_frame(conn, barangay_id, season, year)
+            after = _fetch_feature_frame(conn, barangay_id, season, year)
+            if len(before) != len(after) or (len(before) and not before.equals(after[before.columns])):
+                mismatches += 1
+
+        results = {
+            "legacy_three_round_trips": time_variant(conn, legacy_fetch_feature_frame, requests, args.warmup),
+            "prepared_single_round_trip": time_variant(conn, _fetch_feature_frame, requests, args.warmup),
+            "parity_mismatches": mismatches,
+        }
+    finally:
+        conn.close()
+
+    before = results["legacy_three_round_trips"]["mean_ms"]
+    after = results["prepared_single_round_trip"]["mean_ms"]
+    results["speedup"] = round(before / after, 3) if after else None
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("Feature fetch benchmark")
+    for name in ("legacy_three_round_trips", "prepared_single_round_trip"):
+        stats = results[name]
+        print(
+            f"  {name:<28} mean {stats['mean_ms']:.3f} ms | p50 {stats['p50_ms']:.3f} ms | "
+            f"p95 {stats['p95_ms']:.3f} ms"
+        )
+    print(f"  speedup: {results['speedup']}x | parity mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark top-k recommendation ranking as barangays x crops grow.
+
+Compares the original per-group ranking (``groupby`` over barangay/season,
+``sort_values().head(top_k)`` per group and one dict per row via
+``itertuples``) with the current single-sort ``train_model.top_k_recommendations``
+and its list-of-dicts view. Frames are synthetic, so no database is needed:
+every barangay grows every crop in both seasons of two years, and
+probabilities are multiples of 1/300 like a 300-tree forest's, so ties are
+frequent and the tie-breaking is exercised. Every size is also checked for
+identical output.
+
+Examples
+--------
+    $ python bench_recommendations.py
+    $ python bench_recommendations.py --barangays 100,1000,10000 --crops 10,40 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from train_model import (
+    SEASON_MONTH_TO_LABEL,
+    rank_recommendations,
+    top_k_recommendations,
+)
+
+
+def legacy_rank_recommendations(scored: pd.DataFrame, top_k: int = 3) -> List[Dict[str, object]]:
+    latest_year = int(scored["year"].max())
+    latest = scored[scored["year"] == latest_year]
+
+    recommendations: List[Dict[str, object]] = []
+    for (barangay_id, season), group in latest.groupby(["barangay_id", "season"], observed=True):
+        top_group = group.sort_values(["probability", "expected_revenue"], ascending=False).head(top_k)
+        for rank, row in enumerate(top_group.itertuples(index=False), start=1):
+            recommendations.append(
+                {
+                    "barangay_id": int(row.barangay_id),
+                    "barangay_name": row.barangay_name,
+                    "season": SEASON_MONTH_TO_LABEL.get(row.season, row.season.title()),
+                    "crop_id": int(row.crop_id),
+                    "crop_name": row.crop_name,
+                    "year": int(row.year),
+                    "probability": float(row.probability),
+                    "expected_revenue": float(row.expected_revenue),
+                    "rank": rank,
+                }
+            )
+
+    return recommendations
+
+
+def synthetic_scored_frame(barangays: int, crops: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    barangay_ids, crop_ids, seasons, years = (
+        grid.ravel()
+        for grid in np.meshgrid(
+            np.arange(1, barangays + 1),
+            np.arange(1, crops + 1),
+            np.array(["dry", "wet"], dtype=object),
+            np.array([2025, 2026]),
+            indexing="ij",
+        )
+    )
+    rows = len(barangay_ids)
+    # Shuffle so groups are interleaved, as rows from a join would be.
+    order = rng.permutation(rows)
+    return pd.DataFrame(
+        {
+            "barangay_id": barangay_ids[order],
+            "barangay_name": np.array([f"Barangay {i}" for i in range(barangays + 1)], dtype=object)[barangay_ids[order]],
+            "season": seasons[order],
+            "crop_id": crop_ids[order],
+            "crop_name": np.array([f"Crop {i}" for i in range(crops + 1)], dtype=object)[crop_ids[order]],
+            "year": years[order],
+            "probability": rng.integers(0, 301, rows) / 300,
+            "expected_revenue": np.round(rng.gamma(2.0, 4000.0, rows), 0),
+        }
+    )
+
+
+def time_call(function: Callable[[], object], repeat: int) -> float:
+    function()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(durations), 3)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark top-k recommendation ranking.")
+    parser.add_argument("--barangays", type=str, default="30,300,3000", help="Comma-separated barangay counts.")
+    parser.add_argument("--crops", type=str, default="10,40", help="Comma-separated crop counts.")
+    parser.add_argument("--top-k", type=int, default=3, help="Recommendations per barangay and season.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per variant (median is reported).")
+    parser.add_argument("--legacy-max-groups", type=int, default=20000, help="Skip the legacy loop above this many groups.")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the synthetic frames.")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON only.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    for barangays in (int(value) for value in args.barangays.split(",") if value.strip()):
+        for crops in (int(value) for value in args.crops.split(",") if value.strip()):
+            scored = synthetic_scored_frame(barangays, crops, args.seed)
+            groups = barangays * 2
+            row = {
+                "barangays": barangays,
+                "crops": crops,
+                "rows": int(len(scored)),
+                "vectorized_ms": time_call(lambda: top_k_recommendations(scored, args.top_k), args.repeat),
+                "vectorized_records_ms": time_call(lambda: rank_recommendations(scored, args.top_k), args.repeat),
+                "legacy_ms": None,
+                "speedup": None,
+                "parity": None,
+            }
+            if groups <= args.legacy_max_groups:
+                legacy = legacy_rank_recommendations(scored, args.top_k)
+                row["parity"] = legacy == rank_recommendations(scored, args.top_k)
+                row["legacy_ms"] = time_call(lambda: legacy_rank_recommendations(scored, args.top_k), max(1, args.repeat // 2))
+                row["speedup"] = round(row["legacy_ms"] / row["vectorized_records_ms"], 1)
+            results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("Top-k recommendation benchmark (median ms, top_k={})".format(args.top_k))
+    print("{:>10} {:>6} {:>9} {:>11} {:>13} {:>11} {:>8} {:>7}".format(
+        "barangays", "crops", "rows", "columnar", "list_of_dicts", "legacy", "speedup", "parity"
+    ))
+    for row in results:
+        print("{:>10} {:>6} {:>9} {:>11.2f} {:>13.2f} {:>11} {:>8} {:>7}".format(
+            row["barangays"],
+            row["crops"],
+            row["rows"],
+            row["vectorized_ms"],
+            row["vectorized_records_ms"],
+            "-" if row["legacy_ms"] is None else f"{row['legacy_ms']:.2f}",
+            "-" if row["speedup"] is None else f"{row['speedup']}x",
+            "-" if row["parity"] is None else str(row["parity"]),
+        ))
+
+
+if __name__ == "__main__":
+    main()
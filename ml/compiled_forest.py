@@ -0,0 +1,401 @@
+"""Pandas-free inference for the persisted Random Forest recommendation pipeline.
+
+``train_model.build_pipeline`` produces ``ColumnTransformer(OneHotEncoder +
+passthrough) -> RandomForestClassifier``. For the handful of rows a single
+request scores, ``pipeline.predict_proba`` spends most of its time in pandas
+column selection, transformer dispatch and joblib thread start-up rather than
+in the trees themselves.
+
+:class:`CompiledForest` flattens a fitted pipeline into plain NumPy arrays:
+
+* one ``{category: column}`` map per one-hot encoded input plus the list of
+  passthrough columns, which together rebuild the encoded feature matrix;
+* per-node ``feature``/``threshold``/``left``/``right`` arrays for all trees
+  concatenated, with leaves turned into self-loops, and the normalized class
+  distribution of every node.
+
+Prediction walks every tree for every row at once, one tree level per step,
+and averages the leaf distributions in estimator order. Inputs are cast to
+float32 before the threshold comparisons exactly as scikit-learn does, so the
+probabilities match ``pipeline.predict_proba``; :func:`verify_parity` checks
+that on a probe matrix.
+
+:meth:`CompiledForest.save` writes the arrays as ``.npy`` files and
+:meth:`CompiledForest.load` memory-maps them, so forked or independently
+started API workers share one copy of the trees through the page cache.
+
+Run ``python compiled_forest.py [model.joblib]`` to compile a model and report
+parity and per-call latency against the original pipeline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+COMPILED_FORMAT_VERSION = 1
+# Arrays written by CompiledForest.save; ``left``/``right`` are views into ``children``.
+MMAP_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+
+class UnsupportedPipelineError(ValueError):
+    """Raised when a pipeline does not have the shape this compiler understands."""
+
+
+def _is_identity(transformer) -> bool:
+    # Fitted ColumnTransformers store "passthrough" as an identity FunctionTransformer.
+    return type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+
+
+class CompiledForest:
+    """Flat-array Random Forest evaluator with the pipeline's ``predict_proba`` contract."""
+
+    def __init__(
+        self,
+        categorical: Sequence[str],
+        category_maps: Sequence[Dict[object, int]],
+        numeric: Sequence[str],
+        ignore_unknown: Sequence[bool],
+        n_encoded: int,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray,
+        children: Optional[np.ndarray] = None,
+    ) -> None:
+        self.categorical = list(categorical)
+        self.category_maps = list(category_maps)
+        self.numeric = list(numeric)
+        self.ignore_unknown = list(ignore_unknown)
+        self.n_encoded = int(n_encoded)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        # children[2 * node] is the left child, children[2 * node + 1] the right one.
+        self.children = children if children is not None else np.stack([left, right], axis=1).ravel()
+
+    @property
+    def n_trees(self) -> int:
+        return int(len(self.roots))
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.categorical + self.numeric
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompiledForest":
+        """Compile a fitted ``preprocess -> model`` pipeline from ``train_model.build_pipeline``."""
+
+        steps = getattr(pipeline, "named_steps", {})
+        preprocess = steps.get("preprocess")
+        model = steps.get("model")
+        if preprocess is None or model is None or not hasattr(model, "estimators_"):
+            raise UnsupportedPipelineError("Expected a fitted 'preprocess' + forest 'model' pipeline.")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise UnsupportedPipelineError("Multi-output forests are not supported.")
+
+        categorical: List[str] = []
+        category_maps: List[Dict[object, int]] = []
+        ignore_unknown: List[bool] = []
+        numeric: List[str] = []
+        offset = 0
+        numeric_started = False
+
+        for name, transformer, columns in preprocess.transformers_:
+            if transformer == "drop" or (isinstance(columns, (list, tuple)) and not columns):
+                continue
+            if not all(isinstance(column, str) for column in columns):
+                raise UnsupportedPipelineError(f"Transformer '{name}' must select columns by name.")
+
+            if transformer == "passthrough" or _is_identity(transformer):
+                numeric.extend(columns)
+                numeric_started = True
+                continue
+
+            if type(transformer).__name__ != "OneHotEncoder" or numeric_started:
+                raise UnsupportedPipelineError(f"Unsupported transformer '{name}' ({type(transformer).__name__}).")
+            if getattr(transformer, "drop_idx_", None) is not None:
+                raise UnsupportedPipelineError("OneHotEncoder with 'drop' is not supported.")
+            if getattr(transformer, "_infrequent_enabled", False):
+                raise UnsupportedPipelineError("OneHotEncoder infrequent categories are not supported.")
+
+            for column, categories in zip(columns, transformer.categories_):
+                categorical.append(column)
+                category_maps.append({value: offset + index for index, value in enumerate(categories.tolist())})
+                ignore_unknown.append(transformer.handle_unknown != "error")
+                offset += len(categories)
+
+        n_encoded = offset + len(numeric)
+        if n_encoded != model.n_features_in_:
+            raise UnsupportedPipelineError(
+                f"Encoded width {n_encoded} does not match the forest's {model.n_features_in_} features."
+            )
+
+        n_classes = len(model.classes_)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        base = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left).astype(np.intp) + base)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right).astype(np.intp) + base)
+
+            proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+
+            roots.append(base)
+            max_depth = max(max_depth, int(tree.max_depth))
+            base += tree.node_count
+
+        return cls(
+            categorical=categorical,
+            category_maps=category_maps,
+            numeric=numeric,
+            ignore_unknown=ignore_unknown,
+            n_encoded=n_encoded,
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    def save(self, directory: Path, source: Optional[Dict[str, object]] = None) -> Path:
+        """Write the arrays as ``.npy`` files so :meth:`load` can memory-map them.
+
+        ``source`` is stored in ``meta.json`` to tie the files to the artifact
+        they were compiled from. The directory is replaced atomically.
+        """
+
+        directory = Path(directory)
+        staging = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+
+        for name in MMAP_ARRAYS:
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        np.save(staging / "classes.npy", self.classes_)
+        meta = {
+            "format_version": COMPILED_FORMAT_VERSION,
+            "source": source or {},
+            "categorical": self.categorical,
+            "category_maps": [sorted(mapping.items(), key=lambda item: item[1]) for mapping in self.category_maps],
+            "numeric": self.numeric,
+            "ignore_unknown": self.ignore_unknown,
+            "n_encoded": self.n_encoded,
+            "max_depth": self.max_depth,
+        }
+        with (staging / "meta.json").open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+
+        retired = directory.with_name(f"{directory.name}.old{os.getpid()}")
+        if directory.exists():
+            os.replace(directory, retired)
+        os.replace(staging, directory)
+        if retired.exists():
+            shutil.rmtree(retired, ignore_errors=True)
+        return directory
+
+    @staticmethod
+    def read_source(directory: Path) -> Optional[Dict[str, object]]:
+        """Return the ``source`` recorded by :meth:`save`, or ``None`` if unreadable."""
+
+        try:
+            with (Path(directory) / "meta.json").open("r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format_version") != COMPILED_FORMAT_VERSION:
+            return None
+        return meta.get("source", {})
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[str] = "r") -> "CompiledForest":
+        """Load a forest written by :meth:`save`.
+
+        With ``mmap_mode="r"`` the node arrays stay in the page cache and are
+        shared by every process that maps the same files.
+        """
+
+        directory = Path(directory)
+        with (directory / "meta.json").open("r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        if meta.get("format_version") != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest format in {directory}")
+
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in MMAP_ARRAYS}
+        children = arrays["children"]
+        return cls(
+            categorical=meta["categorical"],
+            category_maps=[{value: index for value, index in pairs} for pairs in meta["category_maps"]],
+            numeric=meta["numeric"],
+            ignore_unknown=meta["ignore_unknown"],
+            n_encoded=meta["n_encoded"],
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=children[0::2],
+            right=children[1::2],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            max_depth=meta["max_depth"],
+            classes=np.load(directory / "classes.npy", allow_pickle=False),
+            children=children,
+        )
+
+    def encode(self, X: Mapping[str, Sequence[object]]) -> np.ndarray:
+        """Build the float32 model input matrix from named columns (DataFrame or dict)."""
+
+        first = self.categorical[0] if self.categorical else self.numeric[0]
+        n_rows = len(X[first])
+        encoded = np.zeros((n_rows, self.n_encoded), dtype=np.float64)
+
+        for column, mapping, ignore in zip(self.categorical, self.category_maps, self.ignore_unknown):
+            values = X[column]
+            values = values.tolist() if hasattr(values, "tolist") else list(values)
+            for row, value in enumerate(values):
+                position = mapping.get(value)
+                if position is not None:
+                    encoded[row, position] = 1.0
+                elif not ignore:
+                    raise ValueError(f"Found unknown category {value!r} in column '{column}'.")
+
+        start = self.n_encoded - len(self.numeric)
+        for index, column in enumerate(self.numeric):
+            encoded[:, start + index] = np.asarray(X[column], dtype=np.float64)
+
+        # Trees compare float32 inputs against float64 thresholds, as in sklearn.
+        return encoded.astype(np.float32)
+
+    def predict_proba_encoded(self, encoded: np.ndarray) -> np.ndarray:
+        n_rows = encoded.shape[0]
+        if n_rows == 0:
+            return np.zeros((0, len(self.classes_)))
+
+        flat = np.ascontiguousarray(encoded).ravel()
+        row_offsets = (np.arange(n_rows) * encoded.shape[1])[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_right = ~(flat.take(self.feature.take(nodes) + row_offsets) <= self.threshold.take(nodes))
+            advanced = self.children.take(2 * nodes + go_right)
+            if np.array_equal(advanced, nodes):
+                break
+            nodes = advanced
+
+        # Accumulate tree by tree like RandomForestClassifier.predict_proba.
+        return np.add.reduce(self.value.take(nodes, axis=0), axis=0) / self.n_trees
+
+    def predict_proba(self, X: Mapping[str, Sequence[object]]) -> np.ndarray:
+        return self.predict_proba_encoded(self.encode(X))
+
+    def predict(self, X: Mapping[str, Sequence[object]]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def probe_frame(compiled: CompiledForest, rows: int = 64, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Synthetic inputs that cycle through categories and span each numeric split range."""
+
+    rng = np.random.default_rng(seed)
+    probe: Dict[str, np.ndarray] = {}
+    for column, mapping in zip(compiled.categorical, compiled.category_maps):
+        categories = list(mapping)
+        probe[column] = np.array([categories[(index * 7 + 3) % len(categories)] for index in range(rows)], dtype=object)
+
+    start = compiled.n_encoded - len(compiled.numeric)
+    is_split = np.isfinite(compiled.threshold)
+    for index, column in enumerate(compiled.numeric):
+        splits = compiled.threshold[is_split & (compiled.feature == start + index)]
+        low, high = (float(splits.min()), float(splits.max())) if splits.size else (0.0, 1.0)
+        margin = (high - low) * 0.1 or 1.0
+        probe[column] = rng.uniform(low - margin, high + margin, size=rows)
+    return probe
+
+
+def verify_parity(pipeline, compiled: CompiledForest, X=None) -> float:
+    """Return the largest absolute probability difference against ``pipeline``."""
+
+    import pandas as pd
+
+    frame = pd.DataFrame(X if X is not None else probe_frame(compiled))
+    expected = pipeline.predict_proba(frame[compiled.feature_names])
+    actual = compiled.predict_proba(frame)
+    return float(np.max(np.abs(expected - actual))) if expected.size else 0.0
+
+
+def compile_with_parity(pipeline, tolerance: float = 1e-9) -> CompiledForest:
+    """Compile ``pipeline`` and refuse the result unless it reproduces its probabilities."""
+
+    compiled = CompiledForest.from_pipeline(pipeline)
+    difference = verify_parity(pipeline, compiled)
+    if difference > tolerance:
+        raise UnsupportedPipelineError(f"Compiled forest differs from the pipeline by {difference:.3g}.")
+    return compiled
+
+
+def _time_call(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main() -> None:
+    import joblib
+    import pandas as pd
+
+    from recommendation_api import _find_latest_model
+
+    parser = argparse.ArgumentParser(description="Compile a recommendation model and check parity.")
+    parser.add_argument("model", type=str, nargs="?", default=None, help="Model artifact (default: newest).")
+    parser.add_argument("--rows", type=int, default=8, help="Rows per timed predict_proba call.")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed calls per implementation.")
+    args = parser.parse_args()
+
+    model_path: Optional[object] = args.model or _find_latest_model()
+    if model_path is None:
+        raise SystemExit("No trained model artifacts found in ml/models.")
+
+    pipeline = joblib.load(model_path)
+    compiled = CompiledForest.from_pipeline(pipeline)
+
+    probe = pd.DataFrame(probe_frame(compiled, rows=512))
+    difference = verify_parity(pipeline, compiled, probe)
+    sample = probe.head(args.rows)
+
+    sklearn_ms = _time_call(lambda: pipeline.predict_proba(sample[compiled.feature_names]), args.repeat)
+    compiled_ms = _time_call(lambda: compiled.predict_proba(sample), args.repeat)
+
+    print(f"Model: {model_path}")
+    print(f"Trees: {compiled.n_trees} | nodes: {len(compiled.feature)} | max depth: {compiled.max_depth}")
+    print(f"Max |probability difference| over {len(probe)} probe rows: {difference:.3g}")
+    print(f"predict_proba on {args.rows} rows: sklearn {sklearn_ms:.3f} ms | compiled {compiled_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
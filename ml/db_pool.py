@@ -0,0 +1,358 @@
+"""Bounded, thread-safe PostgreSQL connection pool for the recommendation API.
+
+Opening a psycopg2 connection costs a TCP connect, an auth handshake and a new
+backend process on the server. For the small read-only queries the API runs,
+that setup dominates the request, so the serving layer borrows connections
+from this pool instead of calling ``psycopg2.connect`` per request.
+
+Pool behaviour
+--------------
+* ``min_size`` connections are opened on first use and kept around; the pool
+  never holds more than ``max_size`` physical connections.
+* Checkouts block for at most ``checkout_timeout`` seconds when every
+  connection is busy, then raise :class:`PoolTimeoutError`.
+* Connections are health checked on checkout (closed/broken state, plus a
+  ``SELECT 1`` ping when they have been idle longer than ``ping_after``).
+* Connections are recycled after ``max_uses`` checkouts or when they sat idle
+  longer than ``idle_timeout`` seconds.
+* Wait times, timeouts and connection churn are tracked and exposed through
+  :meth:`ConnectionPool.stats`.
+
+Settings are read from ``ML_DB_POOL_*`` environment variables by
+:meth:`PoolSettings.from_env`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Condition
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Union
+
+import psycopg2
+from psycopg2 import extensions
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Sizing and recycling knobs for :class:`ConnectionPool`."""
+
+    min_size: int = 1
+    max_size: int = 10
+    max_uses: int = 1000
+    idle_timeout: float = 300.0
+    ping_after: float = 30.0
+    checkout_timeout: float = 5.0
+    autocommit: bool = True
+
+    def __post_init__(self) -> None:
+        if self.max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if not 0 <= self.min_size <= self.max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        defaults = cls()
+        max_size = max(1, _env_int("ML_DB_POOL_MAX", defaults.max_size))
+        return cls(
+            min_size=min(max(0, _env_int("ML_DB_POOL_MIN", defaults.min_size)), max_size),
+            max_size=max_size,
+            max_uses=_env_int("ML_DB_POOL_MAX_USES", defaults.max_uses),
+            idle_timeout=_env_float("ML_DB_POOL_IDLE_TIMEOUT", defaults.idle_timeout),
+            ping_after=_env_float("ML_DB_POOL_PING_AFTER", defaults.ping_after),
+            checkout_timeout=_env_float("ML_DB_POOL_TIMEOUT", defaults.checkout_timeout),
+        )
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used_at", "uses")
+
+    def __init__(self, conn) -> None:
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.uses = 0
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections built from a DB config dict.
+
+    Connections are opened lazily, so constructing the pool never touches the
+    database. ``config`` may also be a callable returning the dict; it is then
+    resolved when the first connection is opened. Use :meth:`connection` as a
+    context manager to borrow one.
+    """
+
+    def __init__(
+        self,
+        config: Union[Dict[str, str], Callable[[], Dict[str, str]]],
+        settings: Optional[PoolSettings] = None,
+        connect: Callable[..., object] = psycopg2.connect,
+    ) -> None:
+        self._config = config if callable(config) else dict(config)
+        self._settings = settings or PoolSettings()
+        self._connect = connect
+        self._cond = Condition()
+        self._idle: Deque[_PooledConnection] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._warmed = False
+        self._closed = False
+        self._inherited: List[object] = []
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "opened": 0,
+            "closed": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def settings(self) -> PoolSettings:
+        return self._settings
+
+    # -- public API -----------------------------------------------------
+
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        """Borrow a healthy connection for the duration of the ``with`` block."""
+
+        record = self._checkout()
+        broken = False
+        try:
+            yield record.conn
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            broken = True
+            raise
+        finally:
+            self._checkin(record, broken=broken)
+
+    def stats(self) -> Dict[str, object]:
+        """Return a snapshot of pool occupancy and wait metrics."""
+
+        with self._cond:
+            checkouts = self._counters["checkouts"]
+            return {
+                "min_size": self._settings.min_size,
+                "max_size": self._settings.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                **self._counters,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / checkouts, 6) if checkouts else 0.0,
+            }
+
+    def close(self) -> None:
+        """Close idle connections and refuse further checkouts."""
+
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for record in idle:
+            self._close_quietly(record)
+
+    def forget_inherited(self) -> None:
+        """Drop connections inherited through ``fork()`` without closing them.
+
+        A forked worker shares the parent's sockets, so closing them (or letting
+        them be garbage collected) would end the parent's sessions. They are
+        parked for the life of the process and the worker opens its own.
+        """
+
+        with self._cond:
+            self._inherited.extend(record.conn for record in self._idle)
+            self._idle.clear()
+            self._size = 0
+            self._in_use = 0
+            self._warmed = False
+
+    # -- internals ------------------------------------------------------
+
+    def _open(self) -> _PooledConnection:
+        if callable(self._config):
+            self._config = dict(self._config())
+        conn = self._connect(**self._config)
+        if self._settings.autocommit:
+            # The API only reads; autocommit skips the extra BEGIN round trip
+            # psycopg2 would otherwise issue and leaves nothing to roll back.
+            conn.autocommit = True
+        with self._cond:
+            self._counters["opened"] += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, record: _PooledConnection) -> None:
+        try:
+            record.conn.close()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.debug("Ignoring error while closing pooled connection", exc_info=True)
+        with self._cond:
+            self._counters["closed"] += 1
+
+    def _warm(self) -> None:
+        """Open ``min_size`` connections the first time the pool is used."""
+
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(0, self._settings.min_size - self._size)
+            self._size += missing
+
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._open())
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.warning("Could not pre-open %s pooled connections", missing, exc_info=True)
+        finally:
+            with self._cond:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                self._cond.notify_all()
+
+    def _is_stale(self, record: _PooledConnection, now: float) -> bool:
+        settings = self._settings
+        if settings.max_uses and record.uses >= settings.max_uses:
+            return True
+        return bool(settings.idle_timeout) and now - record.last_used_at > settings.idle_timeout
+
+    def _is_healthy(self, record: _PooledConnection, now: float) -> bool:
+        conn = record.conn
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if now - record.last_used_at <= self._settings.ping_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            if not conn.autocommit:
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _checkout(self) -> _PooledConnection:
+        if not self._warmed:
+            self._warm()
+
+        started = time.monotonic()
+        deadline = started + self._settings.checkout_timeout
+        waited = False
+        record: Optional[_PooledConnection] = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    record = self._idle.pop()
+                    break
+                if self._size < self._settings.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self._settings.checkout_timeout:.1f}s "
+                        f"(max_size={self._settings.max_size})."
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            wait = time.monotonic() - started
+            self._counters["checkouts"] += 1
+            self._counters["waits"] += int(waited)
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._in_use += 1
+
+        try:
+            record = self._validate(record)
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        record.uses += 1
+        return record
+
+    def _validate(self, record: Optional[_PooledConnection]) -> _PooledConnection:
+        """Return ``record`` if it is reusable, otherwise a freshly opened one."""
+
+        if record is None:
+            return self._open()
+
+        now = time.monotonic()
+        if self._is_stale(record, now):
+            with self._cond:
+                self._counters["recycled"] += 1
+        elif self._is_healthy(record, now):
+            return record
+        else:
+            with self._cond:
+                self._counters["failed_health_checks"] += 1
+
+        self._close_quietly(record)
+        return self._open()
+
+    def _checkin(self, record: _PooledConnection, broken: bool = False) -> None:
+        conn = record.conn
+        reusable = not broken and not conn.closed
+        if reusable and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        record.last_used_at = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if reusable and not self._closed:
+                self._idle.append(record)
+                self._cond.notify()
+                return
+            self._size -= 1
+            self._cond.notify()
+
+        self._close_quietly(record)
@@ -9,13 +9,15 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
 from train_model import (
+    DEFAULT_CACHE_DIR,
     engineer_features,
-    fetch_training_frame,
     get_connection,
+    load_training_frame,
     resolve_db_config,
     determine_year_threshold,
 )
@@ -40,10 +42,12 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Also export the raw joined frame prior to feature engineering.",
     )
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Training frame cache directory.")
+    parser.add_argument("--no-cache", action="store_true", help="Query the database without the training frame cache.")
     return parser.parse_args()
 
 
-def export_dataset(years: int, output_path: Path, include_raw: bool) -> None:
+def export_dataset(years: int, output_path: Path, include_raw: bool, cache_dir: Optional[Path] = DEFAULT_CACHE_DIR) -> None:
     if years < 2:
         raise SystemExit("--years must be at least 2 to produce a meaningful dataset.")
 
@@ -54,7 +58,7 @@ def export_dataset(years: int, output_path: Path, include_raw: bool) -> None:
 
     with get_connection(db_config) as conn:
         min_year = determine_year_threshold(conn, years)
-        raw_df = fetch_training_frame(conn, min_year)
+        raw_df, _ = load_training_frame(conn, min_year, cache_dir)
 
     engineered_df = engineer_features(raw_df).copy()
 
@@ -71,4 +75,9 @@ def export_dataset(years: int, output_path: Path, include_raw: bool) -> None:
 
 if __name__ == "__main__":
     cli_args = parse_args()
-    export_dataset(cli_args.years, cli_args.output, cli_args.include_raw)
+    export_dataset(
+        cli_args.years,
+        cli_args.output,
+        cli_args.include_raw,
+        None if cli_args.no_cache else cli_args.cache_dir,
+    )
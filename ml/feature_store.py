@@ -0,0 +1,417 @@
+"""In-process, column-oriented store of the features ``/recommend`` scores.
+
+Every live recommendation used to re-read the approved yield rows of one
+barangay/season and re-average ``barangay_crop_prices`` over the season's
+months in SQL, although that history changes only when a record is approved.
+The store keeps the result of that work in memory:
+
+* One row per (barangay, season, crop, year): the latest approved yield
+  metrics and the seasonal average approved price, held in NumPy columns
+  sorted by (barangay, season, year, crop). A lookup is two binary searches
+  and a slice, so it needs no round trip to Postgres.
+* :meth:`FeatureStore.load` reads every approved row once (at startup).
+  :meth:`FeatureStore.refresh` applies only what changed since: rows with ids
+  above the last seen ones and rows named by new ``approvals`` entries
+  (approvals, rejections and re-submissions all insert there). When the
+  approved row counts still disagree afterwards, for example after a delete,
+  or every ``full_reload_seconds``, it falls back to a full load.
+* Readers use :attr:`FeatureStore.snapshot`, an immutable object swapped
+  atomically after a rebuild, so lookups never take a lock.
+
+Results match ``FEATURE_QUERY`` in ``recommendation_api.py``: same target
+year fallback, same columns and the same ``crop_id`` order. When one crop has
+several approved rows for the same barangay/season/year, the newest record
+(highest ``yield_id``) is used. Prices whose ``month`` is NULL (or outside
+both seasons) are kept in the store, so the approved row counts still match,
+but like ``FEATURE_QUERY`` they are left out of every seasonal average.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import AbstractContextManager
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+WET_MONTHS = (6, 7, 8, 9, 10, 11)
+DRY_MONTHS = (12, 1, 2, 3, 4, 5)
+YIELD_COLUMNS = ("barangay_id", "season", "crop_id", "year", "total_yield", "total_area_planted_ha", "yield_per_hectare")
+PRICE_COLUMNS = ("barangay_id", "crop_id", "year", "month", "price_cents")
+RECORD_TYPES = {
+    "yield": "yields",
+    "barangay_yields": "yields",
+    "crop_price": "prices",
+    "crop_prices": "prices",
+}
+
+YIELD_SELECT = """
+    SELECT
+        yield_id,
+        barangay_id,
+        LOWER(season) AS season,
+        crop_id,
+        year,
+        total_yield::float8,
+        total_area_planted_ha::float8,
+        yield_per_hectare::float8,
+        status
+    FROM barangay_yields
+"""
+PRICE_SELECT = """
+    SELECT
+        price_id,
+        barangay_id,
+        crop_id,
+        year,
+        month,
+        ROUND(price_per_kg * 100)::int8 AS price_cents,
+        status::text
+    FROM barangay_crop_prices
+"""
+COUNTS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM barangay_yields WHERE status = 'approved'),
+        (SELECT COUNT(*) FROM barangay_crop_prices WHERE status = 'approved')
+"""
+
+
+class FeatureSnapshot:
+    """Immutable columnar feature table built from the store's approved rows."""
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        barangay_names: Dict[int, str],
+        crop_names: Dict[int, str],
+    ) -> None:
+        self.columns = columns
+        self.barangay_names = barangay_names
+        self.crop_names = crop_names
+        self.built_at = datetime.now(timezone.utc)
+
+        barangays = columns["barangay_id"]
+        seasons = columns["season_code"]
+        # (barangay_id, season_code) -> [start, stop) of its rows; rows are sorted by year then crop.
+        self._ranges: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if len(barangays):
+            boundaries = np.flatnonzero((np.diff(barangays) != 0) | (np.diff(seasons) != 0)) + 1
+            starts = np.concatenate(([0], boundaries))
+            stops = np.concatenate((boundaries, [len(barangays)]))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self._ranges[(int(barangays[start]), int(seasons[start]))] = (start, stop)
+
+    def __len__(self) -> int:
+        return len(self.columns["barangay_id"])
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(array.nbytes for array in self.columns.values()))
+
+    def barangay_ids(self, season: str) -> List[int]:
+        """Sorted ids of the barangays with approved rows in ``season``."""
+
+        code = _season_code(season)
+        return sorted(barangay_id for barangay_id, season_code in self._ranges if season_code == code)
+
+    def _rows_for(self, barangay_id: int, season: str, year: int) -> Tuple[int, int]:
+        start, stop = self._ranges.get((int(barangay_id), _season_code(season)), (0, 0))
+        if start == stop:
+            return 0, 0
+        years = self.columns["year"][start:stop]
+        position = int(np.searchsorted(years, year, side="right"))
+        target = years[position - 1] if position else years[-1]
+        return (
+            start + int(np.searchsorted(years, target, side="left")),
+            start + int(np.searchsorted(years, target, side="right")),
+        )
+
+    def frame(self, keys: Sequence[Tuple[int, str, int]], with_request_index: bool = False) -> pd.DataFrame:
+        """Feature rows for ``(barangay_id, season, year)`` keys, like ``FEATURE_QUERY``.
+
+        With ``with_request_index`` a leading ``request_index`` column holds
+        each row's position in ``keys`` (the ``BATCH_FEATURE_QUERY`` shape).
+        """
+
+        spans = [self._rows_for(*key) for key in keys]
+        counts = [stop - start for start, stop in spans]
+        if spans:
+            rows = np.concatenate([np.arange(start, stop) for start, stop in spans])
+        else:
+            rows = np.empty(0, dtype=np.int64)
+
+        columns = self.columns
+        barangay_ids = columns["barangay_id"][rows]
+        crop_ids = columns["crop_id"][rows]
+        data: Dict[str, object] = {}
+        if with_request_index:
+            data["request_index"] = np.repeat(np.arange(len(keys)), counts)
+        data.update(
+            {
+                "barangay_id": barangay_ids.astype(np.int64),
+                "barangay_name": [
+                    self.barangay_names.get(value, f"Barangay {value}") for value in barangay_ids.tolist()
+                ],
+                "crop_id": crop_ids.astype(np.int64),
+                "crop_name": [self.crop_names.get(value, f"Crop {value}") for value in crop_ids.tolist()],
+                "year": np.repeat(np.asarray([key[2] for key in keys], dtype=np.int64), counts),
+                "season": np.repeat(np.asarray([str(key[1]).lower() for key in keys], dtype=object), counts),
+                "total_yield": columns["total_yield"][rows],
+                "total_area_planted_ha": columns["total_area_planted_ha"][rows],
+                "yield_per_hectare": columns["yield_per_hectare"][rows],
+                "avg_price_per_kg": columns["avg_price_per_kg"][rows],
+            }
+        )
+        return pd.DataFrame(data)
+
+
+def _season_code(season: str) -> int:
+    return 1 if str(season).lower() == "wet" else 0
+
+
+def _empty(columns: Sequence[str], index_name: str) -> pd.DataFrame:
+    return pd.DataFrame(columns=list(columns)).rename_axis(index_name)
+
+
+def build_snapshot(
+    yields: pd.DataFrame,
+    prices: pd.DataFrame,
+    barangay_names: Dict[int, str],
+    crop_names: Dict[int, str],
+) -> FeatureSnapshot:
+    """Collapse approved yield and price rows into a :class:`FeatureSnapshot`."""
+
+    latest = (
+        yields.sort_index()
+        .reset_index(drop=True)
+        .drop_duplicates(["barangay_id", "season", "crop_id", "year"], keep="last")
+    )
+    # FEATURE_QUERY selects prices with ``month = ANY(<season months>)``.
+    prices = prices[prices["month"].isin(WET_MONTHS + DRY_MONTHS)]
+    if len(prices):
+        seasonal = prices.assign(season=np.where(prices["month"].isin(WET_MONTHS), "wet", "dry"))
+        # ``price_per_kg`` is NUMERIC(10,2): averaging whole cents and dividing
+        # once rounds exactly like Postgres' AVG(numeric) converted to float.
+        totals = seasonal.groupby(["barangay_id", "crop_id", "year", "season"], sort=False)["price_cents"].agg(
+            ["sum", "count"]
+        )
+        averages = (
+            (totals["sum"].astype(np.float64) / (totals["count"] * 100).astype(np.float64))
+            .rename("avg_price_per_kg")
+            .reset_index()
+        )
+        latest = latest.merge(averages, on=["barangay_id", "crop_id", "year", "season"], how="left")
+    else:
+        latest = latest.assign(avg_price_per_kg=np.nan)
+
+    latest["season_code"] = (latest["season"] == "wet").astype(np.int8)
+    latest = latest.sort_values(["barangay_id", "season_code", "year", "crop_id"], kind="stable")
+
+    columns = {
+        "barangay_id": latest["barangay_id"].to_numpy(dtype=np.int32),
+        "season_code": latest["season_code"].to_numpy(dtype=np.int8),
+        "year": latest["year"].to_numpy(dtype=np.int32),
+        "crop_id": latest["crop_id"].to_numpy(dtype=np.int32),
+        "total_yield": latest["total_yield"].to_numpy(dtype=np.float64),
+        "total_area_planted_ha": latest["total_area_planted_ha"].to_numpy(dtype=np.float64),
+        "yield_per_hectare": latest["yield_per_hectare"].to_numpy(dtype=np.float64),
+        "avg_price_per_kg": latest["avg_price_per_kg"].fillna(0.0).to_numpy(dtype=np.float64),
+    }
+    return FeatureSnapshot(columns, dict(barangay_names), dict(crop_names))
+
+
+class FeatureStore:
+    """Approved yield/price history held in memory and kept current incrementally."""
+
+    def __init__(
+        self,
+        connection: Callable[[], AbstractContextManager],
+        full_reload_seconds: float = 3600.0,
+    ) -> None:
+        self._connection = connection
+        self.full_reload_seconds = float(full_reload_seconds)
+        self._snapshot: Optional[FeatureSnapshot] = None
+        self._lock = Lock()
+        self._yields = _empty(YIELD_COLUMNS, "yield_id")
+        self._prices = _empty(PRICE_COLUMNS, "price_id")
+        self._barangay_names: Dict[int, str] = {}
+        self._crop_names: Dict[int, str] = {}
+        self._approval_id = 0
+        self._full_loaded_at = float("-inf")
+        self._counters = {"full_loads": 0, "incremental_refreshes": 0, "failed_refreshes": 0}
+        self._last_refresh: Dict[str, object] = {}
+
+    @property
+    def snapshot(self) -> Optional[FeatureSnapshot]:
+        return self._snapshot
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def frame(self, keys: Sequence[Tuple[int, str, int]], with_request_index: bool = False) -> pd.DataFrame:
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Feature store is not loaded.")
+        return snapshot.frame(keys, with_request_index=with_request_index)
+
+    # -- loading --------------------------------------------------------
+
+    def load(self) -> Dict[str, object]:
+        """Read every approved row and rebuild the snapshot."""
+
+        with self._lock:
+            return self._run("full", self._load_all)
+
+    def refresh(self) -> Dict[str, object]:
+        """Apply rows changed since the last load; falls back to :meth:`load` when needed."""
+
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._full_loaded_at > self.full_reload_seconds:
+                return self._run("full", self._load_all)
+            return self._run("incremental", self._apply_changes)
+
+    def _run(self, mode: str, step: Callable[[object], Dict[str, int]]) -> Dict[str, object]:
+        started = time.perf_counter()
+        try:
+            with self._connection() as conn:
+                applied = step(conn)
+                if mode == "incremental" and not self._counts_match(conn):
+                    LOGGER.info("Feature store drifted from the database; reloading everything")
+                    mode = "full"
+                    applied = self._load_all(conn)
+        except Exception:
+            self._counters["failed_refreshes"] += 1
+            raise
+
+        fetched = time.perf_counter()
+        self._snapshot = build_snapshot(self._yields, self._prices, self._barangay_names, self._crop_names)
+        finished = time.perf_counter()
+
+        if mode == "full":
+            self._counters["full_loads"] += 1
+            self._full_loaded_at = time.monotonic()
+        else:
+            self._counters["incremental_refreshes"] += 1
+        self._last_refresh = {
+            "mode": mode,
+            **applied,
+            "fetch_seconds": round(fetched - started, 4),
+            "build_seconds": round(finished - fetched, 4),
+            "at": self._snapshot.built_at.isoformat(),
+        }
+        LOGGER.info(
+            "Feature store %s refresh: %s rows (fetch %.3fs, build %.3fs)",
+            mode,
+            len(self._snapshot),
+            fetched - started,
+            finished - fetched,
+        )
+        return dict(self._last_refresh)
+
+    def _load_all(self, conn) -> Dict[str, int]:
+        with conn.cursor() as cursor:
+            # Read the approvals high-water mark first: anything approved while
+            # the rows are read is applied again by the next refresh.
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM approvals")
+            approval_id = int(cursor.fetchone()[0])
+            cursor.execute(YIELD_SELECT + " WHERE status = 'approved'")
+            yields = _yield_frame(cursor.fetchall()).drop(columns="status")
+            cursor.execute(PRICE_SELECT + " WHERE status = 'approved'")
+            prices = _price_frame(cursor.fetchall()).drop(columns="status")
+            barangay_names, crop_names = _fetch_names(cursor)
+
+        self._yields, self._prices = yields, prices
+        self._barangay_names, self._crop_names = barangay_names, crop_names
+        self._approval_id = approval_id
+        return {"yield_rows": len(yields), "price_rows": len(prices)}
+
+    def _apply_changes(self, conn) -> Dict[str, int]:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM approvals")
+            approval_id = int(cursor.fetchone()[0])
+            cursor.execute(
+                "SELECT record_type::text, record_id FROM approvals WHERE id > %s AND id <= %s",
+                (self._approval_id, approval_id),
+            )
+            touched: Dict[str, set] = {"yields": set(), "prices": set()}
+            for record_type, record_id in cursor.fetchall():
+                kind = RECORD_TYPES.get(record_type)
+                if kind is not None:
+                    touched[kind].add(int(record_id))
+
+            last_yield = int(self._yields.index.max()) if len(self._yields) else 0
+            last_price = int(self._prices.index.max()) if len(self._prices) else 0
+            cursor.execute(
+                YIELD_SELECT + " WHERE yield_id = ANY(%s) OR (yield_id > %s AND status = 'approved')",
+                (sorted(touched["yields"]), last_yield),
+            )
+            yield_rows = cursor.fetchall()
+            cursor.execute(
+                PRICE_SELECT + " WHERE price_id = ANY(%s) OR (price_id > %s AND status = 'approved')",
+                (sorted(touched["prices"]), last_price),
+            )
+            price_rows = cursor.fetchall()
+
+            new_barangays = {row[1] for row in yield_rows} - set(self._barangay_names)
+            new_crops = {row[3] for row in yield_rows} - set(self._crop_names)
+            if new_barangays or new_crops:
+                self._barangay_names, self._crop_names = _fetch_names(cursor)
+
+        self._yields, yields_changed = _merge(self._yields, _yield_frame(yield_rows))
+        self._prices, prices_changed = _merge(self._prices, _price_frame(price_rows))
+        self._approval_id = approval_id
+        return {"yield_rows_changed": yields_changed, "price_rows_changed": prices_changed}
+
+    def _counts_match(self, conn) -> bool:
+        with conn.cursor() as cursor:
+            cursor.execute(COUNTS_QUERY)
+            yields, prices = cursor.fetchone()
+        return int(yields) == len(self._yields) and int(prices) == len(self._prices)
+
+    def stats(self) -> Dict[str, object]:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "rows": len(snapshot) if snapshot is not None else 0,
+            "bytes": snapshot.nbytes if snapshot is not None else 0,
+            "yield_rows": len(self._yields),
+            "price_rows": len(self._prices),
+            "approval_watermark": self._approval_id,
+            "full_reload_seconds": self.full_reload_seconds,
+            **self._counters,
+            "last_refresh": dict(self._last_refresh),
+        }
+
+
+def _yield_frame(rows: List[tuple]) -> pd.DataFrame:
+    return pd.DataFrame.from_records(rows, columns=["yield_id", *YIELD_COLUMNS, "status"], index="yield_id")
+
+
+def _price_frame(rows: List[tuple]) -> pd.DataFrame:
+    return pd.DataFrame.from_records(rows, columns=["price_id", *PRICE_COLUMNS, "status"], index="price_id")
+
+
+def _merge(current: pd.DataFrame, changed: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """Upsert approved rows of ``changed`` into ``current`` and drop the others."""
+
+    if changed.empty:
+        return current, 0
+    approved = changed[changed["status"] == "approved"].drop(columns="status")
+    kept = current.drop(index=changed.index, errors="ignore")
+    merged = pd.concat([kept, approved]) if len(approved) else kept
+    return merged.sort_index(), len(changed)
+
+
+def _fetch_names(cursor) -> Tuple[Dict[int, str], Dict[int, str]]:
+    cursor.execute("SELECT barangay_id, COALESCE(adm3_en, CONCAT('Barangay ', barangay_id)) FROM barangays")
+    barangay_names = {int(row[0]): row[1] for row in cursor.fetchall()}
+    cursor.execute("SELECT crop_id, COALESCE(crop_name, CONCAT('Crop ', crop_id)) FROM crops")
+    crop_names = {int(row[0]): row[1] for row in cursor.fetchall()}
+    return barangay_names, crop_names
@@ -0,0 +1,501 @@
+"""Reproducible load test for ``POST /recommend``.
+
+The harness runs in three steps. Each step can be skipped, so the same
+command works against a fresh sandbox or an already running deployment.
+
+1. ``--seed-db`` (re)creates a dedicated database (``--database``, default
+   ``geo_agri_loadtest``). It gets the tables the API reads, the lookup
+   indexes from ``backend/db/migrations``, the Guagua barangays multiplied by
+   ``--scale``, and ``--years`` of approved history generated by
+   ``generate_mock_data.insert_mock_data``. ``--pgserver DIR`` runs that
+   database on a throwaway local PostgreSQL from the optional ``pgserver``
+   package instead of the server in ``PG*``.
+2. Unless ``--url`` points at a running API, a model is trained into
+   ``--workdir`` (reused on later runs), and ``recommendation_api.py
+   --preload`` is started against the database on ``--port``.
+3. ``--concurrency`` client threads send ``--requests`` requests over
+   keep-alive connections after ``--warmup`` unmeasured ones. ``--mix
+   single`` repeats one barangay/season/year. ``--mix mixed`` draws them
+   uniformly from the seeded data.
+
+Throughput, p50/p95/p99 latency and the error rate are printed as JSON
+together with the commit and configuration, so runs can be diffed between
+commits. ``--compare`` prints the change against a previous report.
+
+Examples
+--------
+    $ python load_test.py --pgserver /tmp/loadtest-pg --seed-db --scale 4 --mix mixed \\
+        --concurrency 16 --requests 5000 --output before.json
+    $ python load_test.py --pgserver /tmp/loadtest-pg --mix mixed --concurrency 16 \\
+        --requests 5000 --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+
+import generate_mock_data
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+REPO_ROOT = PROJECT_ROOT.parent
+GEOJSON_PATH = REPO_ROOT / "backend" / "data-barangay-gis" / "Guagua_barangays.geojson"
+INDEX_MIGRATION = REPO_ROOT / "backend" / "db" / "migrations" / "2026-10-16_add_recommendation_lookup_indexes.sql"
+CROP_NAMES = ("Rice", "Corn", "Sugarcane", "Mango", "Eggplant", "Tomato", "Okra", "Ampalaya", "String Beans", "Squash")
+
+# Mirrors the columns of the production tables (geo_agri_db.sql) that the
+# seeder, the training query and the API touch; PostGIS geometry is omitted.
+SCHEMA_SQL = """
+CREATE TYPE approval_status AS ENUM ('pending', 'approved', 'rejected');
+CREATE TYPE record_type_enum AS ENUM ('crop_price', 'yield', 'crop_prices', 'barangay_yields');
+CREATE TYPE season_enum AS ENUM ('wet', 'dry');
+
+CREATE TABLE users (
+    userid serial PRIMARY KEY,
+    roleid integer
+);
+
+CREATE TABLE barangays (
+    barangay_id serial PRIMARY KEY,
+    municipality_name varchar(100),
+    adm3_pcode varchar(20),
+    adm3_en varchar(100)
+);
+
+CREATE TABLE crops (
+    crop_id serial PRIMARY KEY,
+    crop_name varchar(255) NOT NULL,
+    category varchar(255)
+);
+
+CREATE TABLE barangay_yields (
+    yield_id serial PRIMARY KEY,
+    barangay_id integer NOT NULL,
+    crop_id integer NOT NULL,
+    recorded_by_user_id integer NOT NULL,
+    year integer NOT NULL,
+    season varchar(50) NOT NULL CHECK (season IN ('Wet', 'Dry')),
+    total_yield numeric(12, 2),
+    total_area_planted_ha numeric(10, 2),
+    yield_per_hectare numeric(10, 2),
+    data_recorded timestamp DEFAULT CURRENT_TIMESTAMP,
+    status varchar(20) DEFAULT 'pending',
+    month integer CHECK (month >= 1 AND month <= 12)
+);
+
+CREATE TABLE barangay_crop_prices (
+    price_id serial PRIMARY KEY,
+    barangay_id integer NOT NULL,
+    crop_id integer NOT NULL,
+    recorded_by_user_id integer NOT NULL,
+    price_per_kg numeric(10, 2) NOT NULL,
+    date_recorded date DEFAULT CURRENT_DATE,
+    year integer,
+    season season_enum NOT NULL,
+    status approval_status DEFAULT 'pending',
+    month integer CHECK (month >= 1 AND month <= 12)
+);
+
+CREATE TABLE approvals (
+    id serial PRIMARY KEY,
+    record_type record_type_enum NOT NULL,
+    record_id integer NOT NULL,
+    status varchar(10) NOT NULL,
+    performed_by integer,
+    performed_at timestamp DEFAULT now(),
+    reason text DEFAULT 'N/A' NOT NULL,
+    submitted_by integer NOT NULL
+);
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Seed a database, start the API and load test /recommend.")
+    database = parser.add_argument_group("database")
+    database.add_argument("--pgserver", type=Path, default=None, help="Run a throwaway PostgreSQL in this directory.")
+    database.add_argument("--database", type=str, default="geo_agri_loadtest", help="Database the harness owns.")
+    database.add_argument("--seed-db", action="store_true", help="Drop, recreate and seed --database.")
+    database.add_argument("--scale", type=int, default=1, help="Copies of the 31 Guagua barangays to seed.")
+    database.add_argument("--years", type=int, default=5, help="Years of history to seed (minimum 5).")
+    database.add_argument("--random-seed", type=int, default=2025, help="Seed for data and request generation.")
+
+    server = parser.add_argument_group("server")
+    server.add_argument("--url", type=str, default=None, help="Load test a running API instead of starting one.")
+    server.add_argument("--port", type=int, default=5097, help="Port for the API started by the harness.")
+    server.add_argument("--workdir", type=Path, default=Path("loadtest"), help="Model directory and server log.")
+    server.add_argument(
+        "--server-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra environment for the started API, e.g. ML_RESPONSE_CACHE_SIZE=0 (repeatable).",
+    )
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--mix", choices=("single", "mixed"), default="mixed")
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--requests", type=int, default=2000, help="Measured requests.")
+    load.add_argument("--warmup", type=int, default=100, help="Unmeasured requests sent first.")
+    load.add_argument("--top-k", type=int, default=3)
+    load.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output", type=Path, default=None, help="Also write the JSON report to this file.")
+    output.add_argument("--compare", type=Path, default=None, help="Previous report to compare against.")
+    return parser.parse_args()
+
+
+# -- database -----------------------------------------------------------
+
+
+def resolve_server_config(args: argparse.Namespace) -> Dict[str, str]:
+    """Connection settings for the server that hosts ``--database``."""
+
+    if args.pgserver is not None:
+        try:
+            import pgserver
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise SystemExit("--pgserver requires the 'pgserver' package (pip install pgserver).") from exc
+
+        server = pgserver.get_server(str(args.pgserver), cleanup_mode=None)
+        host = dict(part.split("=", 1) for part in urlsplit(server.get_uri()).query.split("&"))["host"]
+        return {"host": host, "port": "5432", "user": "postgres", "password": "", "database": args.database}
+
+    placeholders = argparse.Namespace(host=None, port=None, database=None, user=None, password=None)
+    config = generate_mock_data.resolve_db_config(placeholders)
+    config["database"] = args.database
+    return config
+
+
+def _recreate_database(config: Dict[str, str]) -> None:
+    admin = psycopg2.connect(**dict(config, database="postgres"))
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(config["database"])))
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(config["database"])))
+    finally:
+        admin.close()
+
+
+def _barangay_names(scale: int) -> List[str]:
+    with GEOJSON_PATH.open("r", encoding="utf-8") as handle:
+        base = [feature["properties"]["ADM4_EN"] for feature in json.load(handle)["features"]]
+    return [name if copy == 0 else f"{name} {copy + 1}" for copy in range(scale) for name in base]
+
+
+def seed_database(config: Dict[str, str], args: argparse.Namespace) -> Dict[str, object]:
+    if args.years < 5:
+        raise SystemExit("--years must be at least 5 to satisfy historical requirements.")
+
+    _recreate_database(config)
+    random.seed(args.random_seed)
+    current_year = datetime.now(timezone.utc).year
+    start_year = current_year - (args.years - 1)
+
+    connection = psycopg2.connect(**config)
+    try:
+        with connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SCHEMA_SQL)
+                cursor.execute(INDEX_MIGRATION.read_text(encoding="utf-8").replace("BEGIN;", "").replace("COMMIT;", ""))
+                cursor.execute("INSERT INTO users (roleid) VALUES (1), (3), (3), (3)")
+                cursor.executemany(
+                    "INSERT INTO barangays (municipality_name, adm3_pcode, adm3_en) VALUES ('Guagua', 'PH0305407', %s)",
+                    [(name,) for name in _barangay_names(args.scale)],
+                )
+                cursor.executemany("INSERT INTO crops (crop_name) VALUES (%s)", [(name,) for name in CROP_NAMES])
+                barangays, crops, technicians, admin_user_id = generate_mock_data.fetch_reference_data(cursor)
+
+        summary = generate_mock_data.insert_mock_data(
+            connection, barangays, crops, technicians, admin_user_id, start_year, current_year
+        )
+        connection.commit()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        connection.close()
+
+    return {
+        "barangays": len(barangays),
+        "crops": len(crops),
+        "years": [start_year, current_year],
+        "yield_rows": summary["inserted_yields"],
+        "price_rows": summary["inserted_prices"],
+    }
+
+
+def request_keys(config: Dict[str, str]) -> List[Tuple[int, str, int]]:
+    """Every approved (barangay_id, season, year) in the database, sorted for reproducibility."""
+
+    connection = psycopg2.connect(**config)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT DISTINCT barangay_id, LOWER(season), year
+                FROM barangay_yields
+                WHERE status = 'approved'
+                ORDER BY 1, 2, 3
+                """
+            )
+            return [(int(row[0]), row[1], int(row[2])) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+# -- server -------------------------------------------------------------
+
+
+def _pg_env(config: Dict[str, str]) -> Dict[str, str]:
+    return {
+        "PGHOST": config["host"],
+        "PGPORT": str(config["port"]),
+        "PGDATABASE": config["database"],
+        "PGUSER": config["user"],
+        "PGPASSWORD": config["password"],
+    }
+
+
+def ensure_model(config: Dict[str, str], models_dir: Path) -> Path:
+    existing = sorted(models_dir.glob("random_forest_recommendation_*.joblib"))
+    if existing:
+        return existing[-1]
+    subprocess.run(
+        [sys.executable, "train_model.py", "--save-dir", str(models_dir.resolve())],
+        cwd=str(PROJECT_ROOT),
+        env=dict(os.environ, **_pg_env(config)),
+        check=True,
+        # Keep stdout for the JSON report.
+        stdout=sys.stderr,
+    )
+    return sorted(models_dir.glob("random_forest_recommendation_*.joblib"))[-1]
+
+
+def start_server(config: Dict[str, str], args: argparse.Namespace) -> subprocess.Popen:
+    models_dir = args.workdir / "models"
+    models_dir.mkdir(parents=True, exist_ok=True)
+    ensure_model(config, models_dir)
+
+    env = dict(os.environ, **_pg_env(config))
+    env.update(ML_MODELS_DIR=str(models_dir.resolve()), ML_MODEL_WATCH_SECONDS="0")
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    log = (args.workdir / "server.log").open("w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, "recommendation_api.py", "--host", "127.0.0.1", "--port", str(args.port), "--preload"],
+        cwd=str(PROJECT_ROOT),
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"API exited with status {process.returncode}; see {args.workdir / 'server.log'}")
+        try:
+            with socket.create_connection(("127.0.0.1", args.port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise SystemExit("API did not open its port within 300 seconds.")
+
+
+# -- load ---------------------------------------------------------------
+
+
+class _Worker(Thread):
+    def __init__(self, host: str, port: int, bodies: Sequence[bytes], timeout: float, sink: "_Results") -> None:
+        super().__init__(daemon=True)
+        self._host = host
+        self._port = port
+        self._bodies = bodies
+        self._timeout = timeout
+        self._sink = sink
+
+    def run(self) -> None:
+        conn: Optional[http.client.HTTPConnection] = None
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+        for body in self._bodies:
+            if conn is None:
+                conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/recommend", body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                outcome = str(response.status)
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException) as exc:
+                outcome = type(exc).__name__
+                conn.close()
+                conn = None
+            self._sink.add(time.perf_counter() - started, outcome)
+        if conn is not None:
+            conn.close()
+
+
+class _Results:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+
+    def add(self, latency: float, outcome: str) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes[outcome] += 1
+
+
+def _request_bodies(keys: Sequence[Tuple[int, str, int]], args: argparse.Namespace, count: int, rng) -> List[bytes]:
+    if args.mix == "single":
+        chosen = [keys[len(keys) // 2]] * count
+    else:
+        chosen = [keys[rng.randrange(len(keys))] for _ in range(count)]
+    return [
+        json.dumps({"barangay_id": b, "season": season, "year": year, "top_k": args.top_k}).encode("utf-8")
+        for b, season, year in chosen
+    ]
+
+
+def run_load(base_url: str, bodies: List[bytes], concurrency: int, timeout: float) -> Tuple[_Results, float]:
+    parts = urlsplit(base_url)
+    results = _Results()
+    workers = [
+        _Worker(parts.hostname, parts.port or 80, bodies[index::concurrency], timeout, results)
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results: _Results, elapsed: float) -> Dict[str, object]:
+    latencies = np.asarray(results.latencies) * 1000.0
+    total = len(latencies)
+    failed = sum(count for outcome, count in results.outcomes.items() if not outcome.startswith("2"))
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if total else (0.0, 0.0, 0.0)
+    return {
+        "requests": total,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "mean": round(float(latencies.mean()), 3) if total else 0.0,
+            "max": round(float(latencies.max()), 3) if total else 0.0,
+        },
+        "error_rate": round(failed / total, 6) if total else 0.0,
+        "outcomes": dict(sorted(results.outcomes.items())),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(PROJECT_ROOT), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object]) -> Dict[str, object]:
+    """Relative change (``new / old - 1``) of throughput and latency percentiles."""
+
+    new, old = report["results"], baseline["results"]
+
+    def change(current: float, previous: float) -> Optional[float]:
+        return round(current / previous - 1.0, 4) if previous else None
+
+    delta = {"throughput_rps": change(new["throughput_rps"], old["throughput_rps"])}
+    for name in ("p50", "p95", "p99"):
+        delta[f"latency_{name}"] = change(new["latency_ms"][name], old["latency_ms"][name])
+    delta["error_rate"] = round(new["error_rate"] - old["error_rate"], 6)
+    return {"baseline_commit": baseline.get("commit"), "relative_change": delta}
+
+
+def main() -> None:
+    args = parse_args()
+    if args.concurrency < 1 or args.requests < 1:
+        raise SystemExit("--concurrency and --requests must be positive.")
+
+    config = resolve_server_config(args)
+    dataset = seed_database(config, args) if args.seed_db else None
+    keys = request_keys(config)
+    if not keys:
+        raise SystemExit(f"No approved yields in {config['database']}; run with --seed-db first.")
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        process = start_server(config, args)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    rng = random.Random(args.random_seed)
+    try:
+        if args.warmup:
+            run_load(base_url, _request_bodies(keys, args, args.warmup, rng), args.concurrency, args.timeout)
+        bodies = _request_bodies(keys, args, args.requests, rng)
+        results, elapsed = run_load(base_url, bodies, args.concurrency, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report: Dict[str, object] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "url": base_url,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "top_k": args.top_k,
+            "random_seed": args.random_seed,
+            "database": config["database"],
+            "distinct_keys": len(keys),
+            "server_env": args.server_env,
+        },
+        "dataset": dataset,
+        "results": summarize(results, elapsed),
+    }
+    if args.compare is not None:
+        with args.compare.open("r", encoding="utf-8") as handle:
+            report["comparison"] = compare(report, json.load(handle))
+
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
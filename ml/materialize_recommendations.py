@@ -0,0 +1,140 @@
+"""Precompute top-k recommendations for every barangay x season x recent year.
+
+Run this after `train_model.py` (and whenever new data is approved) to write a
+snapshot for the newest model into ``models/snapshots/<model stem>/``. The
+recommendation API serves keys covered by the snapshot without querying
+PostgreSQL or evaluating the model, and falls back to live inference for the
+rest.
+
+Examples
+--------
+    $ python materialize_recommendations.py --years 3
+    $ python materialize_recommendations.py --model models/random_forest_recommendation_20251007_021127.joblib
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+import joblib
+
+from recommendation_api import (
+    MAX_TOP_K,
+    MODELS_DIR,
+    VALID_SEASONS,
+    _attach_feature_metrics,
+    _fetch_batch_feature_frame,
+    _find_latest_model,
+    _load_json_metadata,
+    _score_batch,
+)
+from recommendation_snapshot import SnapshotEntry, snapshot_dir_for, write_snapshot
+from train_model import fetch_data_watermark, get_connection, rank_recommendations, resolve_db_config
+
+DEFAULT_SNAPSHOT_DIR = MODELS_DIR / "snapshots"
+KEYS_PER_QUERY = 500
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Materialize a recommendation snapshot for the API.")
+    parser.add_argument("--model", type=Path, default=None, help="Model artifact to use (default: newest in models/).")
+    parser.add_argument(
+        "--years",
+        type=int,
+        default=3,
+        help="Number of recent years (ending at the latest approved year) to precompute.",
+    )
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_SNAPSHOT_DIR, help="Root directory for snapshots.")
+    parser.add_argument("--host", type=str, default=None, help="PostgreSQL host override.")
+    parser.add_argument("--port", type=str, default=None, help="PostgreSQL port override.")
+    parser.add_argument("--database", type=str, default=None, help="PostgreSQL database name override.")
+    parser.add_argument("--user", type=str, default=None, help="PostgreSQL user override.")
+    parser.add_argument("--password", type=str, default=None, help="PostgreSQL password override.")
+    return parser.parse_args()
+
+
+def snapshot_keys(conn, years: int) -> List[Tuple[int, str, int]]:
+    """Every barangay x season x year from the last ``years`` approved years up to the current year."""
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT barangay_id FROM barangays ORDER BY barangay_id")
+        barangay_ids = [int(row[0]) for row in cursor.fetchall()]
+        cursor.execute("SELECT MAX(year) FROM barangay_yields WHERE status = 'approved'")
+        row = cursor.fetchone()
+
+    if not row or row[0] is None:
+        raise RuntimeError("No approved yield records found in the database.")
+
+    latest_year = int(row[0])
+    last_year = max(latest_year, datetime.now(timezone.utc).year)
+    year_range = range(latest_year - years + 1, last_year + 1)
+
+    return [
+        (barangay_id, season, year)
+        for barangay_id in barangay_ids
+        for season in sorted(VALID_SEASONS)
+        for year in year_range
+    ]
+
+
+def materialize(conn, pipeline, feature_columns, keys: List[Tuple[int, str, int]]) -> List[SnapshotEntry]:
+    entries: List[SnapshotEntry] = []
+    for start in range(0, len(keys), KEYS_PER_QUERY):
+        chunk = keys[start : start + KEYS_PER_QUERY]
+        feature_frame = _fetch_batch_feature_frame(conn, chunk)
+        scored = _score_batch(pipeline, feature_columns, chunk, feature_frame)
+
+        for position, (barangay_id, season, year) in enumerate(chunk):
+            group = scored.get(position)
+            predictions = []
+            if group is not None:
+                ranked = rank_recommendations(group, top_k=MAX_TOP_K)
+                enriched = _attach_feature_metrics(ranked, group)
+                # Keep the unrounded probability so the API derives score exactly as live inference does.
+                predictions = [
+                    {**entry, "probability": raw["probability"]} for raw, entry in zip(ranked, enriched)
+                ]
+            entries.append(SnapshotEntry(barangay_id, season, year, predictions))
+
+    return entries
+
+
+def main() -> None:
+    args = parse_args()
+    if args.years < 1:
+        raise SystemExit("--years must be at least 1.")
+
+    model_path = args.model or _find_latest_model()
+    if model_path is None:
+        raise SystemExit("No trained model artifacts found in ml/models.")
+
+    pipeline = joblib.load(model_path)
+    feature_columns = _load_json_metadata(model_path).get("training", {}).get("features")
+    if not feature_columns:
+        raise SystemExit("Model metadata is missing the feature column list.")
+
+    with get_connection(resolve_db_config(args)) as conn:
+        watermark = fetch_data_watermark(conn)
+        keys = snapshot_keys(conn, args.years)
+        entries = materialize(conn, pipeline, feature_columns, keys)
+
+    directory = write_snapshot(
+        snapshot_dir_for(model_path, args.output_dir),
+        entries,
+        model_path=model_path,
+        top_k=MAX_TOP_K,
+        watermark=watermark,
+    )
+
+    covered = sum(1 for entry in entries if entry.predictions)
+    print("Snapshot complete.")
+    print(f"Model: {model_path}")
+    print(f"Keys materialized: {len(entries)} ({covered} with predictions)")
+    print(f"Snapshot saved to: {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Additional resident model versions and shadow scoring for the recommendation API.
+
+:class:`~model_store.ModelStore` serves exactly one production artifact. To
+compare a candidate against production under real traffic, the API also keeps
+a small registry of other versions:
+
+* :class:`ModelRegistry` loads and warms a named artifact the first time a
+  request pins it, keeps it resident, and evicts the least recently used
+  versions beyond ``max_resident`` as well as versions unused for
+  ``idle_seconds``. Pinned names (the shadow candidate) are never evicted.
+* :class:`ShadowScorer` runs comparison jobs on one background thread, so the
+  candidate never adds latency to the request that triggered it. Jobs are
+  sampled (``sample_rate``) and dropped when ``max_pending`` are already
+  queued. Each job reports both models' predict latency and how far their
+  rankings agree; :meth:`ShadowScorer.stats` aggregates them.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+import numpy as np
+
+from model_store import ModelArtifact, file_signature
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _LoadLock:
+    """Serializes loads of one model name; dropped once no caller holds or awaits it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.users = 0
+
+
+class ModelRegistry:
+    """Non-production model versions, loaded on demand and evicted LRU."""
+
+    def __init__(
+        self,
+        load: Callable[[Path], ModelArtifact],
+        warm_up: Optional[Callable[[ModelArtifact], None]] = None,
+        max_resident: int = 2,
+        idle_seconds: float = 900.0,
+    ) -> None:
+        self._load = load
+        self._warm_up = warm_up
+        self.max_resident = max(1, int(max_resident))
+        self.idle_seconds = float(idle_seconds)
+        self._entries: "OrderedDict[str, ModelArtifact]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._pinned: Set[str] = set()
+        self._lock = Lock()
+        self._load_locks: Dict[str, _LoadLock] = {}
+        self._counters = {"hits": 0, "loads": 0, "failed_loads": 0, "evictions": 0}
+
+    def get(self, model_path: Path) -> ModelArtifact:
+        """Return the resident artifact for ``model_path``, loading and warming it if needed.
+
+        A file replaced on disk (different signature) is loaded again.
+        """
+
+        model_path = Path(model_path)
+        name = model_path.name
+        signature = file_signature(model_path)
+        artifact = self._lookup(name, signature)
+        if artifact is not None:
+            return artifact
+
+        with self._lock:
+            load_lock = self._load_locks.get(name)
+            if load_lock is None:
+                load_lock = self._load_locks[name] = _LoadLock()
+            load_lock.users += 1
+        try:
+            with load_lock.lock:
+                return self._load_once(model_path, name, signature)
+        finally:
+            # Forget the lock with its last user, so every name ever requested
+            # does not keep one for the life of the process.
+            with self._lock:
+                load_lock.users -= 1
+                if load_lock.users == 0:
+                    del self._load_locks[name]
+
+    def _load_once(self, model_path: Path, name: str, signature) -> ModelArtifact:
+        artifact = self._lookup(name, signature)
+        if artifact is not None:
+            return artifact
+        try:
+            artifact = self._load(model_path)
+            if self._warm_up is not None:
+                self._warm_up(artifact)
+        except Exception:
+            with self._lock:
+                self._counters["failed_loads"] += 1
+            raise
+        with self._lock:
+            self._entries[name] = artifact
+            self._entries.move_to_end(name)
+            self._last_used[name] = time.monotonic()
+            self._counters["loads"] += 1
+            self._evict_locked()
+        LOGGER.info("Registry loaded model %s", name)
+        return artifact
+
+    def _lookup(self, name: str, signature) -> Optional[ModelArtifact]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle_locked(now)
+            artifact = self._entries.get(name)
+            if artifact is None or artifact.signature != signature:
+                return None
+            self._entries.move_to_end(name)
+            self._last_used[name] = now
+            self._counters["hits"] += 1
+            return artifact
+
+    def pin(self, name: Optional[str]) -> None:
+        """Protect ``name`` from eviction; ``None`` only clears the previous pin."""
+
+        with self._lock:
+            self._pinned = {name} if name else set()
+            self._evict_locked()
+
+    def _drop_locked(self, name: str) -> None:
+        self._entries.pop(name, None)
+        self._last_used.pop(name, None)
+        self._counters["evictions"] += 1
+        LOGGER.info("Registry evicted model %s", name)
+
+    def _evict_locked(self) -> None:
+        evictable = [name for name in self._entries if name not in self._pinned]
+        while len(self._entries) > self.max_resident and evictable:
+            self._drop_locked(evictable.pop(0))
+
+    def _evict_idle_locked(self, now: float) -> None:
+        if self.idle_seconds <= 0:
+            return
+        for name in [name for name, used in self._last_used.items() if now - used > self.idle_seconds]:
+            if name not in self._pinned:
+                self._drop_locked(name)
+
+    def resident(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_resident": self.max_resident,
+                "idle_seconds": self.idle_seconds,
+                "resident": [
+                    {"model": name, "idle_seconds": round(now - self._last_used.get(name, now), 1)}
+                    for name in self._entries
+                ],
+                "pinned": sorted(self._pinned),
+                **self._counters,
+            }
+
+
+def _summary(values: Deque[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"mean_ms": None, "p50_ms": None, "p95_ms": None}
+    array = np.fromiter(values, dtype=float) * 1000
+    return {
+        "mean_ms": round(float(array.mean()), 3),
+        "p50_ms": round(float(np.percentile(array, 50)), 3),
+        "p95_ms": round(float(np.percentile(array, 95)), 3),
+    }
+
+
+class ShadowScorer:
+    """Run candidate-vs-production comparisons on a background thread and aggregate them.
+
+    A job is a callable returning ``{"primary_seconds", "candidate_seconds",
+    "top1_agree", "topk_overlap", "mean_abs_probability_diff"}``.
+    """
+
+    def __init__(self, max_pending: int = 32, sample_rate: float = 1.0, history: int = 1000) -> None:
+        self.max_pending = max(1, int(max_pending))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+        self._history = history
+        self._pending = 0
+        self.candidate: Optional[str] = None
+        self.sample_rate = 1.0
+        self.configure(None, sample_rate)
+
+    def configure(self, candidate: Optional[str], sample_rate: Optional[float] = None) -> None:
+        """Switch the candidate (``None`` disables shadowing) and reset the statistics."""
+
+        with self._lock:
+            self.candidate = candidate or None
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+            self._counters = {"submitted": 0, "sampled_out": 0, "dropped": 0, "completed": 0, "errors": 0}
+            self._primary_seconds: Deque[float] = deque(maxlen=self._history)
+            self._candidate_seconds: Deque[float] = deque(maxlen=self._history)
+            self._top1_agree = 0
+            self._overlap_total = 0.0
+            self._diff_total = 0.0
+
+    def submit(self, job: Callable[[], Dict[str, float]]) -> bool:
+        """Queue ``job`` unless it is sampled out or the queue is full; never blocks."""
+
+        with self._lock:
+            if self.candidate is None:
+                return False
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                self._counters["sampled_out"] += 1
+                return False
+            if self._pending >= self.max_pending:
+                self._counters["dropped"] += 1
+                return False
+            self._pending += 1
+            self._counters["submitted"] += 1
+            candidate = self.candidate
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-scorer")
+            executor = self._executor
+        executor.submit(self._run, candidate, job)
+        return True
+
+    def _run(self, candidate: str, job: Callable[[], Dict[str, float]]) -> None:
+        try:
+            result = job()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.warning("Shadow scoring with %s failed", candidate, exc_info=True)
+            with self._lock:
+                self._pending -= 1
+                if candidate == self.candidate:
+                    self._counters["errors"] += 1
+            return
+
+        with self._lock:
+            self._pending -= 1
+            if candidate != self.candidate:
+                return  # The candidate changed while this job was queued.
+            self._counters["completed"] += 1
+            self._primary_seconds.append(result["primary_seconds"])
+            self._candidate_seconds.append(result["candidate_seconds"])
+            self._top1_agree += int(bool(result["top1_agree"]))
+            self._overlap_total += float(result["topk_overlap"])
+            self._diff_total += float(result["mean_abs_probability_diff"])
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            completed = self._counters["completed"]
+            return {
+                "candidate": self.candidate,
+                "sample_rate": self.sample_rate,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                **self._counters,
+                "top1_agreement": round(self._top1_agree / completed, 4) if completed else None,
+                "mean_topk_overlap": round(self._overlap_total / completed, 4) if completed else None,
+                "mean_abs_probability_diff": round(self._diff_total / completed, 6) if completed else None,
+                "primary_predict": _summary(self._primary_seconds),
+                "candidate_predict": _summary(self._candidate_seconds),
+            }
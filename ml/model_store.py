@@ -0,0 +1,185 @@
+"""Hot-swappable holder for the model artifact served by the recommendation API.
+
+The API used to load the newest joblib once, under a lock that every request
+took, and a new model from ``train_model.py`` meant a restart. The store
+instead keeps one immutable :class:`ModelArtifact` behind a plain attribute:
+
+* Requests read :attr:`ModelStore.current` without locking. A request keeps
+  the artifact it started with, so in-flight requests finish on the old model
+  while a new one is swapped in.
+* :meth:`ModelStore.reload` locates the newest artifact, loads it and runs the
+  warm-up callback (a synthetic predict) *before* the swap, so the first real
+  request on the new model is not the slow one. Only reloads serialize on the
+  reload lock; a failed load leaves the current model in place.
+* :meth:`ModelStore.start_watcher` polls the models directory from a daemon
+  thread and reloads when a newer artifact shows up.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    """Everything the request path needs from one loaded model file."""
+
+    predictor: object
+    metadata: Dict[str, object]
+    feature_columns: Sequence[str]
+    model_path: Path
+    loaded_at: datetime
+    signature: Tuple[str, int, int]
+
+
+def file_signature(path: Path) -> Tuple[str, int, int]:
+    """Identify an artifact file by name, size and modification time."""
+
+    stat = Path(path).stat()
+    return (Path(path).name, stat.st_size, stat.st_mtime_ns)
+
+
+class ModelStore:
+    """Serve the current :class:`ModelArtifact` and replace it atomically."""
+
+    def __init__(
+        self,
+        locate: Callable[[], Optional[Path]],
+        load: Callable[[Path], ModelArtifact],
+        warm_up: Optional[Callable[[ModelArtifact], None]] = None,
+        poll_seconds: float = 0.0,
+    ) -> None:
+        self._locate = locate
+        self._load = load
+        self._warm_up = warm_up
+        self.poll_seconds = float(poll_seconds)
+        self._current: Optional[ModelArtifact] = None
+        self._reload_lock = Lock()
+        self._stop = Event()
+        self._watcher: Optional[Thread] = None
+        self._counters = {"reloads": 0, "failed_reloads": 0}
+        self._last_reload: Dict[str, object] = {}
+        self._initial_load: Dict[str, object] = {}
+
+    @property
+    def current(self) -> Optional[ModelArtifact]:
+        return self._current
+
+    def get(self) -> ModelArtifact:
+        """Return the current artifact, loading the first one if nothing is loaded yet."""
+
+        artifact = self._current
+        if artifact is not None:
+            return artifact
+
+        self.reload()
+        artifact = self._current
+        if artifact is None:
+            raise FileNotFoundError("No trained model artifacts found in ml/models.")
+        if self.poll_seconds > 0:
+            self.start_watcher()
+        return artifact
+
+    def reload(self, model_path: Optional[Path] = None, force: bool = False) -> Dict[str, object]:
+        """Load, warm and swap in ``model_path`` (default: the newest artifact).
+
+        Returns a summary with ``status`` ``"reloaded"`` or ``"unchanged"``.
+        Load or warm-up errors propagate and leave the current artifact serving.
+        """
+
+        with self._reload_lock:
+            path = Path(model_path) if model_path is not None else self._locate()
+            if path is None:
+                if self._current is None:
+                    raise FileNotFoundError("No trained model artifacts found in ml/models.")
+                return {"status": "unchanged", "model": self._current.model_path.name}
+
+            signature = file_signature(path)
+            current = self._current
+            if not force and current is not None and current.signature == signature:
+                return {"status": "unchanged", "model": current.model_path.name}
+
+            started = time.perf_counter()
+            try:
+                artifact = self._load(path)
+                loaded = time.perf_counter()
+                if self._warm_up is not None:
+                    self._warm_up(artifact)
+            except Exception:
+                self._counters["failed_reloads"] += 1
+                raise
+            finished = time.perf_counter()
+
+            self._current = artifact
+            self._counters["reloads"] += 1
+            self._last_reload = {
+                "model": path.name,
+                "previous": current.model_path.name if current is not None else None,
+                "load_seconds": round(loaded - started, 4),
+                "warm_up_seconds": round(finished - loaded, 4),
+                "at": artifact.loaded_at.isoformat(),
+            }
+            if current is None:
+                self._initial_load = dict(self._last_reload)
+            LOGGER.info(
+                "Serving model %s (load %.3fs, warm-up %.3fs)",
+                path.name,
+                loaded - started,
+                finished - loaded,
+            )
+            return {"status": "reloaded", **self._last_reload}
+
+    def start_watcher(self) -> None:
+        """Poll for newer artifacts every ``poll_seconds`` from a daemon thread."""
+
+        with self._reload_lock:
+            if self.poll_seconds <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+                return
+            self._stop.clear()
+            self._watcher = Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.join(timeout=self.poll_seconds + 1)
+        self._watcher = None
+
+    def _watch(self) -> None:
+        # React to changes of the newest artifact only, so a model pinned through
+        # reload(model_path=...) is not replaced until something new is trained.
+        current = self._current
+        last_seen = current.signature if current is not None else None
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                path = self._locate()
+                signature = file_signature(path) if path is not None else None
+                if signature is None or signature == last_seen:
+                    continue
+                self.reload(path)
+                last_seen = signature
+            except Exception:  # pylint: disable=broad-except
+                # Typically a half-written artifact; the next poll retries.
+                LOGGER.warning("Model reload failed; keeping the current model", exc_info=True)
+
+    def stats(self) -> Dict[str, object]:
+        current = self._current
+        watcher = self._watcher
+        return {
+            "model": current.model_path.name if current is not None else None,
+            "loaded_at": current.loaded_at.isoformat() if current is not None else None,
+            "watching": bool(watcher is not None and watcher.is_alive()),
+            "poll_seconds": self.poll_seconds,
+            **self._counters,
+            "last_reload": dict(self._last_reload),
+            "initial_load": dict(self._initial_load),
+        }
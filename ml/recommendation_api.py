@@ -8,8 +8,20 @@ POST /recommend
             "barangay_id": int,
             "season": "wet" | "dry",
             "year": int,
-            "top_k": int (optional, default 3)
+            "top_k": int (optional, default 3),
+            "fields": ["crop_id", "score", ...] (optional, prediction keys to return),
+            "include_metadata": bool (optional, default true),
+            "model": "random_forest_recommendation_<stamp>.joblib" (optional)
         }
+    ``model`` (or the ``X-Model-Version`` header) pins a version other than the
+    production one; it is loaded into the model registry on first use and
+    answered live, bypassing the response cache and snapshots. ``/recommend/batch``
+    accepts it as well.
+    ``fields`` and ``include_metadata`` may also be passed as query parameters
+    (``?fields=crop_id,score&include_metadata=false``). Successful responses
+    carry a weak ``ETag`` derived from the model version, the approved-data
+    watermark and the request; a matching ``If-None-Match`` returns 304.
+    Large bodies are gzip-compressed when the client accepts it.
     Response:
         {
             "success": true,
@@ -29,43 +41,229 @@ POST /recommend
                 ...
             ]
         }
+
+POST /recommend/batch
+    Body:
+        {
+            "requests": [
+                {"barangay_id": int, "season": "wet" | "dry", "year": int, "top_k": int (optional)},
+                ...
+            ],
+            "top_k": int (optional default for entries without one)
+        }
+    Response:
+        {
+            "success": true,
+            "model": {...},
+            "metadata": {...},
+            "results": [
+                {
+                    "request_index": 0,
+                    "key": "12:wet:2024",
+                    "success": true,
+                    "status": 200,
+                    "context": {...},
+                    "predictions": [...]
+                },
+                ...
+            ]
+        }
+    Every entry is answered in request order; entries that fail validation or
+    have no approved data carry ``success: false`` with an ``error`` and a
+    per-entry ``status`` instead of failing the whole batch. ``fields`` and
+    ``include_metadata`` apply to the whole batch.
+
+GET /recommend/map?season=wet&year=2024[&top_k=1][&format=geojson]
+    Every barangay with approved data for the season, scored with one
+    set-based feature query (or one feature-store pass) and a single
+    ``predict_proba`` call. ``top_k`` defaults to 1. Response:
+        {
+            "success": true,
+            "model": {...},
+            "metadata": {...},
+            "context": {"season": "wet", "year": 2024, "top_k": 1, "barangays": 31, "source": "live"},
+            "results": [
+                {"barangay_id": 1, "barangay_name": "Bancal", "best_crop": {...}, "predictions": [...]},
+                ...
+            ]
+        }
+    With ``format=geojson`` the body is the barangay boundary FeatureCollection
+    (``ML_BARANGAY_GEOJSON``) with ``barangay_id``, ``best_crop`` and
+    ``predictions`` added to each feature's properties (``null``/empty when a
+    barangay has no data), plus top-level ``model`` and ``context`` members.
+    Features are matched to barangays by normalized name, as in the web map.
+    ``fields``, ``include_metadata``, ``ETag``/304 and gzip work as above.
+
+GET /model
+    Response:
+        {
+            "success": true,
+            "model": {"path": str, "loaded_at": str, "version": str},
+            "metadata": {...}
+        }
+    Clients that skip the metadata on ``/recommend`` can fetch it once here
+    and revalidate with ``If-None-Match``.
+
+GET /metrics
+    Prometheus text exposition: request counts and latency per endpoint,
+    per-stage latency histograms (``recommendation_stage_duration_seconds``),
+    errors by type, response-cache outcomes, prediction sources, the served
+    model version and connection-pool occupancy.
+
+GET /models
+    Lists the artifacts in ``models/`` with their production/shadow/resident
+    state, plus model registry and shadow scoring statistics.
+
+POST /admin/shadow
+    Body: {"model": "random_forest_recommendation_<stamp>.joblib" | null, "sample_rate": float (optional)}
+    Makes the named artifact the shadow candidate (``null`` stops shadowing)
+    and resets the shadow statistics. Live ``/recommend`` computations on the
+    production model are then re-ranked by the candidate on a background
+    thread; predict latency and top-1/top-k agreement are reported by
+    ``/models``, ``/health`` and ``/metrics``. ``ML_SHADOW_MODEL`` sets a
+    candidate at startup. Requires ``X-Admin-Token`` like ``/admin/reload``.
+
+POST /admin/reload
+    Body (optional):
+        {"model": "random_forest_recommendation_<stamp>.joblib", "force": bool}
+    Loads and warms the named artifact (default: the newest in ``models/``)
+    in the calling thread, then swaps it in; requests already running finish
+    on the previous model. Requires ``X-Admin-Token`` when ``ML_ADMIN_TOKEN``
+    is set. Newer artifacts are also picked up automatically every
+    ``ML_MODEL_WATCH_SECONDS`` (default 30, ``0`` disables the watcher).
+
+Startup
+-------
+The model is loaded on the first request unless the server is started with
+``--preload`` (or ``ML_PRELOAD_MODEL=1`` under a WSGI server), which loads and
+warms it before the port opens. ``GET /health`` reports the import, model load
+and first-successful-request timings under ``startup``.
 """
 
 from __future__ import annotations
 
+import argparse
+import gzip
+import hashlib
+import hmac
 import json
 import logging
+import os
+import re
+import time
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from threading import Lock
 from types import SimpleNamespace
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+# Taken before the third-party imports so /health can report the full import cost.
+IMPORT_STARTED = time.perf_counter()
 
 import numpy as np
 import pandas as pd
-from flask import Flask, jsonify, request
-
+from flask import Flask, Response, g, jsonify, request
+
+from admission import (
+    DEADLINE_HEADER,
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionSettings,
+    DeadlineExceeded,
+    check_deadline,
+    deadline_from_header,
+)
+from compiled_forest import CompiledForest, UnsupportedPipelineError, compile_with_parity, probe_frame
+from db_pool import ConnectionPool, PoolSettings, PoolTimeoutError
+from feature_store import FeatureStore
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import MetricsRegistry
+from model_registry import ModelRegistry, ShadowScorer
+from model_store import ModelArtifact, ModelStore, file_signature
+from recommendation_snapshot import RecommendationSnapshot, snapshot_dir_for
+from response_cache import ResponseCache
+from singleflight import SingleFlight, SingleFlightTimeout
 from train_model import (
     engineer_features,
+    fetch_data_watermark,
     generate_recommendations,
-    get_connection,
+    rank_recommendations,
     resolve_db_config,
 )
 
+try:  # Optional fast JSON encoder
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
 PROJECT_ROOT = Path(__file__).resolve().parent
-MODELS_DIR = PROJECT_ROOT / "models"
+MODELS_DIR = Path(os.getenv("ML_MODELS_DIR", str(PROJECT_ROOT / "models")))
+SNAPSHOT_DIR = MODELS_DIR / "snapshots"
+SNAPSHOT_RECHECK_SECONDS = float(os.getenv("ML_SNAPSHOT_RECHECK_SECONDS", "60"))
 DEFAULT_TOP_K = 3
+MAX_TOP_K = 10
+MAX_BATCH_SIZE = 500
+DEFAULT_MAP_TOP_K = 1
+BARANGAY_GEOJSON_PATH = Path(
+    os.getenv(
+        "ML_BARANGAY_GEOJSON",
+        str(PROJECT_ROOT.parent / "backend" / "data-barangay-gis" / "Guagua_barangays.geojson"),
+    )
+)
 VALID_SEASONS = {"wet", "dry"}
-MODEL_CACHE_LOCK = Lock()
-MODEL_CACHE: Dict[str, object] = {
-    "pipeline": None,
-    "metadata": None,
-    "feature_columns": None,
+INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "compiled").strip().lower()
+COMPILED_MMAP = os.getenv("ML_COMPILED_MMAP", "1").strip().lower() not in {"0", "false", "no", "off"}
+WATERMARK_TTL_SECONDS = float(os.getenv("ML_WATERMARK_TTL_SECONDS", "30"))
+GZIP_MIN_BYTES = int(os.getenv("ML_GZIP_MIN_BYTES", "1024"))
+PREDICTION_FIELDS = {
+    "barangay_id",
+    "barangay_name",
+    "season",
+    "crop_id",
+    "crop_name",
+    "year",
+    "rank",
+    "probability",
+    "score",
+    "avg_yield",
+    "avg_price",
+    "expected_revenue",
+}
+MODEL_WATCH_SECONDS = float(os.getenv("ML_MODEL_WATCH_SECONDS", "30"))
+ADMIN_TOKEN = os.getenv("ML_ADMIN_TOKEN", "")
+MODEL_VERSION_HEADER = "X-Model-Version"
+MODEL_REGISTRY_SIZE = int(os.getenv("ML_MODEL_REGISTRY_SIZE", "2"))
+MODEL_REGISTRY_IDLE_SECONDS = float(os.getenv("ML_MODEL_REGISTRY_IDLE_SECONDS", "900"))
+SHADOW_MODEL = os.getenv("ML_SHADOW_MODEL", "").strip()
+SHADOW_SAMPLE_RATE = float(os.getenv("ML_SHADOW_SAMPLE_RATE", "1.0"))
+SHADOW_MAX_PENDING = int(os.getenv("ML_SHADOW_MAX_PENDING", "32"))
+PRELOAD_MODEL = os.getenv("ML_PRELOAD_MODEL", "0").strip().lower() in {"1", "true", "yes", "on"}
+FEATURE_STORE_ENABLED = os.getenv("ML_FEATURE_STORE", "1").strip().lower() not in {"0", "false", "no", "off"}
+FEATURE_STORE_FULL_RELOAD_SECONDS = float(os.getenv("ML_FEATURE_STORE_FULL_RELOAD_SECONDS", "3600"))
+FEATURE_STORE_RETRY_SECONDS = 30.0
+WATERMARK_LOCK = Lock()
+WATERMARK_STATE: Dict[str, object] = {
+    "value": None,
+    "checked_at": float("-inf"),
+}
+SNAPSHOT_LOCK = Lock()
+SNAPSHOT_STATE: Dict[str, object] = {
+    "snapshot": None,
     "model_path": None,
-    "loaded_at": None,
+    "checked_at": 0.0,
+}
+STARTUP_LOCK = Lock()
+STARTUP_STATE: Dict[str, object] = {
+    "import_seconds": None,
+    "preloaded": False,
+    "preload_seconds": None,
+    "first_request_seconds": None,
+    "first_request_latency_seconds": None,
 }
 
 
@@ -84,52 +282,351 @@ def _load_json_metadata(model_path: Path) -> Dict[str, object]:
         return json.load(handle)
 
 
-def _load_artifacts() -> None:
-    with MODEL_CACHE_LOCK:
-        if MODEL_CACHE["pipeline"] is not None:
-            return
+def _compiled_dir_for(model_path: Path) -> Path:
+    return Path(model_path).parent / "compiled" / Path(model_path).stem
 
-        model_path = _find_latest_model()
-        if model_path is None:
-            raise FileNotFoundError("No trained model artifacts found in ml/models.")
 
-        import joblib
+def _load_compiled_cache(model_path: Path, signature) -> Optional[CompiledForest]:
+    """Memory-map the forest compiled earlier for exactly this artifact, if present."""
 
-        LOGGER.info("Loading recommendation model from %s", model_path)
-        pipeline = joblib.load(model_path)
-        metadata = _load_json_metadata(model_path)
-        feature_columns = metadata.get("training", {}).get("features")
-        if not feature_columns:
-            raise ValueError("Model metadata is missing the feature column list.")
+    if INFERENCE_BACKEND != "compiled" or not COMPILED_MMAP:
+        return None
+    directory = _compiled_dir_for(model_path)
+    source = CompiledForest.read_source(directory)
+    if source is None or list(source.get("signature", ())) != list(signature):
+        return None
+    try:
+        return CompiledForest.load(directory, mmap_mode="r")
+    except (OSError, ValueError):
+        LOGGER.warning("Ignoring unreadable compiled forest at %s", directory, exc_info=True)
+        return None
 
-        MODEL_CACHE.update(
-            {
-                "pipeline": pipeline,
-                "metadata": metadata,
-                "feature_columns": feature_columns,
-                "model_path": model_path,
-                "loaded_at": datetime.now(timezone.utc),
-            }
+
+def _build_predictor(pipeline, model_path: Optional[Path] = None, signature=None):
+    """Return the compiled forest for ``pipeline`` unless disabled or unsupported.
+
+    With ``model_path`` the compiled arrays are also written next to the model
+    and served memory-mapped, so every worker process shares one copy.
+    """
+
+    if INFERENCE_BACKEND != "compiled":
+        return pipeline
+    try:
+        compiled = compile_with_parity(pipeline)
+    except UnsupportedPipelineError as exc:
+        LOGGER.warning("Falling back to sklearn inference: %s", exc)
+        return pipeline
+
+    if model_path is None or not COMPILED_MMAP:
+        return compiled
+    try:
+        directory = compiled.save(
+            _compiled_dir_for(model_path),
+            source={"model": Path(model_path).name, "signature": list(signature or file_signature(model_path))},
         )
+        return CompiledForest.load(directory, mmap_mode="r")
+    except OSError:
+        LOGGER.warning("Could not persist the compiled forest; serving it from private memory", exc_info=True)
+        return compiled
+
+
+def _synthetic_features(predictor, feature_columns: Sequence[str], rows: int = 8) -> pd.DataFrame:
+    """Warm-up inputs: fitted categories for one-hot columns, zeros elsewhere."""
+
+    if isinstance(predictor, CompiledForest):
+        return pd.DataFrame(probe_frame(predictor, rows=rows))
+
+    categories: Dict[str, List[object]] = {}
+    for step in getattr(predictor, "named_steps", {}).values():
+        for _, transformer, columns in getattr(step, "transformers_", []):
+            for column, values in zip(columns, getattr(transformer, "categories_", [])):
+                categories[column] = list(values)
+
+    frame = {}
+    for column in feature_columns:
+        values = categories.get(column)
+        frame[column] = [values[index % len(values)] for index in range(rows)] if values else [0.0] * rows
+    return pd.DataFrame(frame)
+
+
+def _load_model_artifact(model_path: Path) -> ModelArtifact:
+    LOGGER.info("Loading recommendation model from %s", model_path)
+    signature = file_signature(model_path)
+    metadata = _load_json_metadata(model_path)
+    feature_columns = metadata.get("training", {}).get("features")
+    if not feature_columns:
+        raise ValueError("Model metadata is missing the feature column list.")
+
+    # A forest compiled for this exact file skips joblib.load and the parity check.
+    predictor = _load_compiled_cache(model_path, signature)
+    if predictor is None:
+        import joblib
+
+        predictor = _build_predictor(joblib.load(model_path), model_path, signature)
+
+    return ModelArtifact(
+        predictor=predictor,
+        metadata=metadata,
+        feature_columns=list(feature_columns),
+        model_path=model_path,
+        loaded_at=datetime.now(timezone.utc),
+        signature=signature,
+    )
+
+
+def _warm_up_artifact(artifact: ModelArtifact) -> None:
+    """Run a synthetic predict so the first real request does not pay first-call costs."""
 
+    frame = _synthetic_features(artifact.predictor, artifact.feature_columns)
+    for _ in range(2):
+        artifact.predictor.predict_proba(frame[list(artifact.feature_columns)])
 
-def _get_cached_artifacts():
-    _load_artifacts()
+
+MODEL_STORE = ModelStore(
+    locate=_find_latest_model,
+    load=_load_model_artifact,
+    warm_up=_warm_up_artifact,
+    poll_seconds=MODEL_WATCH_SECONDS,
+)
+
+
+MODEL_REGISTRY = ModelRegistry(
+    load=_load_model_artifact,
+    warm_up=_warm_up_artifact,
+    max_resident=MODEL_REGISTRY_SIZE,
+    idle_seconds=MODEL_REGISTRY_IDLE_SECONDS,
+)
+SHADOW = ShadowScorer(max_pending=SHADOW_MAX_PENDING, sample_rate=SHADOW_SAMPLE_RATE)
+
+
+def _resolve_model_name(requested) -> Path:
+    """Path of the artifact named ``requested`` in ``MODELS_DIR``; raises ``ValueError`` if there is none."""
+
+    model_path = MODELS_DIR / Path(str(requested)).name
+    if not model_path.is_file() or model_path.suffix != ".joblib":
+        raise ValueError(f"unknown model artifact: {requested}")
+    return model_path
+
+
+def _is_production(model_path: Optional[Path]) -> bool:
+    current = MODEL_STORE.current
+    return model_path is None or (current is not None and current.model_path.name == Path(model_path).name)
+
+
+def _get_cached_artifacts(model_path: Optional[Path] = None):
+    """Artifacts of the production model, or of ``model_path`` from the registry when it names another version."""
+
+    artifact = MODEL_STORE.get() if _is_production(model_path) else MODEL_REGISTRY.get(model_path)
     return (
-        MODEL_CACHE["pipeline"],
-        MODEL_CACHE["metadata"],
-        MODEL_CACHE["feature_columns"],
-        MODEL_CACHE["model_path"],
-        MODEL_CACHE["loaded_at"],
+        artifact.predictor,
+        artifact.metadata,
+        artifact.feature_columns,
+        artifact.model_path,
+        artifact.loaded_at,
     )
 
 
-def _resolve_db_config() -> Dict[str, str]:
+@lru_cache(maxsize=1)
+def _db_config() -> Dict[str, str]:
+    """Resolve the DB settings (and read the .env files) on first use, not at import."""
+
     args = SimpleNamespace(host=None, port=None, database=None, user=None, password=None)
     return resolve_db_config(args)
 
 
-DB_CONFIG = _resolve_db_config()
+DB_POOL = ConnectionPool(_db_config, PoolSettings.from_env())
+FEATURE_STORE = FeatureStore(DB_POOL.connection, full_reload_seconds=FEATURE_STORE_FULL_RELOAD_SECONDS)
+FEATURE_STORE_LOCK = Lock()
+FEATURE_STORE_STATE: Dict[str, float] = {"retry_at": 0.0}
+RESPONSE_CACHE = ResponseCache.from_env()
+ADMISSION = AdmissionController(AdmissionSettings.from_env())
+INFLIGHT = SingleFlight(timeout=float(os.getenv("ML_COALESCE_TIMEOUT", "10")))
+
+METRICS = MetricsRegistry()
+REQUESTS_TOTAL = METRICS.counter(
+    "recommendation_requests_total", "HTTP requests by endpoint and status.", ("endpoint", "status")
+)
+REQUEST_SECONDS = METRICS.histogram(
+    "recommendation_request_duration_seconds", "End-to-end request latency.", ("endpoint",)
+)
+STAGE_SECONDS = METRICS.histogram(
+    "recommendation_stage_duration_seconds", "Latency of each recommendation processing stage.", ("stage",)
+)
+ERRORS_TOTAL = METRICS.counter(
+    "recommendation_errors_total", "Failed requests by endpoint and error type.", ("endpoint", "type")
+)
+CACHE_RESULTS_TOTAL = METRICS.counter(
+    "recommendation_cache_results_total", "Response cache outcome per /recommend request.", ("result",)
+)
+RESPONSES_TOTAL = METRICS.counter(
+    "recommendation_predictions_served_total", "Prediction sets served by source.", ("endpoint", "source")
+)
+FEATURE_LOOKUPS_TOTAL = METRICS.counter(
+    "recommendation_feature_lookups_total", "Feature frame lookups by source (store or database).", ("source",)
+)
+METRICS.gauge(
+    "recommendation_model_info",
+    "Model artifact currently served (value is always 1).",
+    ("model", "version"),
+    collect=lambda: [
+        ({"model": artifact.model_path.name, "version": _model_version(artifact.model_path, artifact.loaded_at)}, 1)
+        for artifact in [MODEL_STORE.current]
+        if artifact is not None
+    ],
+)
+METRICS.gauge(
+    "recommendation_db_pool",
+    "Connection pool occupancy and cumulative wait counters.",
+    ("field",),
+    collect=lambda: [
+        ({"field": name}, value)
+        for name, value in DB_POOL.stats().items()
+        if name in {"size", "idle", "in_use", "checkouts", "waits", "timeouts", "wait_seconds_total"}
+    ],
+)
+METRICS.gauge(
+    "recommendation_admission",
+    "Admission control occupancy and cumulative outcome counters.",
+    ("field",),
+    collect=lambda: [
+        ({"field": name}, value)
+        for name, value in ADMISSION.stats().items()
+        if name not in {"max_concurrent", "max_queue", "queue_timeout"}
+    ],
+)
+METRICS.gauge(
+    "recommendation_shadow",
+    "Shadow scoring counters and candidate-vs-production agreement.",
+    ("field",),
+    collect=lambda: [
+        ({"field": name}, value)
+        for name, value in SHADOW.stats().items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and name != "max_pending"
+    ],
+)
+METRICS.gauge(
+    "recommendation_response_cache_entries",
+    "Entries held by the response cache.",
+    collect=lambda: [({}, RESPONSE_CACHE.stats()["size"])],
+)
+# Maps the public error message of a failed response to a low-cardinality label.
+ERROR_TYPES = {
+    "Invalid request payload": "invalid_payload",
+    "Model artifacts unavailable": "model_unavailable",
+    "No approved data found for the requested barangay/season/year.": "no_data",
+    "Database connections exhausted, retry shortly": "pool_exhausted",
+    "Failed to fetch reference data": "fetch_failed",
+    "Prepared feature frame is empty after preprocessing.": "empty_features",
+    "Model inference failed": "inference_failed",
+    "Model reload failed": "reload_failed",
+    "Forbidden": "forbidden",
+    "Timed out waiting for an identical in-flight request": "coalesce_timeout",
+    "Barangay boundaries unavailable": "geojson_unavailable",
+    "Server overloaded, retry shortly": "overloaded",
+    "Request deadline exceeded": "deadline_exceeded",
+}
+
+
+def _data_watermark(max_age: float = WATERMARK_TTL_SECONDS) -> Optional[str]:
+    """Approved-data watermark, re-read from the database when older than ``max_age`` seconds.
+
+    Returns the last known value (``None`` before the first successful read)
+    when the database cannot be reached.
+    """
+
+    now = time.monotonic()
+    with WATERMARK_LOCK:
+        if now - WATERMARK_STATE["checked_at"] < max_age:
+            return WATERMARK_STATE["value"]
+        WATERMARK_STATE["checked_at"] = now
+        previous = WATERMARK_STATE["value"]
+
+    try:
+        with DB_POOL.connection() as conn:
+            value = fetch_data_watermark(conn)
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Could not refresh the approved-data watermark", exc_info=True)
+        return previous
+
+    # Bring the feature store up to date before publishing the new watermark,
+    # so responses computed after it changes never use older features.
+    if value != previous and FEATURE_STORE.ready:
+        try:
+            FEATURE_STORE.refresh()
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.warning("Could not refresh the feature store", exc_info=True)
+
+    with WATERMARK_LOCK:
+        WATERMARK_STATE["value"] = value
+    return value
+
+
+def _load_valid_snapshot(model_path: Path) -> Optional[RecommendationSnapshot]:
+    """Load the snapshot materialized for ``model_path`` if it matches the current data."""
+
+    directory = snapshot_dir_for(Path(model_path), SNAPSHOT_DIR)
+    if not (directory / "manifest.json").is_file():
+        return None
+
+    try:
+        snapshot = RecommendationSnapshot.load(directory)
+    except (OSError, ValueError):
+        LOGGER.warning("Ignoring unreadable recommendation snapshot at %s", directory, exc_info=True)
+        return None
+
+    watermark = _data_watermark(max_age=0)
+    if watermark is None:
+        LOGGER.warning("Could not verify snapshot watermark; serving %s unverified", directory)
+        return snapshot
+
+    if watermark != snapshot.watermark:
+        LOGGER.info(
+            "Ignoring stale recommendation snapshot %s (snapshot=%s, database=%s)",
+            directory,
+            snapshot.watermark,
+            watermark,
+        )
+        return None
+
+    return snapshot
+
+
+def _get_snapshot(model_path: Path) -> Optional[RecommendationSnapshot]:
+    """Return the active snapshot, re-validating it at most every ``SNAPSHOT_RECHECK_SECONDS``.
+
+    Only the request that finds the check due pays for it; concurrent requests
+    keep using the previous answer.
+    """
+
+    now = time.monotonic()
+    with SNAPSHOT_LOCK:
+        model_changed = SNAPSHOT_STATE["model_path"] != model_path
+        if not model_changed and now - SNAPSHOT_STATE["checked_at"] < SNAPSHOT_RECHECK_SECONDS:
+            return SNAPSHOT_STATE["snapshot"]
+        SNAPSHOT_STATE["checked_at"] = now
+        if model_changed:
+            SNAPSHOT_STATE["model_path"] = model_path
+            SNAPSHOT_STATE["snapshot"] = None
+
+    snapshot = _load_valid_snapshot(model_path)
+    with SNAPSHOT_LOCK:
+        if SNAPSHOT_STATE["model_path"] == model_path:
+            SNAPSHOT_STATE["snapshot"] = snapshot
+    return snapshot
+
+
+def _snapshot_at(model_path: Path, watermark: Optional[str]) -> Optional[RecommendationSnapshot]:
+    """The active snapshot, unless it was built under a different watermark than ``watermark``.
+
+    :func:`_get_snapshot` only re-validates periodically, so a response whose
+    ETag carries the current watermark must not be answered from a snapshot
+    of older data in the meantime.
+    """
+
+    snapshot = _get_snapshot(model_path)
+    if snapshot is not None and watermark is not None and snapshot.watermark != watermark:
+        return None
+    return snapshot
 
 
 def _season_to_filter(season: str) -> str:
@@ -139,34 +636,269 @@ def _season_to_filter(season: str) -> str:
     return normalized
 
 
-def _determine_target_year(conn, barangay_id: int, season: str, year: int) -> Optional[int]:
-    query = """
-        SELECT MAX(year) AS latest_year
-        FROM barangay_yields
-        WHERE status = 'approved'
-          AND barangay_id = %s
-          AND LOWER(season) = LOWER(%s)
-          AND year <= %s
+SEASON_DB_LABELS = {"wet": "Wet", "dry": "Dry"}
+SEASON_MONTHS = {"wet": [6, 7, 8, 9, 10, 11], "dry": [12, 1, 2, 3, 4, 5]}
+
+# Both statements resolve the target year (latest approved year <= requested,
+# else latest approved year overall) inside the statement itself, so a request
+# costs one round trip. ``season`` is compared against the stored 'Wet'/'Dry'
+# labels (enforced by a CHECK constraint) instead of LOWER(season), which keeps
+# the (barangay_id, season, year) predicates usable by an index.
+FEATURE_QUERY = """
+    WITH target AS (
+        SELECT COALESCE(
+            (
+                SELECT MAX(year)
+                FROM barangay_yields
+                WHERE status = 'approved'
+                  AND barangay_id = $1
+                  AND season = $2
+                  AND year <= $4
+            ),
+            (
+                SELECT MAX(year)
+                FROM barangay_yields
+                WHERE status = 'approved'
+                  AND barangay_id = $1
+                  AND season = $2
+            )
+        ) AS year
+    ), price_lookup AS (
+        SELECT
+            p.crop_id,
+            AVG(p.price_per_kg) AS avg_price_per_kg
+        FROM barangay_crop_prices p
+        JOIN target t ON p.year = t.year
+        WHERE p.status = 'approved'
+          AND p.barangay_id = $1
+          AND p.month = ANY($3)
+        GROUP BY p.crop_id
+    ), ranked_records AS (
+        SELECT
+            y.barangay_id,
+            COALESCE(b.adm3_en, CONCAT('Barangay ', y.barangay_id)) AS barangay_name,
+            y.crop_id,
+            COALESCE(c.crop_name, CONCAT('Crop ', y.crop_id)) AS crop_name,
+            y.total_yield,
+            y.total_area_planted_ha,
+            y.yield_per_hectare,
+            COALESCE(pl.avg_price_per_kg, 0) AS avg_price_per_kg,
+            ROW_NUMBER() OVER (
+                PARTITION BY y.crop_id
+                ORDER BY y.year DESC
+            ) AS row_rank
+        FROM barangay_yields y
+        JOIN target t ON y.year = t.year
+        LEFT JOIN barangays b ON b.barangay_id = y.barangay_id
+        LEFT JOIN crops c ON c.crop_id = y.crop_id
+        LEFT JOIN price_lookup pl ON pl.crop_id = y.crop_id
+        WHERE y.status = 'approved'
+          AND y.barangay_id = $1
+          AND y.season = $2
+    )
+    SELECT
+        barangay_id,
+        barangay_name,
+        crop_id,
+        crop_name,
+        $4 AS year,
+        LOWER($2) AS season,
+        total_yield,
+        total_area_planted_ha,
+        yield_per_hectare,
+        avg_price_per_kg
+    FROM ranked_records
+    WHERE row_rank = 1
+    ORDER BY crop_id
+"""
+
+BATCH_FEATURE_QUERY = """
+    WITH requests AS (
+        SELECT
+            r.request_index - 1 AS request_index,
+            r.barangay_id,
+            r.season_label,
+            LOWER(r.season_label) AS season,
+            r.year
+        FROM unnest($1::int[], $2::text[], $3::int[])
+             WITH ORDINALITY AS r(barangay_id, season_label, year, request_index)
+    ), targets AS (
+        SELECT
+            r.*,
+            CASE
+                WHEN r.season = 'wet' THEN ARRAY[6, 7, 8, 9, 10, 11]
+                ELSE ARRAY[12, 1, 2, 3, 4, 5]
+            END AS months,
+            COALESCE(
+                (
+                    SELECT MAX(y.year)
+                    FROM barangay_yields y
+                    WHERE y.status = 'approved'
+                      AND y.barangay_id = r.barangay_id
+                      AND y.season = r.season_label
+                      AND y.year <= r.year
+                ),
+                (
+                    SELECT MAX(y.year)
+                    FROM barangay_yields y
+                    WHERE y.status = 'approved'
+                      AND y.barangay_id = r.barangay_id
+                      AND y.season = r.season_label
+                )
+            ) AS target_year
+        FROM requests r
+    ), price_lookup AS (
+        SELECT
+            t.request_index,
+            p.crop_id,
+            AVG(p.price_per_kg) AS avg_price_per_kg
+        FROM targets t
+        JOIN barangay_crop_prices p
+          ON p.barangay_id = t.barangay_id
+         AND p.year = t.target_year
+         AND p.month = ANY(t.months)
+        WHERE p.status = 'approved'
+        GROUP BY t.request_index, p.crop_id
+    ), ranked_records AS (
+        SELECT
+            t.request_index,
+            y.barangay_id,
+            COALESCE(b.adm3_en, CONCAT('Barangay ', y.barangay_id)) AS barangay_name,
+            y.crop_id,
+            COALESCE(c.crop_name, CONCAT('Crop ', y.crop_id)) AS crop_name,
+            t.year,
+            t.season,
+            y.total_yield,
+            y.total_area_planted_ha,
+            y.yield_per_hectare,
+            COALESCE(pl.avg_price_per_kg, 0) AS avg_price_per_kg,
+            ROW_NUMBER() OVER (
+                PARTITION BY t.request_index, y.crop_id
+                ORDER BY y.year DESC
+            ) AS row_rank
+        FROM targets t
+        JOIN barangay_yields y
+          ON y.barangay_id = t.barangay_id
+         AND y.season = t.season_label
+         AND y.year = t.target_year
+        LEFT JOIN barangays b ON b.barangay_id = y.barangay_id
+        LEFT JOIN crops c ON c.crop_id = y.crop_id
+        LEFT JOIN price_lookup pl
+          ON pl.request_index = t.request_index
+         AND pl.crop_id = y.crop_id
+        WHERE y.status = 'approved'
+    )
+    SELECT
+        request_index,
+        barangay_id,
+        barangay_name,
+        crop_id,
+        crop_name,
+        year,
+        season,
+        total_yield,
+        total_area_planted_ha,
+        yield_per_hectare,
+        avg_price_per_kg
+    FROM ranked_records
+    WHERE row_rank = 1
+    ORDER BY request_index, crop_id
+"""
+
+# Every barangay of one season: the per-key year fallback of FEATURE_QUERY
+# becomes a GROUP BY over barangay_yields, so the whole map is one statement.
+# ``request_index`` numbers the barangays in id order.
+MAP_FEATURE_QUERY = """
+    WITH targets AS (
+        SELECT
+            y.barangay_id,
+            COALESCE(MAX(y.year) FILTER (WHERE y.year <= $3), MAX(y.year)) AS target_year
+        FROM barangay_yields y
+        WHERE y.status = 'approved'
+          AND y.season = $1
+        GROUP BY y.barangay_id
+    ), price_lookup AS (
+        SELECT
+            p.barangay_id,
+            p.crop_id,
+            AVG(p.price_per_kg) AS avg_price_per_kg
+        FROM targets t
+        JOIN barangay_crop_prices p
+          ON p.barangay_id = t.barangay_id
+         AND p.year = t.target_year
+        WHERE p.status = 'approved'
+          AND p.month = ANY($2)
+        GROUP BY p.barangay_id, p.crop_id
+    ), ranked_records AS (
+        SELECT
+            y.barangay_id,
+            COALESCE(b.adm3_en, CONCAT('Barangay ', y.barangay_id)) AS barangay_name,
+            y.crop_id,
+            COALESCE(c.crop_name, CONCAT('Crop ', y.crop_id)) AS crop_name,
+            y.total_yield,
+            y.total_area_planted_ha,
+            y.yield_per_hectare,
+            COALESCE(pl.avg_price_per_kg, 0) AS avg_price_per_kg,
+            ROW_NUMBER() OVER (
+                PARTITION BY y.barangay_id, y.crop_id
+                ORDER BY y.year DESC
+            ) AS row_rank
+        FROM targets t
+        JOIN barangay_yields y
+          ON y.barangay_id = t.barangay_id
+         AND y.season = $1
+         AND y.year = t.target_year
+        LEFT JOIN barangays b ON b.barangay_id = y.barangay_id
+        LEFT JOIN crops c ON c.crop_id = y.crop_id
+        LEFT JOIN price_lookup pl
+          ON pl.barangay_id = y.barangay_id
+         AND pl.crop_id = y.crop_id
+        WHERE y.status = 'approved'
+    )
+    SELECT
+        DENSE_RANK() OVER (ORDER BY barangay_id) - 1 AS request_index,
+        barangay_id,
+        barangay_name,
+        crop_id,
+        crop_name,
+        $3 AS year,
+        LOWER($1) AS season,
+        total_yield,
+        total_area_planted_ha,
+        yield_per_hectare,
+        avg_price_per_kg
+    FROM ranked_records
+    WHERE row_rank = 1
+    ORDER BY barangay_id, crop_id
+"""
+
+PREPARED_STATEMENTS: Dict[str, Tuple[str, str]] = {
+    "recommend_features": ("int, text, int[], int", FEATURE_QUERY),
+    "recommend_features_batch": ("int[], text[], int[]", BATCH_FEATURE_QUERY),
+    "recommend_features_map": ("text, int[], int", MAP_FEATURE_QUERY),
+}
+PREPARED_LOCK = Lock()
+PREPARED_ON: "WeakKeyDictionary[object, set]" = WeakKeyDictionary()
+
+
+def _execute_prepared(conn, name: str, params: Sequence[object]) -> pd.DataFrame:
+    """Run a server-side prepared statement, preparing it on first use per connection.
+
+    Prepared statements live as long as the session, so pooled connections
+    pay the PREPARE once and every later request only sends EXECUTE.
     """
-    with conn.cursor() as cursor:
-        cursor.execute(query, (barangay_id, season, year))
-        row = cursor.fetchone()
-        latest_year = row[0] if row else None
-
-    if latest_year is None:
-        fallback_query = """
-            SELECT MAX(year) AS latest_year
-            FROM barangay_yields
-            WHERE status = 'approved'
-              AND barangay_id = %s
-              AND LOWER(season) = LOWER(%s)
-        """
+
+    with PREPARED_LOCK:
+        prepared = PREPARED_ON.setdefault(conn, set())
+
+    if name not in prepared:
+        param_types, sql = PREPARED_STATEMENTS[name]
         with conn.cursor() as cursor:
-            cursor.execute(fallback_query, (barangay_id, season))
-            row = cursor.fetchone()
-            latest_year = row[0] if row else None
+            cursor.execute(f"PREPARE {name} ({param_types}) AS {sql}")
+        prepared.add(name)
 
-    return latest_year
+    placeholders = ", ".join(["%s"] * len(params))
+    return pd.read_sql_query(f"EXECUTE {name} ({placeholders})", conn, params=list(params))
 
 
 def _fetch_feature_frame(
@@ -175,79 +907,160 @@ def _fetch_feature_frame(
     season: str,
     year: int,
 ) -> pd.DataFrame:
-    target_year = _determine_target_year(conn, barangay_id, season, year)
-    if target_year is None:
-        return pd.DataFrame()
-
-    query = """
-        WITH price_lookup AS (
-            SELECT
-                p.barangay_id,
-                p.crop_id,
-                p.year,
-                AVG(p.price_per_kg) AS avg_price_per_kg
-            FROM barangay_crop_prices p
-            WHERE p.status = 'approved'
-              AND p.barangay_id = %s
-              AND ((%s = 'wet' AND p.month BETWEEN 6 AND 11)
-                   OR (%s = 'dry' AND (p.month = 12 OR p.month BETWEEN 1 AND 5)))
-            GROUP BY p.barangay_id, p.crop_id, p.year
-        ), ranked_records AS (
-            SELECT
-                y.barangay_id,
-                COALESCE(b.adm3_en, CONCAT('Barangay ', y.barangay_id)) AS barangay_name,
-                y.crop_id,
-                COALESCE(c.crop_name, CONCAT('Crop ', y.crop_id)) AS crop_name,
-                y.year,
-                LOWER(y.season) AS season,
-                y.total_yield,
-                y.total_area_planted_ha,
-                y.yield_per_hectare,
-                COALESCE(pl.avg_price_per_kg, 0) AS avg_price_per_kg,
-                ROW_NUMBER() OVER (
-                    PARTITION BY y.crop_id
-                    ORDER BY y.year DESC
-                ) AS row_rank
-            FROM barangay_yields y
-            LEFT JOIN barangays b USING (barangay_id)
-            LEFT JOIN crops c USING (crop_id)
-            LEFT JOIN price_lookup pl
-              ON pl.barangay_id = y.barangay_id
-             AND pl.crop_id = y.crop_id
-             AND pl.year = y.year
-            WHERE y.status = 'approved'
-              AND y.barangay_id = %s
-              AND LOWER(y.season) = LOWER(%s)
-              AND y.year = %s
-        )
-        SELECT
-            barangay_id,
-            barangay_name,
-            crop_id,
-            crop_name,
-            %s AS year,
-            %s AS season,
-            total_yield,
-            total_area_planted_ha,
-            yield_per_hectare,
-            avg_price_per_kg
-        FROM ranked_records
-        WHERE row_rank = 1
-        ORDER BY crop_id
+    """Fetch the latest approved feature rows for one request in a single round trip."""
+
+    params = (barangay_id, SEASON_DB_LABELS[season], SEASON_MONTHS[season], year)
+    return _execute_prepared(conn, "recommend_features", params)
+
+
+def _fetch_batch_feature_frame(
+    conn,
+    keys: List[Tuple[int, str, int]],
+) -> pd.DataFrame:
+    """Fetch feature rows for many (barangay_id, season, year) keys in one query.
+
+    ``request_index`` in the result is the position of the key in ``keys``.
+    Year fallback matches :func:`_fetch_feature_frame` for every key.
     """
 
     params = (
-        barangay_id,
-        season,
-        season,
-        barangay_id,
-        season,
-        target_year,
-        year,
-        season,
+        [key[0] for key in keys],
+        [SEASON_DB_LABELS[key[1]] for key in keys],
+        [key[2] for key in keys],
     )
+    return _execute_prepared(conn, "recommend_features_batch", params)
+
 
-    return pd.read_sql_query(query, conn, params=params)
+def _fetch_map_feature_frame(conn, season: str, year: int) -> pd.DataFrame:
+    """Fetch feature rows for every barangay with approved ``season`` data in one query."""
+
+    return _execute_prepared(conn, "recommend_features_map", (SEASON_DB_LABELS[season], SEASON_MONTHS[season], year))
+
+
+def _feature_store_ready() -> bool:
+    """Whether lookups can use :data:`FEATURE_STORE`, loading it on first use.
+
+    One caller loads while the others keep querying Postgres; a failed load
+    is retried after ``FEATURE_STORE_RETRY_SECONDS``.
+    """
+
+    if not FEATURE_STORE_ENABLED:
+        return False
+    if FEATURE_STORE.ready:
+        return True
+
+    now = time.monotonic()
+    with FEATURE_STORE_LOCK:
+        if now < FEATURE_STORE_STATE["retry_at"]:
+            return False
+        FEATURE_STORE_STATE["retry_at"] = now + FEATURE_STORE_RETRY_SECONDS
+    try:
+        FEATURE_STORE.load()
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Could not load the feature store; querying Postgres", exc_info=True)
+        return False
+    return True
+
+
+def _features_for(barangay_id: int, season: str, year: int) -> pd.DataFrame:
+    """Feature rows for one key, from the in-memory store when it is loaded."""
+
+    if _feature_store_ready():
+        FEATURE_LOOKUPS_TOTAL.inc(source="store")
+        return FEATURE_STORE.frame([(barangay_id, season, year)])
+    FEATURE_LOOKUPS_TOTAL.inc(source="database")
+    with DB_POOL.connection() as conn:
+        return _fetch_feature_frame(conn, barangay_id, season, year)
+
+
+def _batch_features_for(keys: List[Tuple[int, str, int]]) -> pd.DataFrame:
+    """Batch counterpart of :func:`_features_for` (rows carry ``request_index``)."""
+
+    if _feature_store_ready():
+        FEATURE_LOOKUPS_TOTAL.inc(source="store")
+        return FEATURE_STORE.frame(keys, with_request_index=True)
+    FEATURE_LOOKUPS_TOTAL.inc(source="database")
+    with DB_POOL.connection() as conn:
+        return _fetch_batch_feature_frame(conn, keys)
+
+
+def _map_features_for(season: str, year: int) -> Tuple[List[Tuple[int, str, int]], pd.DataFrame]:
+    """Keys and feature rows (with ``request_index``) for every barangay of ``season``."""
+
+    if _feature_store_ready():
+        FEATURE_LOOKUPS_TOTAL.inc(source="store")
+        snapshot = FEATURE_STORE.snapshot
+        keys = [(barangay_id, season, year) for barangay_id in snapshot.barangay_ids(season)]
+        return keys, snapshot.frame(keys, with_request_index=True)
+    FEATURE_LOOKUPS_TOTAL.inc(source="database")
+    with DB_POOL.connection() as conn:
+        frame = _fetch_map_feature_frame(conn, season, year)
+    barangay_ids = frame.drop_duplicates("request_index").sort_values("request_index")["barangay_id"]
+    return [(int(barangay_id), season, year) for barangay_id in barangay_ids], frame
+
+
+def _normalize_barangay_name(value) -> str:
+    """Python port of ``normalizeBarangayName`` in ``GeospatialMap.jsx``."""
+
+    name = str(value or "").lower()
+    name = re.sub(r"\bsta\.?\b", "santa", name)
+    name = re.sub(r"\bsto\.?\b", "santo", name)
+    name = re.sub(r"\((.*?)\)", r"-\1", name)
+    name = re.sub(r"[^a-z0-9]+", "-", name)
+    return name.strip("-") or "barangay"
+
+
+@lru_cache(maxsize=2)
+def _load_barangay_geojson(path: Path, signature) -> Dict[str, object]:
+    # ``signature`` (size/mtime) is part of the cache key so an edited file is re-read.
+    with path.open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _merge_map_geojson(body: Dict[str, object]) -> Dict[str, object]:
+    """Attach each barangay's recommendations to its boundary feature's properties."""
+
+    collection = _load_barangay_geojson(BARANGAY_GEOJSON_PATH, file_signature(BARANGAY_GEOJSON_PATH))
+    by_name = {_normalize_barangay_name(entry["barangay_name"]): entry for entry in body["results"]}
+
+    features = []
+    for feature in collection.get("features", []):
+        properties = feature.get("properties") or {}
+        entry = by_name.get(_normalize_barangay_name(properties.get("ADM4_EN") or properties.get("name")))
+        features.append(
+            {
+                **feature,
+                "properties": {
+                    **properties,
+                    "barangay_id": entry["barangay_id"] if entry else None,
+                    "best_crop": entry["best_crop"] if entry else None,
+                    "predictions": entry["predictions"] if entry else [],
+                },
+            }
+        )
+
+    merged = {key: value for key, value in collection.items() if key != "features"}
+    merged.update({key: body[key] for key in ("model", "metadata", "context") if key in body})
+    merged["features"] = features
+    return merged
+
+
+def _normalize_top_k(raw) -> int:
+    try:
+        top_k = int(raw)
+    except (TypeError, ValueError):
+        top_k = DEFAULT_TOP_K
+    return max(1, min(top_k, MAX_TOP_K))
+
+
+def _parse_recommend_payload(payload: Dict[str, object], default_top_k=DEFAULT_TOP_K) -> Tuple[int, str, int, int]:
+    """Validate a /recommend style payload; raises ``TypeError``/``ValueError``."""
+
+    barangay_id = int(payload.get("barangay_id"))
+    season = _season_to_filter(payload.get("season"))
+    year = int(payload.get("year"))
+    top_k = _normalize_top_k(payload.get("top_k", default_top_k))
+    return barangay_id, season, year, top_k
 
 
 def _prepare_feature_frame(
@@ -307,16 +1120,575 @@ def _attach_feature_metrics(
     return enriched
 
 
+def _score_batch(
+    pipeline,
+    feature_columns: Iterable[str],
+    keys: List[Tuple[int, str, int]],
+    feature_frame: pd.DataFrame,
+) -> Dict[int, pd.DataFrame]:
+    """Prepare every key's rows, then score all of them with one ``predict_proba`` call."""
+
+    if feature_frame.empty:
+        return {}
+
+    prepared = []
+    for request_index, group in feature_frame.groupby("request_index", sort=True):
+        barangay_id, season, year = keys[int(request_index)]
+        prepared.append(_prepare_feature_frame(group.reset_index(drop=True), barangay_id, season, year))
+
+    if not prepared:
+        return {}
+
+    combined = pd.concat(prepared, ignore_index=True)
+    combined["probability"] = pipeline.predict_proba(combined[list(feature_columns)])[:, 1]
+    return {int(request_index): group for request_index, group in combined.groupby("request_index", sort=False)}
+
+
+def _model_version(model_path, loaded_at) -> str:
+    """Identify one loaded artifact; reloading the same file yields a new version."""
+
+    loaded = loaded_at.isoformat() if isinstance(loaded_at, datetime) else ""
+    return f"{Path(str(model_path)).name}@{loaded}"
+
+
+def _model_summary(model_path, loaded_at) -> Dict[str, Optional[str]]:
+    return {
+        "path": str(model_path) if isinstance(model_path, Path) else str(model_path),
+        "loaded_at": loaded_at.isoformat() if isinstance(loaded_at, datetime) else None,
+    }
+
+
+def _recommendation_body(
+    model_path,
+    loaded_at,
+    metadata: Dict[str, object],
+    barangay_id: int,
+    season: str,
+    year: int,
+    predictions: List[Dict[str, object]],
+    source: str,
+) -> Dict[str, object]:
+    return {
+        "success": True,
+        "model": _model_summary(model_path, loaded_at),
+        "context": {
+            "barangay_id": barangay_id,
+            "season": season,
+            "year": year,
+            "rows": len(predictions),
+            "source": source,
+        },
+        "metadata": metadata,
+        "predictions": predictions,
+    }
+
+
+def _parse_flag(raw, default: bool) -> bool:
+    if raw is None:
+        return default
+    if isinstance(raw, bool):
+        return raw
+    return str(raw).strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _parse_response_options(payload: Dict[str, object], args) -> Tuple[Optional[Tuple[str, ...]], bool]:
+    """Read ``fields`` and ``include_metadata`` from the query string ``args`` or the JSON body."""
+
+    raw_fields = args.get("fields", payload.get("fields"))
+    fields = None
+    if raw_fields:
+        if isinstance(raw_fields, str):
+            names = [name.strip() for name in raw_fields.split(",") if name.strip()]
+        elif isinstance(raw_fields, list):
+            names = [str(name).strip() for name in raw_fields]
+        else:
+            raise ValueError("fields must be a list or a comma-separated string")
+        unknown = sorted(set(names) - PREDICTION_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown prediction fields: {', '.join(unknown)}")
+        fields = tuple(dict.fromkeys(names))
+
+    include_metadata = _parse_flag(args.get("include_metadata", payload.get("include_metadata")), True)
+    return fields, include_metadata
+
+
+def _select_fields(predictions: List[Dict[str, object]], fields: Optional[Tuple[str, ...]]) -> List[Dict[str, object]]:
+    if fields is None:
+        return predictions
+    return [{name: entry[name] for name in fields if name in entry} for entry in predictions]
+
+
+def _shape_response(
+    body: Dict[str, object],
+    fields: Optional[Tuple[str, ...]],
+    include_metadata: bool,
+) -> Dict[str, object]:
+    """Apply ``fields``/``include_metadata`` without mutating ``body`` (it may be cached)."""
+
+    if fields is None and include_metadata:
+        return body
+
+    shaped = dict(body)
+    if not include_metadata:
+        shaped.pop("metadata", None)
+    if "predictions" in shaped:
+        shaped["predictions"] = _select_fields(shaped["predictions"], fields)
+    if "results" in shaped and fields is not None:
+        shaped["results"] = [
+            {**entry, "predictions": _select_fields(entry["predictions"], fields)} if "predictions" in entry else entry
+            for entry in shaped["results"]
+        ]
+    return shaped
+
+
+def _etag_for(*parts) -> Optional[str]:
+    """Stable validator for a response; ``None`` when any part (e.g. the watermark) is unknown."""
+
+    if any(part is None for part in parts[:2]):
+        return None
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _dumps(body: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_body(body: object, accepts_gzip: bool) -> Tuple[bytes, bool]:
+    """Serialize ``body``; gzip it when it is large and the client accepts gzip."""
+
+    payload = _dumps(body)
+    if accepts_gzip and len(payload) >= GZIP_MIN_BYTES:
+        return gzip.compress(payload, compresslevel=5), True
+    return payload, False
+
+
+def _json_response(body: object, status: int = 200, etag: Optional[str] = None) -> Response:
+    with STAGE_SECONDS.time(stage="serialize"):
+        payload, gzipped = _encode_body(body, "gzip" in request.accept_encodings)
+    response = Response(payload, status=status, mimetype="application/json")
+    if etag:
+        response.set_etag(etag, weak=True)
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _shadow_compare(
+    candidate_name: str,
+    engineered: pd.DataFrame,
+    primary: List[Dict[str, object]],
+    primary_seconds: float,
+    top_k: int,
+) -> Dict[str, float]:
+    """Rank ``engineered`` with the shadow candidate and compare it with the ranking that was served."""
+
+    candidate = MODEL_REGISTRY.get(MODELS_DIR / candidate_name)
+    scored = engineered.copy()
+    started = time.perf_counter()
+    scored["probability"] = candidate.predictor.predict_proba(scored[list(candidate.feature_columns)])[:, 1]
+    ranked = rank_recommendations(scored, top_k=top_k)
+    candidate_seconds = time.perf_counter() - started
+
+    primary_crops = [int(entry["crop_id"]) for entry in primary]
+    candidate_crops = [int(entry["crop_id"]) for entry in ranked]
+    candidate_probability = dict(zip(scored["crop_id"].astype(int).tolist(), scored["probability"].tolist()))
+    diffs = [
+        abs(float(entry["probability"]) - candidate_probability[crop_id])
+        for entry, crop_id in zip(primary, primary_crops)
+        if crop_id in candidate_probability
+    ]
+    return {
+        "primary_seconds": primary_seconds,
+        "candidate_seconds": candidate_seconds,
+        "top1_agree": primary_crops[:1] == candidate_crops[:1],
+        "topk_overlap": len(set(primary_crops) & set(candidate_crops)) / max(1, len(primary_crops)),
+        "mean_abs_probability_diff": float(np.mean(diffs)) if diffs else 0.0,
+    }
+
+
+def _submit_shadow(
+    model_path: Path,
+    engineered: pd.DataFrame,
+    primary: List[Dict[str, object]],
+    primary_seconds: float,
+    top_k: int,
+) -> None:
+    candidate = SHADOW.candidate
+    if candidate is None or candidate == Path(model_path).name or not primary:
+        return
+    SHADOW.submit(lambda: _shadow_compare(candidate, engineered, primary, primary_seconds, top_k))
+
+
+def _admitted(deadline: Optional[float], compute: Callable[[], Tuple[object, int]]) -> Tuple[object, int]:
+    """Run ``compute`` holding an :data:`ADMISSION` slot; refusals become ``503``/``504`` bodies."""
+
+    try:
+        acquired_at = ADMISSION.acquire(deadline)
+    except AdmissionRejected as exc:
+        return {"success": False, "error": "Server overloaded, retry shortly", "details": str(exc)}, 503
+    except DeadlineExceeded as exc:
+        return {"success": False, "error": "Request deadline exceeded", "details": str(exc)}, 504
+    try:
+        return compute()
+    except DeadlineExceeded as exc:
+        return {"success": False, "error": "Request deadline exceeded", "details": str(exc)}, 504
+    finally:
+        ADMISSION.release(acquired_at)
+
+
+def _coalesced(
+    key: Hashable, compute: Callable[[], Tuple[object, int]], deadline: Optional[float]
+) -> Tuple[Tuple[object, int], bool]:
+    """``INFLIGHT.do(key, compute)``, but a follower waits no longer than its own ``deadline``.
+
+    A follower whose deadline passes first gets the ``504`` body of
+    :func:`_admitted`; one that gives up earlier still raises
+    :class:`SingleFlightTimeout`.
+    """
+
+    timeout = INFLIGHT.timeout
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.perf_counter())
+    try:
+        return INFLIGHT.do(key, compute, timeout=timeout)
+    except SingleFlightTimeout:
+        if deadline is None or time.perf_counter() < deadline:
+            raise
+    body = {
+        "success": False,
+        "error": "Request deadline exceeded",
+        "details": "deadline passed while waiting for an identical in-flight request",
+    }
+    return (body, 504), False
+
+
+def _score_keys(
+    pipeline,
+    feature_columns: Iterable[str],
+    keys: List[Tuple[int, str, int]],
+    deadline: Optional[float] = None,
+) -> Tuple[object, int]:
+    """Fetch and score ``keys`` for ``/recommend/batch``: ``(groups, 200)`` or ``(error body, status)``."""
+
+    check_deadline(deadline, "fetching features")
+    try:
+        with STAGE_SECONDS.time(stage="fetch_features_batch"):
+            feature_frame = _batch_features_for(keys)
+    except PoolTimeoutError as exc:
+        LOGGER.warning("Database pool exhausted: %s", exc)
+        return (
+            {
+                "success": False,
+                "error": "Database connections exhausted, retry shortly",
+                "details": str(exc),
+            },
+            503,
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to fetch batch features for %s keys", len(keys))
+        return (
+            {
+                "success": False,
+                "error": "Failed to fetch reference data",
+                "details": str(exc),
+            },
+            500,
+        )
+
+    check_deadline(deadline, "inference")
+    try:
+        with STAGE_SECONDS.time(stage="score_batch"):
+            return _score_batch(pipeline, feature_columns, keys, feature_frame), 200
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to generate batch recommendations")
+        return (
+            {
+                "success": False,
+                "error": "Model inference failed",
+                "details": str(exc),
+            },
+            500,
+        )
+
+
+def _compute_map_recommendation(
+    artifacts: Tuple[object, Dict[str, object], Sequence[str], Path, datetime],
+    season: str,
+    year: int,
+    top_k: int,
+    cache_version: Hashable,
+    deadline: Optional[float] = None,
+) -> Tuple[Dict[str, object], int]:
+    """Score every barangay of ``season`` at once; ``(body, status)`` like :func:`_compute_live_recommendation`."""
+
+    pipeline, metadata, feature_columns, model_path, loaded_at = artifacts
+    cache_key = ("map", season, year, top_k)
+
+    check_deadline(deadline, "fetching features")
+    try:
+        with STAGE_SECONDS.time(stage="fetch_features_map"):
+            keys, feature_frame = _map_features_for(season, year)
+    except PoolTimeoutError as exc:
+        LOGGER.warning("Database pool exhausted: %s", exc)
+        return (
+            {
+                "success": False,
+                "error": "Database connections exhausted, retry shortly",
+                "details": str(exc),
+            },
+            503,
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to fetch map features for season=%s year=%s", season, year)
+        return (
+            {
+                "success": False,
+                "error": "Failed to fetch reference data",
+                "details": str(exc),
+            },
+            500,
+        )
+
+    check_deadline(deadline, "inference")
+    try:
+        with STAGE_SECONDS.time(stage="score_batch"):
+            scored = _score_batch(pipeline, feature_columns, keys, feature_frame)
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to generate map recommendations")
+        return (
+            {
+                "success": False,
+                "error": "Model inference failed",
+                "details": str(exc),
+            },
+            500,
+        )
+
+    results = []
+    with STAGE_SECONDS.time(stage="attach_metrics"):
+        for request_index, (barangay_id, _, _) in enumerate(keys):
+            group = scored.get(request_index)
+            if group is None:
+                continue
+            predictions = _attach_feature_metrics(rank_recommendations(group, top_k=top_k), group)
+            if not predictions:
+                continue
+            results.append(
+                {
+                    "barangay_id": barangay_id,
+                    "barangay_name": predictions[0].get("barangay_name"),
+                    "best_crop": predictions[0],
+                    "predictions": predictions,
+                }
+            )
+
+    body = {
+        "success": True,
+        "model": _model_summary(model_path, loaded_at),
+        "metadata": metadata,
+        "context": {
+            "season": season,
+            "year": year,
+            "top_k": top_k,
+            "barangays": len(results),
+            "source": "live",
+        },
+        "results": results,
+    }
+    RESPONSES_TOTAL.inc(endpoint="/recommend/map", source="live")
+    RESPONSE_CACHE.put(cache_key, cache_version, (body, 200))
+    return body, 200
+
+
+def _compute_live_recommendation(
+    artifacts: Tuple[object, Dict[str, object], Sequence[str], Path, datetime],
+    barangay_id: int,
+    season: str,
+    year: int,
+    top_k: int,
+    cache_version: Hashable,
+    deadline: Optional[float] = None,
+    pinned: bool = False,
+) -> Tuple[Dict[str, object], int]:
+    """Fetch, score and rank one key; returns ``(body, status)`` for success and failures alike.
+
+    Runs once per key at a time under :data:`INFLIGHT`, so every coalesced
+    waiter receives the same body, including error bodies. Raises
+    :class:`DeadlineExceeded` instead of fetching or predicting past ``deadline``.
+    ``pinned`` results (a non-production version) skip the response cache and
+    shadow scoring.
+    """
+
+    pipeline, metadata, feature_columns, model_path, loaded_at = artifacts
+    cache_key = (barangay_id, season, year, top_k)
+
+    check_deadline(deadline, "fetching features")
+    try:
+        with STAGE_SECONDS.time(stage="fetch_features"):
+            feature_frame = _features_for(barangay_id, season, year)
+    except PoolTimeoutError as exc:
+        LOGGER.warning("Database pool exhausted: %s", exc)
+        return (
+            {
+                "success": False,
+                "error": "Database connections exhausted, retry shortly",
+                "details": str(exc),
+            },
+            503,
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to fetch features for barangay=%s season=%s year=%s", barangay_id, season, year)
+        return (
+            {
+                "success": False,
+                "error": "Failed to fetch reference data",
+                "details": str(exc),
+            },
+            500,
+        )
+
+    if feature_frame.empty:
+        body = {
+            "success": False,
+            "error": "No approved data found for the requested barangay/season/year.",
+        }
+        if not pinned:
+            RESPONSE_CACHE.put(cache_key, cache_version, (body, 404))
+        return body, 404
+
+    with STAGE_SECONDS.time(stage="prepare_features"):
+        engineered = _prepare_feature_frame(feature_frame, barangay_id, season, year)
+    if engineered.empty:
+        return (
+            {
+                "success": False,
+                "error": "Prepared feature frame is empty after preprocessing.",
+            },
+            500,
+        )
+
+    check_deadline(deadline, "inference")
+    try:
+        with STAGE_SECONDS.time(stage="predict"):
+            predict_started = time.perf_counter()
+            recommendations = generate_recommendations(pipeline, engineered, feature_columns, top_k=top_k)
+            predict_seconds = time.perf_counter() - predict_started
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to generate recommendations")
+        return (
+            {
+                "success": False,
+                "error": "Model inference failed",
+                "details": str(exc),
+            },
+            500,
+        )
+
+    with STAGE_SECONDS.time(stage="attach_metrics"):
+        enriched = _attach_feature_metrics(recommendations, engineered)
+
+    response = _recommendation_body(model_path, loaded_at, metadata, barangay_id, season, year, enriched, "live")
+    if pinned:
+        RESPONSES_TOTAL.inc(endpoint="/recommend", source="pinned")
+        return response, 200
+    RESPONSES_TOTAL.inc(endpoint="/recommend", source="live")
+    RESPONSE_CACHE.put(cache_key, cache_version, (response, 200))
+    _submit_shadow(model_path, engineered, recommendations, predict_seconds, top_k)
+    return response, 200
+
+
+def preload() -> Dict[str, object]:
+    """Load and warm the model, its snapshot, the feature store and the DB pool before serving traffic.
+
+    Raises when no model can be loaded, so a server started with ``--preload``
+    fails before it opens its port instead of answering 503s.
+    """
+
+    started = time.perf_counter()
+    artifact = MODEL_STORE.get()
+    _get_snapshot(artifact.model_path)
+    _feature_store_ready()
+    _data_watermark()
+    elapsed = time.perf_counter() - started
+    with STARTUP_LOCK:
+        STARTUP_STATE["preloaded"] = True
+        STARTUP_STATE["preload_seconds"] = round(elapsed, 4)
+    LOGGER.info("Preloaded model %s in %.3fs", artifact.model_path.name, elapsed)
+    return startup_report()
+
+
+def _record_first_request(request_started: float) -> None:
+    now = time.perf_counter()
+    with STARTUP_LOCK:
+        if STARTUP_STATE["first_request_seconds"] is not None:
+            return
+        STARTUP_STATE["first_request_seconds"] = round(now - IMPORT_STARTED, 4)
+        STARTUP_STATE["first_request_latency_seconds"] = round(now - request_started, 4)
+    LOGGER.info(
+        "First successful request %.3fs after import started (took %.3fs)",
+        now - IMPORT_STARTED,
+        now - request_started,
+    )
+
+
+def startup_report() -> Dict[str, object]:
+    """Import, model-load and first-request timings of this process, in seconds."""
+
+    with STARTUP_LOCK:
+        report = dict(STARTUP_STATE)
+    initial_load = MODEL_STORE.stats()["initial_load"]
+    report["model_load_seconds"] = initial_load.get("load_seconds")
+    report["model_warm_up_seconds"] = initial_load.get("warm_up_seconds")
+    return report
+
+
 def create_app() -> Flask:
     app = Flask(__name__)
 
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.deadline = deadline_from_header(request.headers.get(DEADLINE_HEADER), g.request_started)
+
+    @app.after_request
+    def _record_request(response):
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        started = g.get("request_started")
+        if started is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, status=response.status_code)
+        if response.status_code == 503 and "Retry-After" not in response.headers:
+            response.headers["Retry-After"] = str(ADMISSION.retry_after())
+        if started is not None and response.status_code < 400 and STARTUP_STATE["first_request_seconds"] is None:
+            if endpoint in {"/recommend", "/recommend/batch", "/recommend/map"}:
+                _record_first_request(started)
+        if response.status_code >= 400:
+            body = response.get_json(silent=True) if response.is_json and not response.content_encoding else None
+            message = body.get("error") if isinstance(body, dict) else None
+            ERRORS_TOTAL.inc(endpoint=endpoint, type=ERROR_TYPES.get(message, f"http_{response.status_code}"))
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
     @app.route("/recommend", methods=["POST"])
     def recommend():
         payload = request.get_json(silent=True) or {}
         try:
-            barangay_id = int(payload.get("barangay_id"))
-            season = _season_to_filter(payload.get("season"))
-            year = int(payload.get("year"))
+            barangay_id, season, year, top_k = _parse_recommend_payload(payload)
+            fields, include_metadata = _parse_response_options(payload, request.args)
+            requested_model = payload.get("model") or request.headers.get(MODEL_VERSION_HEADER)
+            requested_path = _resolve_model_name(requested_model) if requested_model else None
         except (TypeError, ValueError) as exc:
             return (
                 jsonify(
@@ -329,15 +1701,9 @@ def create_app() -> Flask:
                 400,
             )
 
-        top_k_raw = payload.get("top_k", DEFAULT_TOP_K)
-        try:
-            top_k = int(top_k_raw)
-        except (TypeError, ValueError):
-            top_k = DEFAULT_TOP_K
-        top_k = max(1, min(top_k, 10))
-
         try:
-            pipeline, metadata, feature_columns, model_path, loaded_at = _get_cached_artifacts()
+            with STAGE_SECONDS.time(stage="load_artifacts"):
+                pipeline, metadata, feature_columns, model_path, loaded_at = _get_cached_artifacts(requested_path)
         except Exception as exc:  # pylint: disable=broad-except
             LOGGER.exception("Failed to load model artifacts")
             return (
@@ -351,79 +1717,456 @@ def create_app() -> Flask:
                 500,
             )
 
+        # Cached bodies are keyed by the data watermark too, so a body is
+        # never labelled with the ETag of newer data than it was computed from.
+        with STAGE_SECONDS.time(stage="etag"):
+            watermark = _data_watermark()
+            cache_version = (_model_version(model_path, loaded_at), watermark)
+            cache_key = (barangay_id, season, year, top_k)
+            etag = _etag_for(*cache_version, cache_key, fields, include_metadata)
+        if etag and request.if_none_match.contains_weak(etag):
+            CACHE_RESULTS_TOTAL.inc(result="not_modified")
+            return _not_modified(etag)
+
+        deadline = g.deadline
+        if not _is_production(model_path):
+            # The response cache and snapshots only hold production results.
+            body, status = _admitted(
+                deadline,
+                lambda: _compute_live_recommendation(
+                    (pipeline, metadata, feature_columns, model_path, loaded_at),
+                    barangay_id,
+                    season,
+                    year,
+                    top_k,
+                    cache_version,
+                    deadline,
+                    pinned=True,
+                ),
+            )
+            if status != 200:
+                return _json_response(body, status)
+            return _json_response(_shape_response(body, fields, include_metadata), 200, etag)
+
+        with STAGE_SECONDS.time(stage="cache_lookup"):
+            cached = RESPONSE_CACHE.get(cache_key, cache_version)
+        CACHE_RESULTS_TOTAL.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            body, status = cached
+            if status == 200:
+                RESPONSES_TOTAL.inc(endpoint="/recommend", source="cache")
+            cached_response = _json_response(
+                _shape_response(body, fields, include_metadata),
+                status,
+                etag if status == 200 else None,
+            )
+            cached_response.headers["X-Cache"] = "HIT"
+            return cached_response
+
+        with STAGE_SECONDS.time(stage="snapshot_lookup"):
+            snapshot = _snapshot_at(model_path, watermark)
+            snapshot_predictions = snapshot.lookup(barangay_id, season, year, top_k) if snapshot else None
+        if snapshot_predictions is not None:
+            if not snapshot_predictions:
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "error": "No approved data found for the requested barangay/season/year.",
+                        }
+                    ),
+                    404,
+                )
+            response = _recommendation_body(
+                model_path, loaded_at, metadata, barangay_id, season, year, snapshot_predictions, "snapshot"
+            )
+            RESPONSES_TOTAL.inc(endpoint="/recommend", source="snapshot")
+            return _json_response(_shape_response(response, fields, include_metadata), 200, etag)
+
+        def compute():
+            return _admitted(
+                deadline,
+                lambda: _compute_live_recommendation(
+                    (pipeline, metadata, feature_columns, model_path, loaded_at),
+                    barangay_id,
+                    season,
+                    year,
+                    top_k,
+                    cache_version,
+                    deadline,
+                ),
+            )
+
+        try:
+            (body, status), shared = _coalesced((cache_version, cache_key), compute, deadline)
+        except SingleFlightTimeout as exc:
+            LOGGER.warning("Gave up waiting for a coalesced request: %s", exc)
+            response = _json_response(
+                {
+                    "success": False,
+                    "error": "Timed out waiting for an identical in-flight request",
+                    "details": str(exc),
+                },
+                503,
+            )
+            response.headers["Retry-After"] = "1"
+            return response
+
+        if shared and status == 504 and (deadline is None or time.perf_counter() < deadline):
+            # The request we waited on ran out of time; ours has not, so do the work ourselves.
+            (body, status), shared = compute(), False
+        if shared:
+            RESPONSES_TOTAL.inc(endpoint="/recommend", source="coalesced")
+        if status != 200:
+            return _json_response(body, status)
+        return _json_response(_shape_response(body, fields, include_metadata), 200, etag)
+
+    @app.route("/recommend/batch", methods=["POST"])
+    def recommend_batch():
+        payload = request.get_json(silent=True) or {}
+        entries = payload.get("requests")
+        if not isinstance(entries, list) or not entries:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Invalid request payload",
+                        "details": "'requests' must be a non-empty list",
+                    }
+                ),
+                400,
+            )
+        if len(entries) > MAX_BATCH_SIZE:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Invalid request payload",
+                        "details": f"at most {MAX_BATCH_SIZE} requests are allowed per batch",
+                    }
+                ),
+                400,
+            )
+
         try:
-            with get_connection(DB_CONFIG) as conn:
-                feature_frame = _fetch_feature_frame(conn, barangay_id, season, year)
+            fields, include_metadata = _parse_response_options(payload, request.args)
+        except ValueError as exc:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Invalid request payload",
+                        "details": str(exc),
+                    }
+                ),
+                400,
+            )
+
+        try:
+            requested_model = payload.get("model") or request.headers.get(MODEL_VERSION_HEADER)
+            requested_path = _resolve_model_name(requested_model) if requested_model else None
+        except ValueError as exc:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Invalid request payload",
+                        "details": str(exc),
+                    }
+                ),
+                400,
+            )
+
+        default_top_k = payload.get("top_k", DEFAULT_TOP_K)
+        parsed: List[object] = []
+        for entry in entries:
+            try:
+                if not isinstance(entry, dict):
+                    raise TypeError("each request must be an object")
+                barangay_id, season, year, top_k = _parse_recommend_payload(entry, default_top_k)
+            except (TypeError, ValueError) as exc:
+                parsed.append(exc)
+                continue
+            parsed.append(((barangay_id, season, year), top_k))
+
+        try:
+            pipeline, metadata, feature_columns, model_path, loaded_at = _get_cached_artifacts(requested_path)
         except Exception as exc:  # pylint: disable=broad-except
-            LOGGER.exception("Failed to fetch features for barangay=%s season=%s year=%s", barangay_id, season, year)
+            LOGGER.exception("Failed to load model artifacts")
             return (
                 jsonify(
                     {
                         "success": False,
-                        "error": "Failed to fetch reference data",
+                        "error": "Model artifacts unavailable",
                         "details": str(exc),
                     }
                 ),
                 500,
             )
 
-        if feature_frame.empty:
+        snapshot = _snapshot_at(model_path, _data_watermark()) if _is_production(model_path) else None
+        snapshot_hits: Dict[int, List[Dict[str, object]]] = {}
+        keys: List[Tuple[int, str, int]] = []
+        key_positions: Dict[Tuple[int, str, int], int] = {}
+        for position, item in enumerate(parsed):
+            if isinstance(item, Exception):
+                continue
+            key, top_k = item
+            hit = snapshot.lookup(*key, top_k) if snapshot else None
+            if hit is not None:
+                snapshot_hits[position] = hit
+            elif key not in key_positions:
+                key_positions[key] = len(keys)
+                keys.append(key)
+
+        scored: Dict[int, pd.DataFrame] = {}
+        if keys:
+            outcome, status = _admitted(
+                g.deadline, lambda: _score_keys(pipeline, feature_columns, keys, g.deadline)
+            )
+            if status != 200:
+                return _json_response(outcome, status)
+            scored = outcome
+
+        results = []
+        for position, item in enumerate(parsed):
+            if isinstance(item, Exception):
+                results.append(
+                    {
+                        "request_index": position,
+                        "success": False,
+                        "status": 400,
+                        "error": "Invalid request payload",
+                        "details": str(item),
+                    }
+                )
+                continue
+
+            (barangay_id, season, year), top_k = item
+            entry = {"request_index": position, "key": f"{barangay_id}:{season}:{year}"}
+            if position in snapshot_hits:
+                predictions = snapshot_hits[position]
+                source = "snapshot"
+            else:
+                group = scored.get(key_positions[(barangay_id, season, year)])
+                predictions = (
+                    _attach_feature_metrics(rank_recommendations(group, top_k=top_k), group)
+                    if group is not None
+                    else []
+                )
+                source = "live"
+
+            if not predictions:
+                entry.update(
+                    {
+                        "success": False,
+                        "status": 404,
+                        "error": "No approved data found for the requested barangay/season/year.",
+                    }
+                )
+                results.append(entry)
+                continue
+
+            entry.update(
+                {
+                    "success": True,
+                    "status": 200,
+                    "context": {
+                        "barangay_id": barangay_id,
+                        "season": season,
+                        "year": year,
+                        "rows": len(predictions),
+                        "source": source,
+                    },
+                    "predictions": predictions,
+                }
+            )
+            results.append(entry)
+            RESPONSES_TOTAL.inc(endpoint="/recommend/batch", source=source)
+
+        response = {
+            "success": True,
+            "model": _model_summary(model_path, loaded_at),
+            "metadata": metadata,
+            "results": results,
+        }
+
+        return _json_response(_shape_response(response, fields, include_metadata), 200)
+
+    @app.route("/recommend/map", methods=["GET"])
+    def recommend_map():
+        args = request.args
+        try:
+            season = _season_to_filter(args.get("season"))
+            year = int(args.get("year"))
+            top_k = _normalize_top_k(args.get("top_k", DEFAULT_MAP_TOP_K))
+            output_format = (args.get("format") or "json").strip().lower()
+            if output_format not in {"json", "geojson"}:
+                raise ValueError("format must be either 'json' or 'geojson'")
+            fields, include_metadata = _parse_response_options({}, args)
+        except (TypeError, ValueError) as exc:
             return (
                 jsonify(
                     {
                         "success": False,
-                        "error": "No approved data found for the requested barangay/season/year.",
+                        "error": "Invalid request payload",
+                        "details": str(exc),
                     }
                 ),
-                404,
+                400,
             )
 
-        engineered = _prepare_feature_frame(feature_frame, barangay_id, season, year)
-        if engineered.empty:
+        try:
+            with STAGE_SECONDS.time(stage="load_artifacts"):
+                pipeline, metadata, feature_columns, model_path, loaded_at = _get_cached_artifacts()
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception("Failed to load model artifacts")
             return (
                 jsonify(
                     {
                         "success": False,
-                        "error": "Prepared feature frame is empty after preprocessing.",
+                        "error": "Model artifacts unavailable",
+                        "details": str(exc),
                     }
                 ),
                 500,
             )
 
+        with STAGE_SECONDS.time(stage="etag"):
+            cache_version = (_model_version(model_path, loaded_at), _data_watermark())
+            cache_key = ("map", season, year, top_k)
+            etag = _etag_for(*cache_version, cache_key, output_format, fields, include_metadata)
+        if etag and request.if_none_match.contains_weak(etag):
+            CACHE_RESULTS_TOTAL.inc(result="not_modified")
+            return _not_modified(etag)
+
+        with STAGE_SECONDS.time(stage="cache_lookup"):
+            cached = RESPONSE_CACHE.get(cache_key, cache_version)
+        CACHE_RESULTS_TOTAL.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            (body, status), shared = cached, False
+            RESPONSES_TOTAL.inc(endpoint="/recommend/map", source="cache")
+        else:
+            try:
+                (body, status), shared = _coalesced(
+                    (cache_version, cache_key),
+                    lambda: _admitted(
+                        g.deadline,
+                        lambda: _compute_map_recommendation(
+                            (pipeline, metadata, feature_columns, model_path, loaded_at),
+                            season,
+                            year,
+                            top_k,
+                            cache_version,
+                            g.deadline,
+                        ),
+                    ),
+                    g.deadline,
+                )
+            except SingleFlightTimeout as exc:
+                LOGGER.warning("Gave up waiting for a coalesced request: %s", exc)
+                response = _json_response(
+                    {
+                        "success": False,
+                        "error": "Timed out waiting for an identical in-flight request",
+                        "details": str(exc),
+                    },
+                    503,
+                )
+                response.headers["Retry-After"] = "1"
+                return response
+
+        if shared:
+            RESPONSES_TOTAL.inc(endpoint="/recommend/map", source="coalesced")
+        if status != 200:
+            return _json_response(body, status)
+
+        shaped = _shape_response(body, fields, include_metadata)
+        if fields is not None:
+            shaped["results"] = [
+                {**entry, "best_crop": _select_fields([entry["best_crop"]], fields)[0]} for entry in shaped["results"]
+            ]
+        if output_format == "geojson":
+            try:
+                with STAGE_SECONDS.time(stage="merge_geojson"):
+                    shaped = _merge_map_geojson(shaped)
+            except (OSError, ValueError) as exc:
+                LOGGER.exception("Failed to read barangay boundaries from %s", BARANGAY_GEOJSON_PATH)
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "error": "Barangay boundaries unavailable",
+                            "details": str(exc),
+                        }
+                    ),
+                    500,
+                )
+        response = _json_response(shaped, 200, etag)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+        return response
+
+    @app.route("/model", methods=["GET"])
+    def model_info():
         try:
-            recommendations = generate_recommendations(pipeline, engineered, feature_columns, top_k=top_k)
+            _, metadata, _, model_path, loaded_at = _get_cached_artifacts()
         except Exception as exc:  # pylint: disable=broad-except
-            LOGGER.exception("Failed to generate recommendations")
+            LOGGER.exception("Failed to load model artifacts")
             return (
                 jsonify(
                     {
                         "success": False,
-                        "error": "Model inference failed",
+                        "error": "Model artifacts unavailable",
                         "details": str(exc),
                     }
                 ),
                 500,
             )
 
-        enriched = _attach_feature_metrics(recommendations, engineered)
+        version = _model_version(model_path, loaded_at)
+        etag = _etag_for(version, "model")
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
 
-        response = {
+        body = {
             "success": True,
-            "model": {
-                "path": str(model_path) if isinstance(model_path, Path) else str(model_path),
-                "loaded_at": loaded_at.isoformat() if isinstance(loaded_at, datetime) else None,
-            },
-            "context": {
-                "barangay_id": barangay_id,
-                "season": season,
-                "year": year,
-                "rows": len(enriched),
-            },
+            "model": {**_model_summary(model_path, loaded_at), "version": version},
             "metadata": metadata,
-            "predictions": enriched,
         }
+        return _json_response(body, 200, etag)
 
-        return jsonify(response), 200
+    @app.route("/models", methods=["GET"])
+    def list_models():
+        current = MODEL_STORE.current
+        resident = set(MODEL_REGISTRY.resident())
+        models = [
+            {
+                "model": path.name,
+                "production": current is not None and current.model_path.name == path.name,
+                "shadow": SHADOW.candidate == path.name,
+                "resident": path.name in resident or (current is not None and current.model_path.name == path.name),
+            }
+            for path in (sorted(MODELS_DIR.glob("random_forest_recommendation_*.joblib")) if MODELS_DIR.exists() else [])
+        ]
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "models": models,
+                    "registry": MODEL_REGISTRY.stats(),
+                    "shadow": SHADOW.stats(),
+                }
+            ),
+            200,
+        )
+
+    @app.route("/cache/stats", methods=["GET"])
+    def cache_stats():
+        return (
+            jsonify({"success": True, "response_cache": RESPONSE_CACHE.stats(), "coalescing": INFLIGHT.stats()}),
+            200,
+        )
 
     @app.route("/health", methods=["GET"])
     def health():
@@ -434,13 +2177,111 @@ def create_app() -> Flask:
         except Exception as exc:  # pylint: disable=broad-except
             status = 503
             payload = {"success": False, "message": str(exc)}
+        payload["db_pool"] = DB_POOL.stats()
+        payload["model_store"] = MODEL_STORE.stats()
+        payload["feature_store"] = FEATURE_STORE.stats()
+        payload["admission"] = ADMISSION.stats()
+        payload["model_registry"] = MODEL_REGISTRY.stats()
+        payload["shadow"] = SHADOW.stats()
+        payload["startup"] = startup_report()
         return jsonify(payload), status
 
+    @app.route("/admin/reload", methods=["POST"])
+    def admin_reload():
+        if ADMIN_TOKEN and not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+            return jsonify({"success": False, "error": "Forbidden"}), 403
+
+        payload = request.get_json(silent=True) or {}
+        model_path = None
+        requested = payload.get("model")
+        if requested:
+            try:
+                model_path = _resolve_model_name(requested)
+            except ValueError as exc:
+                return (
+                    jsonify(
+                        {
+                            "success": False,
+                            "error": "Invalid request payload",
+                            "details": str(exc),
+                        }
+                    ),
+                    400,
+                )
+
+        try:
+            result = MODEL_STORE.reload(model_path, force=bool(payload.get("force")))
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception("Model reload failed")
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Model reload failed",
+                        "details": str(exc),
+                    }
+                ),
+                500,
+            )
+
+        return jsonify({"success": True, **result}), 200
+
+    @app.route("/admin/shadow", methods=["POST"])
+    def admin_shadow():
+        if ADMIN_TOKEN and not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+            return jsonify({"success": False, "error": "Forbidden"}), 403
+
+        payload = request.get_json(silent=True) or {}
+        requested = payload.get("model")
+        try:
+            candidate = _resolve_model_name(requested).name if requested else None
+            sample_rate = float(payload["sample_rate"]) if payload.get("sample_rate") is not None else None
+        except (TypeError, ValueError) as exc:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "Invalid request payload",
+                        "details": str(exc),
+                    }
+                ),
+                400,
+            )
+
+        MODEL_REGISTRY.pin(candidate)
+        SHADOW.configure(candidate, sample_rate)
+        return jsonify({"success": True, "shadow": SHADOW.stats()}), 200
+
     return app
 
 
 app = create_app()
+if SHADOW_MODEL:
+    MODEL_REGISTRY.pin(Path(SHADOW_MODEL).name)
+    SHADOW.configure(Path(SHADOW_MODEL).name)
+STARTUP_STATE["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+LOGGER.info("Recommendation API imported in %.3fs", STARTUP_STATE["import_seconds"])
+
+# WSGI servers import the module and never reach __main__; they opt in here.
+if PRELOAD_MODEL:
+    preload()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve crop recommendations with Flask.")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load and warm the model before opening the port (also ML_PRELOAD_MODEL=1).",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cli_args = parse_args()
+    if cli_args.preload and not PRELOAD_MODEL:
+        preload()
+    app.run(host=cli_args.host, port=cli_args.port, debug=False)
@@ -0,0 +1,212 @@
+"""Compact on-disk snapshot of precomputed barangay crop recommendations.
+
+A snapshot holds the top-k predictions for a fixed set of
+(barangay_id, season, year) keys, computed offline with one specific model by
+``materialize_recommendations.py``. The API answers those keys straight from
+the snapshot and only falls back to live inference for keys it does not hold.
+
+Layout of a snapshot directory (one per model, named after the model stem)::
+
+    keys.npy          structured array: barangay_id, season, year, offset, count
+    predictions.npy   structured array: crop_id, probability, avg_yield,
+                      avg_price, expected_revenue (rank order within a key)
+    manifest.json     model name, data watermark, top_k and name lookups
+
+``predictions.npy`` is opened with ``mmap_mode="r"`` so only the pages that are
+actually served are read into memory. A key with ``count == 0`` is a known
+"no approved data" answer.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SNAPSHOT_FORMAT_VERSION = 1
+SEASON_CODES = {"wet": 0, "dry": 1}
+SEASON_LABELS = {"wet": "Wet", "dry": "Dry"}
+
+KEY_DTYPE = np.dtype(
+    [
+        ("barangay_id", "<i4"),
+        ("season", "u1"),
+        ("year", "<i2"),
+        ("offset", "<i4"),
+        ("count", "<i2"),
+    ]
+)
+PREDICTION_DTYPE = np.dtype(
+    [
+        ("crop_id", "<i4"),
+        ("probability", "<f8"),
+        ("avg_yield", "<f8"),
+        ("avg_price", "<f8"),
+        ("expected_revenue", "<f8"),
+    ]
+)
+
+
+@dataclass(frozen=True)
+class SnapshotEntry:
+    """Predictions materialized for one (barangay_id, season, year) key."""
+
+    barangay_id: int
+    season: str
+    year: int
+    predictions: Sequence[Dict[str, object]]
+
+
+def snapshot_dir_for(model_path: Path, root: Path) -> Path:
+    """Directory that holds the snapshot materialized for ``model_path``."""
+
+    return root / Path(model_path).stem
+
+
+def write_snapshot(
+    directory: Path,
+    entries: Iterable[SnapshotEntry],
+    model_path: Path,
+    top_k: int,
+    watermark: Optional[str],
+) -> Path:
+    """Write ``entries`` to ``directory`` atomically and return the directory."""
+
+    keys: List[Tuple[int, int, int, int, int]] = []
+    rows: List[Tuple[int, float, float, float, float]] = []
+    barangay_names: Dict[str, str] = {}
+    crop_names: Dict[str, str] = {}
+
+    for entry in sorted(entries, key=lambda item: (item.barangay_id, SEASON_CODES[item.season], item.year)):
+        offset = len(rows)
+        for prediction in list(entry.predictions)[:top_k]:
+            crop_id = int(prediction["crop_id"])
+            rows.append(
+                (
+                    crop_id,
+                    float(prediction.get("probability", np.nan)),
+                    float(prediction.get("avg_yield", np.nan)),
+                    float(prediction.get("avg_price", np.nan)),
+                    float(prediction.get("expected_revenue", np.nan)),
+                )
+            )
+            barangay_names[str(entry.barangay_id)] = prediction.get("barangay_name")
+            crop_names[str(crop_id)] = prediction.get("crop_name")
+        keys.append((entry.barangay_id, SEASON_CODES[entry.season], entry.year, offset, len(rows) - offset))
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model": Path(model_path).name,
+        "generated_at_utc": datetime.now(timezone.utc).isoformat(),
+        "data_watermark": watermark,
+        "top_k": top_k,
+        "keys": len(keys),
+        "predictions": len(rows),
+        "barangay_names": barangay_names,
+        "crop_names": crop_names,
+    }
+
+    directory = Path(directory)
+    staging = directory.with_name(directory.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    np.save(staging / "keys.npy", np.array(keys, dtype=KEY_DTYPE))
+    np.save(staging / "predictions.npy", np.array(rows, dtype=PREDICTION_DTYPE))
+    with (staging / "manifest.json").open("w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+
+    if directory.exists():
+        retired = directory.with_name(directory.name + ".old")
+        if retired.exists():
+            shutil.rmtree(retired)
+        os.replace(directory, retired)
+        os.replace(staging, directory)
+        shutil.rmtree(retired)
+    else:
+        os.replace(staging, directory)
+
+    return directory
+
+
+class RecommendationSnapshot:
+    """Read-only view over a snapshot directory with O(1) key lookups."""
+
+    def __init__(self, directory: Path, manifest: Dict[str, object], keys: np.ndarray, predictions: np.ndarray):
+        self.directory = Path(directory)
+        self.manifest = manifest
+        self._predictions = predictions
+        self._barangay_names = manifest.get("barangay_names", {})
+        self._crop_names = manifest.get("crop_names", {})
+        self._index: Dict[Tuple[int, int, int], Tuple[int, int]] = {
+            (int(row["barangay_id"]), int(row["season"]), int(row["year"])): (int(row["offset"]), int(row["count"]))
+            for row in keys
+        }
+
+    @classmethod
+    def load(cls, directory: Path) -> "RecommendationSnapshot":
+        directory = Path(directory)
+        with (directory / "manifest.json").open("r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {directory}")
+        keys = np.load(directory / "keys.npy")
+        predictions = np.load(directory / "predictions.npy", mmap_mode="r")
+        return cls(directory, manifest, keys, predictions)
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self.manifest.get("model")
+
+    @property
+    def watermark(self) -> Optional[str]:
+        return self.manifest.get("data_watermark")
+
+    @property
+    def top_k(self) -> int:
+        return int(self.manifest.get("top_k", 0))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, barangay_id: int, season: str, year: int, top_k: int) -> Optional[List[Dict[str, object]]]:
+        """Return predictions for the key, ``[]`` for known empty keys, ``None`` on a miss."""
+
+        season_code = SEASON_CODES.get(season)
+        if season_code is None or top_k > self.top_k:
+            return None
+        located = self._index.get((barangay_id, season_code, year))
+        if located is None:
+            return None
+
+        offset, count = located
+        barangay_name = self._barangay_names.get(str(barangay_id))
+        season_label = SEASON_LABELS[season]
+        predictions = []
+        for rank, row in enumerate(self._predictions[offset : offset + min(count, top_k)], start=1):
+            crop_id = int(row["crop_id"])
+            probability = float(row["probability"])
+            predictions.append(
+                {
+                    "barangay_id": barangay_id,
+                    "barangay_name": barangay_name,
+                    "season": season_label,
+                    "crop_id": crop_id,
+                    "crop_name": self._crop_names.get(str(crop_id)),
+                    "year": year,
+                    "probability": round(probability, 6),
+                    "expected_revenue": float(row["expected_revenue"]),
+                    "rank": rank,
+                    "score": round(probability * 100, 2),
+                    "avg_yield": float(row["avg_yield"]),
+                    "avg_price": float(row["avg_price"]),
+                }
+            )
+        return predictions
@@ -0,0 +1,128 @@
+"""Bounded in-process LRU/TTL cache for recommendation API responses.
+
+Dashboard refreshes send bursts of identical ``/recommend`` payloads. Each
+one would otherwise repeat the DB fetch, feature engineering and forest
+evaluation, so the API keeps recent responses keyed on the normalized
+request and the model version that produced them.
+
+* At most ``max_entries`` responses are kept; the least recently used entry
+  is evicted first.
+* Entries expire ``ttl_seconds`` after they were stored.
+* Every lookup and store carries the model version. When a different version
+  shows up, everything cached for the previous model is dropped at once.
+
+Hit/miss/eviction counters are available through :meth:`ResponseCache.stats`.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with per-entry TTL and model-version invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._lock = Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        try:
+            max_entries = int(os.getenv("ML_RESPONSE_CACHE_SIZE", "1024"))
+        except ValueError:
+            max_entries = 1024
+        try:
+            ttl_seconds = float(os.getenv("ML_RESPONSE_CACHE_TTL", "300"))
+        except ValueError:
+            ttl_seconds = 300.0
+        return cls(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def _switch_version(self, version: Hashable) -> None:
+        # Caller holds the lock.
+        if version != self._version:
+            if self._entries:
+                self._counters["invalidations"] += 1
+                self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[object]:
+        """Return the cached value for ``key`` under ``version`` or ``None``."""
+
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._switch_version(version)
+            item = self._entries.get(key)
+            if item is None:
+                self._counters["misses"] += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, version: Hashable, value: object) -> None:
+        """Store ``value`` for ``key``, evicting the least recently used entries if full."""
+
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._switch_version(version)
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": str(self._version) if self._version is not None else None,
+                **self._counters,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
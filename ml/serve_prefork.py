@@ -0,0 +1,262 @@
+"""Pre-fork multi-worker launcher for the Flask recommendation API.
+
+Starting N independent workers means N ``joblib.load`` calls and N private
+copies of the forest. This launcher loads the model once in the parent,
+freezes the garbage collector's view of it and then ``fork()``s the workers,
+so the model's pages are shared copy-on-write. With the compiled backend the
+tree arrays are additionally memory-mapped from ``models/compiled/<stem>/``,
+so even a worker that hot-reloads a new model shares its arrays with every
+other worker through the page cache.
+
+All workers accept connections on one listening socket bound by the parent.
+The parent restarts workers that exit and stops them all on SIGINT/SIGTERM.
+
+Examples
+--------
+    $ python serve_prefork.py --workers 4 --port 5001
+    $ python serve_prefork.py --workers 4 --memory-report
+
+``--memory-report`` starts the pre-forked workers, then the same number of
+independently started workers (the previous way to scale out), prints
+RSS/PSS/USS for each and exits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+LOGGER = logging.getLogger("serve_prefork")
+
+SMAPS_FIELDS = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private_clean", "Private_Dirty": "private_dirty"}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the recommendation API from pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes to fork.")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="Compare pre-forked against independently started workers, print memory use and exit.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the memory report as JSON.")
+    return parser.parse_args()
+
+
+def memory_usage(pid: int) -> Dict[str, int]:
+    """RSS, PSS and USS (private pages) of ``pid`` in KiB, from ``/proc/<pid>/smaps_rollup``."""
+
+    usage = {name: 0 for name in SMAPS_FIELDS.values()}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as handle:
+        for line in handle:
+            key, _, rest = line.partition(":")
+            if key in SMAPS_FIELDS:
+                usage[SMAPS_FIELDS[key]] = int(rest.split()[0])
+    usage["uss"] = usage.pop("private_clean") + usage.pop("private_dirty")
+    return usage
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _preload():
+    import recommendation_api
+
+    store = recommendation_api.MODEL_STORE
+    recommendation_api.preload()
+    artifact = store.get()
+    # Threads do not survive fork(); each worker starts its own watcher.
+    store.stop_watcher()
+    # Keep the collector from touching (and un-sharing) the preloaded objects.
+    gc.collect()
+    gc.freeze()
+    return recommendation_api, artifact
+
+
+def _run_worker(api, sock: socket.socket) -> None:
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    api.DB_POOL.forget_inherited()
+    api.MODEL_STORE.start_watcher()
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, api.app, threaded=True, fd=sock.fileno())
+    LOGGER.info("Worker %s serving on %s:%s", os.getpid(), host, port)
+    server.serve_forever()
+
+
+def _spawn(api, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            _run_worker(api, sock)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def _stop(pids: List[int]) -> None:
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def _wait_ready(port: int, count: int, timeout: float = 60.0) -> None:
+    """Hit /health until ``count`` requests succeed, so every worker has served once."""
+
+    from urllib.request import urlopen
+
+    deadline = time.monotonic() + timeout
+    served = 0
+    while served < count and time.monotonic() < deadline:
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                served += int(response.status == 200)
+        except OSError:
+            time.sleep(0.2)
+
+
+def _summarize(pids: List[int]) -> Dict[str, object]:
+    workers = [{"pid": pid, **memory_usage(pid)} for pid in pids]
+    return {
+        "workers": workers,
+        "total_rss_kib": sum(worker["rss"] for worker in workers),
+        "total_pss_kib": sum(worker["pss"] for worker in workers),
+        "total_uss_kib": sum(worker["uss"] for worker in workers),
+    }
+
+
+def _independent_workers(count: int) -> Dict[str, object]:
+    """Start ``count`` workers the previous way: each one runs ``joblib.load`` and keeps
+    its own pipeline next to a privately compiled forest."""
+
+    code = (
+        "import sys, joblib, recommendation_api as api; artifact = api.MODEL_STORE.get(); "
+        "pipeline = joblib.load(artifact.model_path); print('ready', flush=True); sys.stdin.read()"
+    )
+    env = dict(os.environ, ML_MODEL_WATCH_SECONDS="0", ML_COMPILED_MMAP="0")
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", code],
+            cwd=str(Path(__file__).resolve().parent),
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(count)
+    ]
+    try:
+        for process in processes:
+            process.stdout.readline()
+        return _summarize([process.pid for process in processes])
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+
+def memory_report(args: argparse.Namespace) -> None:
+    api, artifact = _preload()
+    sock = _bind("127.0.0.1", args.port)
+    pids = [_spawn(api, sock) for _ in range(args.workers)]
+    try:
+        _wait_ready(args.port, args.workers * 4)
+        prefork = _summarize(pids)
+        prefork["parent"] = {"pid": os.getpid(), **memory_usage(os.getpid())}
+    finally:
+        _stop(pids)
+        sock.close()
+
+    report = {
+        "model": artifact.model_path.name,
+        "predictor": type(artifact.predictor).__name__,
+        "prefork": prefork,
+        "independent": _independent_workers(args.workers),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Model: {report['model']} ({report['predictor']}) | workers: {args.workers}")
+    parent = prefork["parent"]
+    print(f"  prefork parent (holds the shared model): pss {parent['pss'] / 1024:.1f} MiB")
+    for label in ("prefork", "independent"):
+        section = report[label]
+        print(f"  {label}:")
+        for worker in section["workers"]:
+            print(
+                f"    pid {worker['pid']:>7}  rss {worker['rss'] / 1024:8.1f} MiB  "
+                f"pss {worker['pss'] / 1024:8.1f} MiB  uss {worker['uss'] / 1024:8.1f} MiB"
+            )
+        print(
+            f"    total rss {section['total_rss_kib'] / 1024:.1f} MiB | "
+            f"total pss {section['total_pss_kib'] / 1024:.1f} MiB (actual memory charged to the workers)"
+        )
+
+
+def serve(args: argparse.Namespace) -> None:
+    api, artifact = _preload()
+    sock = _bind(args.host, args.port)
+    LOGGER.info("Loaded %s in parent %s; forking %s workers", artifact.model_path.name, os.getpid(), args.workers)
+
+    pids = [_spawn(api, sock) for _ in range(args.workers)]
+    stopping = False
+
+    def _shutdown(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        LOGGER.info("Received signal %s; stopping workers", signum)
+        _stop(list(pids))
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    while True:
+        pid, status = os.wait()
+        if stopping or pid not in pids:
+            continue
+        LOGGER.warning("Worker %s exited with status %s; restarting", pid, status)
+        pids[pids.index(pid)] = _spawn(api, sock)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    args = parse_args()
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1.")
+    if args.memory_report:
+        memory_report(args)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
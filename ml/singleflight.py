@@ -0,0 +1,129 @@
+"""Coalesce concurrent identical computations into one ("single flight").
+
+When many threads ask for the same key at once, the first caller (the leader)
+runs the computation and every other caller (a follower) waits for and shares
+its outcome:
+
+* The leader's return value is handed to every follower.
+* An exception raised by the leader is re-raised in every follower.
+* Followers wait at most ``timeout`` seconds and then get
+  :class:`SingleFlightTimeout`; the leader keeps running and its result still
+  reaches followers that are within their own timeouts.
+
+The key is released as soon as the leader finishes, so later callers start a
+fresh computation (caching finished results is the response cache's job).
+
+:class:`AsyncSingleFlight` does the same for coroutines on one event loop
+(``async_api.py``). The leader's coroutine runs as a task, so it finishes
+for its followers even if the leader's own request is cancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from threading import Event, Lock
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised in a follower that gave up waiting for the leader's result."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result: object = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Thread-safe registry of in-flight computations keyed by a hashable key."""
+
+    def __init__(self, timeout: float = 10.0) -> None:
+        self.timeout = float(timeout)
+        self._lock = Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {"leaders": 0, "followers": 0, "timeouts": 0, "errors": 0}
+
+    def do(self, key: Hashable, function: Callable[[], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Return ``(result, shared)``; ``shared`` is true when another caller computed it."""
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._counters["leaders"] += 1
+                leader = True
+            else:
+                call.followers += 1
+                self._counters["followers"] += 1
+                leader = False
+
+        if leader:
+            try:
+                call.result = function()
+            except BaseException as exc:
+                call.error = exc
+                with self._lock:
+                    self._counters["errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise SingleFlightTimeout(f"Timed out waiting for the in-flight computation of {key!r}")
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "timeout_seconds": self.timeout, **self._counters}
+
+
+class AsyncSingleFlight:
+    """:class:`SingleFlight` for coroutines; every call must come from the same event loop."""
+
+    def __init__(self, timeout: float = 10.0) -> None:
+        self.timeout = float(timeout)
+        self._calls: Dict[Hashable, "asyncio.Future[object]"] = {}
+        self._counters = {"leaders": 0, "followers": 0, "timeouts": 0, "errors": 0}
+
+    async def do(
+        self, key: Hashable, function: Callable[[], Awaitable[T]], timeout: Optional[float] = None
+    ) -> Tuple[T, bool]:
+        """Return ``(result, shared)``; ``shared`` is true when another caller computed it."""
+
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(function())
+            self._counters["leaders"] += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+            return await asyncio.shield(task), False
+
+        self._counters["followers"] += 1
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            raise SingleFlightTimeout(f"Timed out waiting for the in-flight computation of {key!r}") from None
+        return result, True
+
+    def _finish(self, key: Hashable, task: "asyncio.Future[object]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._counters["errors"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {"in_flight": len(self._calls), "timeout_seconds": self.timeout, **self._counters}
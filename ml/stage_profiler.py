@@ -0,0 +1,151 @@
+"""Per-stage wall time, CPU time and peak memory of a training run.
+
+A slow nightly retrain could be the database fetch, feature engineering, the
+forest fit, evaluation or the recommendation preview; the run used to print
+only its test metrics. :class:`StageProfiler` measures each stage of
+``train_model.py`` separately:
+
+* ``wall_seconds`` and ``cpu_seconds`` (``time.process_time``, so it includes
+  every thread of the process, such as the forest's ``n_jobs`` workers).
+* ``child_cpu_seconds``: CPU time of child processes reaped during the stage,
+  for example the ``--search`` worker pool (``None`` where the ``resource``
+  module is unavailable, i.e. on Windows).
+* ``peak_rss_mb``: the process's peak resident memory during the stage. The
+  kernel's high-water mark is reset through ``/proc/self/clear_refs`` when a
+  stage starts, so this costs nothing but is only available on Linux.
+* With ``trace_memory``: ``peak_traced_mb``, the most memory the stage held at
+  once on top of what was allocated when it started, and ``net_traced_mb``,
+  what it left allocated, both from :mod:`tracemalloc` (NumPy and pandas
+  buffers included). Tracing slows allocation-heavy Python code down several
+  times (the streaming fetch took 3.6x longer), so it is off by default and
+  its stage timings should not be compared with untraced runs.
+
+Stages must not nest: each one resets the memory peaks.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:  # Unix only
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
+
+_MB = 1024 * 1024
+_PROC_SELF = Path("/proc/self")
+
+
+def _children_cpu_seconds() -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb() -> Optional[float]:
+    # VmHWM: the high-water mark of the resident set, in kB.
+    try:
+        with (_PROC_SELF / "status").open("r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with (_PROC_SELF / "clear_refs").open("w", encoding="ascii") as handle:
+            handle.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class StageProfiler:
+    """Collect timings and memory peaks for named, sequential stages."""
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Optional[float]]] = {}
+        self._started_tracing = False
+        self._max_rss_mb: Optional[float] = None
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def _track_rss(self) -> Optional[float]:
+        peak = _peak_rss_mb()
+        if peak is not None:
+            self._max_rss_mb = peak if self._max_rss_mb is None else max(self._max_rss_mb, peak)
+        return peak
+
+    @contextmanager
+    def stage(self, name: str, profile_path: Optional[Path] = None) -> Iterator[None]:
+        """Measure the ``with`` block as stage ``name``; dump a cProfile to ``profile_path`` when set."""
+
+        profiler = cProfile.Profile() if profile_path is not None else None
+        children_started = _children_cpu_seconds()
+        self._track_rss()  # remember the run's peak before resetting it
+        rss_reset = _reset_peak_rss()
+        traced_started = 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_started = tracemalloc.get_traced_memory()[0]
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stats: Dict[str, Optional[float]] = {
+                "wall_seconds": round(time.perf_counter() - wall_started, 4),
+                "cpu_seconds": round(time.process_time() - cpu_started, 4),
+                "child_cpu_seconds": None,
+                "peak_rss_mb": None,
+            }
+            children_finished = _children_cpu_seconds()
+            if children_started is not None and children_finished is not None:
+                stats["child_cpu_seconds"] = round(children_finished - children_started, 4)
+            peak_rss = self._track_rss()
+            if rss_reset:
+                stats["peak_rss_mb"] = peak_rss
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stats["peak_traced_mb"] = round(max(0, peak - traced_started) / _MB, 2)
+                stats["net_traced_mb"] = round((current - traced_started) / _MB, 2)
+            self.stages[name] = stats
+            if profiler is not None:
+                profile_path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(profile_path))
+
+    def report(self) -> Dict[str, object]:
+        """Stage measurements plus run totals so far."""
+
+        self._track_rss()
+        return {
+            "stages": dict(self.stages),
+            "total_wall_seconds": round(time.perf_counter() - self._wall_started, 4),
+            "total_cpu_seconds": round(time.process_time() - self._cpu_started, 4),
+            "max_rss_mb": self._max_rss_mb,
+            "memory_traced": self.trace_memory,
+        }
+
+    def stop(self) -> None:
+        """Stop tracemalloc if this profiler started it."""
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,152 @@
+"""Measure how long the Flask recommendation API takes to become useful.
+
+Each mode starts ``recommendation_api.py`` in a fresh process and records:
+
+* ``port_open_seconds``: spawn until the port accepts connections;
+* ``first_request_seconds``: spawn until the first ``/recommend`` succeeds,
+  and that request's own latency;
+* the server's in-process view from ``GET /health`` (``startup``): import
+  time, model load and warm-up time, and first-request timings.
+
+``lazy`` is the default start (model loaded by the first request); ``preload``
+passes ``--preload`` so the model is loaded and warmed before the port opens.
+A priming process loads the model once beforehand, so both modes find the
+compiled forest cache and the OS page cache equally warm.
+
+Examples
+--------
+    $ python startup_report.py --barangay-id 1 --season wet --year 2024
+    $ python startup_report.py --modes preload --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+MODES = {"lazy": [], "preload": ["--preload"]}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report import, model load and first-request times of the API.")
+    parser.add_argument("--modes", type=str, default="lazy,preload", help="Comma-separated modes: lazy, preload.")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--barangay-id", type=int, default=1)
+    parser.add_argument("--season", type=str, default="wet")
+    parser.add_argument("--year", type=int, default=datetime.now().year)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for each step.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    return parser.parse_args()
+
+
+def _server_env() -> Dict[str, str]:
+    # The watcher is irrelevant for a one-shot measurement.
+    return dict(os.environ, ML_MODEL_WATCH_SECONDS="0", ML_PRELOAD_MODEL="0")
+
+
+def _prime() -> None:
+    subprocess.run(
+        [sys.executable, "-c", "import recommendation_api as api; api.MODEL_STORE.get()"],
+        cwd=str(PROJECT_ROOT),
+        env=_server_env(),
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, deadline: float) -> None:
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before opening its port.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.01)
+    raise TimeoutError(f"Port {port} did not open in time.")
+
+
+def _request(url: str, payload: Optional[Dict[str, object]], timeout: float):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as exc:
+        return exc.code, json.loads(exc.read() or b"{}")
+
+
+def measure(mode: str, args: argparse.Namespace) -> Dict[str, object]:
+    base = f"http://127.0.0.1:{args.port}"
+    payload = {"barangay_id": args.barangay_id, "season": args.season, "year": args.year}
+
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "recommendation_api.py", "--host", "127.0.0.1", "--port", str(args.port), *MODES[mode]],
+        cwd=str(PROJECT_ROOT),
+        env=_server_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(args.port, process, started + args.timeout)
+        port_open = time.monotonic()
+        status, _ = _request(f"{base}/recommend", payload, args.timeout)
+        answered = time.monotonic()
+        _, health = _request(f"{base}/health", None, args.timeout)
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {
+        "mode": mode,
+        "first_request_status": status,
+        "port_open_seconds": round(port_open - started, 4),
+        "first_request_seconds": round(answered - started, 4),
+        "first_request_latency_seconds": round(answered - port_open, 4),
+        "server": health.get("startup", {}),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = sorted(set(modes) - set(MODES))
+    if unknown:
+        raise SystemExit(f"Unknown modes: {', '.join(unknown)}")
+
+    _prime()
+    results = [measure(mode, args) for mode in modes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        server = result["server"]
+        print(f"{result['mode']}:")
+        print(f"  port open            {result['port_open_seconds']:.3f}s after spawn")
+        print(
+            f"  first /recommend     {result['first_request_seconds']:.3f}s after spawn "
+            f"(status {result['first_request_status']}, request took {result['first_request_latency_seconds']:.3f}s)"
+        )
+        print(f"  import (in process)  {server.get('import_seconds')}s")
+        print(
+            f"  model load / warm-up {server.get('model_load_seconds')}s / {server.get('model_warm_up_seconds')}s"
+            f"{' (before the port opened)' if server.get('preloaded') else ' (during the first request)'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""Make the ``ml/`` modules importable as top-level modules, as the scripts import them."""
+
+import sys
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parents[1]
+if str(ML_DIR) not in sys.path:
+    sys.path.insert(0, str(ML_DIR))
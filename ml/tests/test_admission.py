@@ -0,0 +1,212 @@
+"""AdmissionController queueing, deadlines and slot release under threads."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import (
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionSettings,
+    AsyncAdmissionController,
+    DeadlineExceeded,
+)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def controller(max_concurrent: int = 1, max_queue: int = 8, queue_timeout: float = 5.0) -> AdmissionController:
+    return AdmissionController(
+        AdmissionSettings(max_concurrent=max_concurrent, max_queue=max_queue, queue_timeout=queue_timeout)
+    )
+
+
+def start_waiter(admission: AdmissionController, admitted: list, name: object, **kwargs) -> threading.Thread:
+    """Queue a thread for a slot; it records ``name`` once admitted and releases right away."""
+
+    def run():
+        acquired_at = admission.acquire(**kwargs)
+        admitted.append(name)
+        admission.release(acquired_at)
+
+    waiting = admission.stats()["waiting"]
+    thread = threading.Thread(target=run)
+    thread.start()
+    wait_for(lambda: admission.stats()["waiting"] == waiting + 1)
+    return thread
+
+
+def test_full_queue_is_rejected_immediately():
+    admission = controller(max_concurrent=1, max_queue=1)
+    held = admission.acquire()
+    admitted = []
+    waiter = start_waiter(admission, admitted, "queued")
+
+    started = time.perf_counter()
+    with pytest.raises(AdmissionRejected):
+        admission.acquire()
+    assert time.perf_counter() - started < 1.0
+    assert admission.stats()["rejected_queue_full"] == 1
+
+    admission.release(held)
+    waiter.join(5)
+    assert admitted == ["queued"]
+    assert admission.stats()["active"] == 0
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    admission = controller(max_concurrent=1)
+    held = admission.acquire()
+    admitted = []
+    waiters = [start_waiter(admission, admitted, index) for index in range(6)]
+
+    admission.release(held)
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert admitted == list(range(6))
+    stats = admission.stats()
+    assert (stats["active"], stats["waiting"], stats["queued"]) == (0, 0, 6)
+
+
+def test_freed_slot_goes_to_the_queue_not_a_newcomer():
+    admission = controller(max_concurrent=1)
+    held = admission.acquire()
+    gate = threading.Event()
+    admitted = []
+
+    def slow_waiter():
+        acquired_at = admission.acquire()
+        admitted.append("waiter")
+        gate.wait(5)
+        admission.release(acquired_at)
+
+    waiter = threading.Thread(target=slow_waiter)
+    waiter.start()
+    wait_for(lambda: admission.stats()["waiting"] == 1)
+
+    admission.release(held)
+    # The slot is handed over inside release(), before the waiter even runs.
+    stats = admission.stats()
+    assert (stats["active"], stats["waiting"]) == (1, 0)
+    with pytest.raises(DeadlineExceeded):
+        admission.acquire(deadline=time.perf_counter() + 0.05)
+    wait_for(lambda: admitted == ["waiter"])
+
+    gate.set()
+    waiter.join(5)
+    assert admission.stats()["active"] == 0
+
+
+def test_deadline_expires_while_queued_without_leaking_a_slot():
+    admission = controller(max_concurrent=1, queue_timeout=5.0)
+    held = admission.acquire()
+
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        admission.acquire(deadline=started + 0.05)
+    assert 0.04 <= time.perf_counter() - started < 1.0
+
+    stats = admission.stats()
+    assert (stats["waiting"], stats["deadline_expired"], stats["rejected_queue_timeout"]) == (0, 1, 0)
+
+    admission.release(held)
+    assert admission.stats()["active"] == 0
+    admission.release(admission.acquire())
+
+
+def test_queue_timeout_rejects_and_passed_deadline_is_refused_up_front():
+    admission = controller(max_concurrent=1, queue_timeout=0.05)
+    held = admission.acquire()
+    with pytest.raises(AdmissionRejected):
+        admission.acquire()
+    with pytest.raises(DeadlineExceeded):
+        admission.acquire(deadline=time.perf_counter() - 1)
+
+    stats = admission.stats()
+    assert (stats["rejected_queue_timeout"], stats["deadline_expired"], stats["waiting"]) == (1, 1, 0)
+    admission.release(held)
+    assert admission.stats()["active"] == 0
+
+
+def test_admitted_releases_the_slot_when_the_work_raises(monkeypatch):
+    import recommendation_api
+
+    admission = controller(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(recommendation_api, "ADMISSION", admission)
+
+    def fail():
+        raise RuntimeError("inference failed")
+
+    def too_late():
+        raise DeadlineExceeded("deadline passed before inference")
+
+    with pytest.raises(RuntimeError):
+        recommendation_api._admitted(None, fail)
+    assert admission.stats()["active"] == 0
+
+    body, status = recommendation_api._admitted(None, too_late)
+    assert status == 504 and body["error"] == "Request deadline exceeded"
+    assert admission.stats()["active"] == 0
+
+    # With max_queue=0 a leaked slot would turn this into a 503.
+    assert recommendation_api._admitted(None, lambda: ({"success": True}, 200)) == ({"success": True}, 200)
+
+
+def test_async_controller_queues_in_order_and_rejects_when_full():
+    async def scenario():
+        admission = AsyncAdmissionController(AdmissionSettings(max_concurrent=1, max_queue=3, queue_timeout=5.0))
+        held = await admission.acquire()
+        admitted = []
+
+        async def waiter(name):
+            acquired_at = await admission.acquire()
+            admitted.append(name)
+            admission.release(acquired_at)
+
+        tasks = []
+        for name in range(3):
+            tasks.append(asyncio.ensure_future(waiter(name)))
+            await asyncio.sleep(0)
+        assert admission.stats()["waiting"] == 3
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire()
+
+        admission.release(held)
+        await asyncio.gather(*tasks)
+        return admitted, admission.stats()
+
+    admitted, stats = asyncio.run(scenario())
+    assert admitted == [0, 1, 2]
+    assert (stats["active"], stats["waiting"], stats["rejected_queue_full"]) == (0, 0, 1)
+
+
+def test_async_controller_deadline_and_cancellation_do_not_leak_slots():
+    async def scenario():
+        admission = AsyncAdmissionController(AdmissionSettings(max_concurrent=1, max_queue=4, queue_timeout=5.0))
+        held = await admission.acquire()
+        with pytest.raises(DeadlineExceeded):
+            await admission.acquire(deadline=time.perf_counter() + 0.05)
+
+        # A waiter cancelled after release() granted it a slot must pass the slot on.
+        cancelled = asyncio.ensure_future(admission.acquire())
+        follower = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        admission.release(held)
+        cancelled.cancel()
+        acquired_at = await follower
+        assert cancelled.cancelled()
+        admission.release(acquired_at)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["active"], stats["waiting"], stats["deadline_expired"]) == (0, 0, 1)
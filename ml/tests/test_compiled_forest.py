@@ -0,0 +1,73 @@
+"""CompiledForest must reproduce ``pipeline.predict_proba`` exactly.
+
+Run from ``ml/`` with ``python -m pytest tests``.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compiled_forest import CompiledForest, verify_parity
+from train_model import build_pipeline, label_best_crops, split_datasets
+
+DATASET = Path(__file__).resolve().parents[1] / "exports" / "mock_recommendation_dataset.csv"
+
+
+@pytest.fixture(scope="module", params=[(None, 1), (8, 5)], ids=["full-depth", "depth8-leaf5"])
+def fitted(request):
+    max_depth, min_samples_leaf = request.param
+    df = label_best_crops(pd.read_csv(DATASET))
+    X_train, X_test, y_train, _ = split_datasets(df, random_state=42)
+    pipeline = build_pipeline(
+        random_state=42,
+        n_estimators=40,
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
+    )
+    pipeline.fit(X_train, y_train)
+    return pipeline, X_test
+
+
+def assert_same_probabilities(pipeline, compiled: CompiledForest, X: pd.DataFrame) -> None:
+    expected = pipeline.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    np.testing.assert_array_equal(compiled.classes_, pipeline.classes_)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+
+
+def test_predict_proba_matches_pipeline(fitted):
+    pipeline, X_test = fitted
+    compiled = CompiledForest.from_pipeline(pipeline)
+
+    assert_same_probabilities(pipeline, compiled, X_test)
+    assert verify_parity(pipeline, compiled) <= 1e-12  # synthetic probe around every split
+    np.testing.assert_array_equal(compiled.predict(X_test), pipeline.predict(X_test))
+
+
+def test_unseen_categories_encode_as_zeros(fitted):
+    pipeline, X_test = fitted
+    compiled = CompiledForest.from_pipeline(pipeline)
+
+    unseen = X_test.head(25).copy()
+    unseen["barangay_id"] = 99_999
+    unseen["crop_id"] = -1
+    unseen.loc[unseen.index[::2], "season"] = "summer"
+
+    assert_same_probabilities(pipeline, compiled, unseen)
+
+
+def test_save_and_memory_mapped_load_round_trip(fitted, tmp_path):
+    pipeline, X_test = fitted
+    compiled = CompiledForest.from_pipeline(pipeline)
+    directory = compiled.save(tmp_path / "compiled", source={"model": "test"})
+
+    loaded = CompiledForest.load(directory, mmap_mode="r")
+
+    assert isinstance(loaded.threshold, np.memmap)
+    assert CompiledForest.read_source(directory) == {"model": "test"}
+    assert loaded.feature_names == compiled.feature_names
+    assert_same_probabilities(pipeline, loaded, X_test)
@@ -0,0 +1,183 @@
+"""SingleFlight and AsyncSingleFlight share one computation, its errors and its timeouts as documented."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight, SingleFlightTimeout
+
+FOLLOWERS = 7
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+class BlockedLeader:
+    """A computation that blocks until ``release`` is set, counting its runs."""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.outcome, BaseException):
+            raise self.outcome
+        return self.outcome
+
+
+def run_callers(flight: SingleFlight, function, count: int, timeout=None):
+    """Start one leader, then ``count`` followers once it is running; returns per-caller outcomes."""
+
+    outcomes = [None] * (count + 1)
+
+    def call(index):
+        try:
+            outcomes[index] = ("ok", flight.do("key", function, timeout=timeout))
+        except BaseException as exc:  # pylint: disable=broad-except
+            outcomes[index] = ("error", exc)
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    assert function.started.wait(5)
+    threads += [threading.Thread(target=call, args=(index,)) for index in range(1, count + 1)]
+    for thread in threads[1:]:
+        thread.start()
+    return threads, outcomes
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight(timeout=5)
+    function = BlockedLeader(outcome={"answer": 42})
+    threads, outcomes = run_callers(flight, function, FOLLOWERS)
+    wait_for(lambda: flight.stats()["followers"] == FOLLOWERS)
+    function.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert function.runs == 1
+    assert [kind for kind, _ in outcomes] == ["ok"] * (FOLLOWERS + 1)
+    results = [value for _, (value, _) in outcomes]
+    assert all(result is results[0] for result in results)
+    assert [shared for _, (_, shared) in outcomes] == [False] + [True] * FOLLOWERS
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_leader_exception_reaches_every_waiter():
+    flight = SingleFlight(timeout=5)
+    error = ValueError("boom")
+    function = BlockedLeader(outcome=error)
+    threads, outcomes = run_callers(flight, function, FOLLOWERS)
+    wait_for(lambda: flight.stats()["followers"] == FOLLOWERS)
+    function.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert function.runs == 1
+    assert outcomes == [("error", error)] * (FOLLOWERS + 1)
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_follower_timeout_leaves_leader_running_and_next_call_recomputes():
+    flight = SingleFlight(timeout=5)
+    function = BlockedLeader(outcome="first")
+    threads, outcomes = run_callers(flight, function, 1, timeout=0.05)
+    threads[1].join(5)
+
+    assert outcomes[1][0] == "error"
+    assert isinstance(outcomes[1][1], SingleFlightTimeout)
+    assert outcomes[0] is None  # the leader is still running
+    assert flight.stats()["timeouts"] == 1
+
+    function.release.set()
+    threads[0].join(5)
+    assert outcomes[0] == ("ok", ("first", False))
+
+    assert flight.do("key", lambda: "second") == ("second", False)
+    assert function.runs == 1
+    assert flight.stats()["leaders"] == 2
+
+
+def test_default_timeout_applies_without_override():
+    flight = SingleFlight(timeout=0.05)
+    function = BlockedLeader(outcome=None)
+    threads, outcomes = run_callers(flight, function, 1)
+    threads[1].join(5)
+    function.release.set()
+    threads[0].join(5)
+
+    assert isinstance(outcomes[1][1], SingleFlightTimeout)
+    assert outcomes[0] == ("ok", (None, False))
+
+
+def test_async_callers_share_one_run_and_its_exception():
+    async def scenario(outcome):
+        flight = AsyncSingleFlight(timeout=5)
+        release = asyncio.Event()
+        runs = []
+
+        async def function():
+            runs.append(1)
+            await release.wait()
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+
+        calls = [asyncio.ensure_future(flight.do("key", function)) for _ in range(FOLLOWERS + 1)]
+        await asyncio.sleep(0)
+        assert flight.stats()["followers"] == FOLLOWERS
+        release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        return runs, results, flight.stats()
+
+    runs, results, stats = asyncio.run(scenario({"answer": 42}))
+    assert runs == [1]
+    assert [shared for _, shared in results] == [False] + [True] * FOLLOWERS
+    assert all(value is results[0][0] for value, _ in results)
+    assert stats["in_flight"] == 0
+
+    error = ValueError("boom")
+    runs, results, stats = asyncio.run(scenario(error))
+    assert runs == [1]
+    assert results == [error] * (FOLLOWERS + 1)
+    assert (stats["errors"], stats["in_flight"]) == (1, 0)
+
+
+def test_async_follower_timeout_and_cancelled_leader_leave_the_run_going():
+    async def scenario():
+        flight = AsyncSingleFlight(timeout=5)
+        release = asyncio.Event()
+
+        async def function():
+            await release.wait()
+            return "first"
+
+        leader = asyncio.ensure_future(flight.do("key", function))
+        await asyncio.sleep(0)
+        with pytest.raises(SingleFlightTimeout):
+            await flight.do("key", function, timeout=0.05)
+        follower = asyncio.ensure_future(flight.do("key", function))
+        await asyncio.sleep(0)
+        leader.cancel()  # the leader's client went away; its followers still get the result
+        release.set()
+        assert await follower == ("first", True)
+
+        second = await flight.do("key", lambda: asyncio.sleep(0, result="second"))
+        return second, flight.stats()
+
+    second, stats = asyncio.run(scenario())
+    assert second == ("second", False)
+    assert (stats["leaders"], stats["followers"], stats["timeouts"], stats["in_flight"]) == (2, 2, 1, 0)
@@ -8,30 +8,65 @@ the "best" choice under those conditions.
 
 The trained model is persisted alongside metadata so the backend API can load
 it without additional preprocessing work.
+
+``--compact`` additionally trades model size for inference latency: it retrains
+the forest with capped depths and larger minimum leaf sizes, cuts every forest
+down to the fewest trees whose holdout F1 stays within ``--compact-tolerance``
+of the full forest, and writes each variant plus ``compaction_report.json``
+(artifact size, load time, single-request latency, test F1) under
+``<save-dir>/compact/<model>/``.
+
+``--search`` replaces the single ``--n-estimators``/``--max-depth`` fit with a
+parallel search: every (depth, minimum leaf size, max features) configuration
+runs in a process pool and grows its forest through ``--search-trees`` with
+warm starts, stopping when ``--search-budget-seconds`` runs out. The best
+forest is persisted and the metadata JSON carries the leaderboard (test F1,
+artifact size, single-request latency) under ``search``.
+
+Every run records wall time, CPU time and peak memory per stage (sklearn
+import, fetch, feature engineering, labelling, split, fit, evaluation,
+recommendations) under ``profile`` in the metadata JSON. ``--trace-memory``
+adds tracemalloc peaks, and ``--profile`` dumps a cProfile of the fit stage to
+``<model>.fit.prof``.
+
+``--incremental`` updates the newest artifact instead of retraining: it
+fetches only the approved years the artifact has not seen, appends
+``--add-trees`` trees fitted on them (``warm_start``), optionally drops the
+oldest ``--retire-trees`` trees, compares old and new forest on a holdout of
+the new rows and records the artifact's ``lineage`` in the metadata JSON.
 """
 
 from __future__ import annotations
 
 import argparse
+import copy
+import io
+import itertools
 import json
 import os
+import random
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-import joblib
 import numpy as np
 import pandas as pd
 import psycopg2
 from psycopg2.extensions import connection as PGConnection
 from psycopg2.extras import RealDictCursor
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report, f1_score
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
+
+from stage_profiler import StageProfiler
+from training_cache import TrainingFrameCache
+
+# sklearn and joblib are imported inside the training functions: the serving
+# API imports the shared helpers below and should not pay sklearn's import cost.
+if TYPE_CHECKING:  # pragma: no cover - typing only
+	from sklearn.pipeline import Pipeline
 
 try:  # Optional helper for local development
 	from dotenv import load_dotenv
@@ -41,10 +76,20 @@ except ImportError:  # pragma: no cover - optional dependency
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 DEFAULT_MODEL_DIR = PROJECT_ROOT / "models"
+DEFAULT_CACHE_DIR = PROJECT_ROOT / "cache" / "training_frame"
 SEASON_MONTH_TO_LABEL = {
 	"dry": "Dry",
 	"wet": "Wet",
 }
+# Training frame columns kept as pandas categoricals and as float32 measures.
+TRAINING_CATEGORICAL_COLUMNS = ("barangay_id", "barangay_name", "crop_id", "crop_name", "season")
+TRAINING_MEASURE_COLUMNS = ("total_yield", "total_area_planted_ha", "yield_per_hectare", "avg_price_per_kg")
+# Rows per round trip of the server-side cursor that streams the training frame.
+TRAINING_FETCH_CHUNK_ROWS = 50_000
+# Forest sizes evaluated for the accuracy-vs-trees curve (plus the full forest).
+COMPACT_TREE_COUNTS = (5, 10, 25, 50, 100, 150, 200)
+# Single-request predictions timed per leaderboard entry during --search.
+SEARCH_LATENCY_REPEAT = 20
 
 
 @dataclass(frozen=True)
@@ -92,6 +137,27 @@ def get_connection(config: Dict[str, str]) -> PGConnection:
 	return psycopg2.connect(**config)
 
 
+def fetch_data_watermark(conn: PGConnection) -> str:
+	"""Return a cheap fingerprint that changes whenever approved source data changes.
+
+	Approvals, rejections and new submissions all insert into ``approvals``,
+	so its highest id plus the approved row counts identify a data state.
+	"""
+
+	sql = """
+		SELECT
+			(SELECT COUNT(*) FROM barangay_yields WHERE status = 'approved'),
+			(SELECT COUNT(*) FROM barangay_crop_prices WHERE status = 'approved'),
+			(SELECT COALESCE(MAX(id), 0) FROM approvals)
+	"""
+
+	with conn.cursor() as cursor:
+		cursor.execute(sql)
+		yields, prices, approval_id = cursor.fetchone()
+
+	return f"{yields}:{prices}:{approval_id}"
+
+
 def determine_year_threshold(conn: PGConnection, min_years: int) -> int:
 	"""Determine the minimum year to include based on available historical data."""
 
@@ -120,8 +186,51 @@ def determine_year_threshold(conn: PGConnection, min_years: int) -> int:
 	return threshold
 
 
-def fetch_training_frame(conn: PGConnection, min_year: int) -> pd.DataFrame:
-	"""Fetch joined yield/price history needed for model training."""
+def _training_column_dtype(name: str) -> np.dtype:
+	if name in TRAINING_CATEGORICAL_COLUMNS:
+		return np.dtype(np.int32)  # category codes
+	if name in TRAINING_MEASURE_COLUMNS:
+		return np.dtype(np.float32)
+	return np.dtype(np.int16)  # year
+
+
+def _encode_training_chunk(name: str, values: Sequence[object], codes: Dict[str, Dict[object, int]]) -> np.ndarray:
+	if name in codes:
+		lookup = codes[name]
+		return np.fromiter(
+			(-1 if value is None else lookup.setdefault(value, len(lookup)) for value in values),
+			dtype=np.int32,
+			count=len(values),
+		)
+	# Measures arrive as Python floats (cast in SQL); None becomes NaN.
+	return np.array(values, dtype=_training_column_dtype(name))
+
+
+def _training_categorical(chunk_codes: np.ndarray, lookup: Dict[object, int]) -> pd.Categorical:
+	# Sorted categories make frames fetched in different chunks or years compatible.
+	categories = sorted(lookup)
+	position = {value: index for index, value in enumerate(categories)}
+	# The trailing -1 keeps missing values (code -1) missing.
+	remap = np.array([position[value] for value in lookup] + [-1], dtype=np.int32)
+	return pd.Categorical.from_codes(remap[chunk_codes], categories=pd.Index(categories))
+
+
+def fetch_training_frame(
+	conn: PGConnection,
+	min_year: int,
+	years: Optional[Sequence[int]] = None,
+	chunk_rows: int = TRAINING_FETCH_CHUNK_ROWS,
+) -> pd.DataFrame:
+	"""Fetch joined yield/price history needed for model training.
+
+	``years`` restricts the result to those years (the training frame cache
+	re-fetches single partitions this way).
+
+	Rows are streamed through a named (server-side) cursor ``chunk_rows`` at a
+	time and encoded per chunk, so only one chunk of Python row tuples is
+	alive at once. Barangay, crop and season columns come back as categoricals,
+	measures as float32 and ``year`` as int16.
+	"""
 
 	query = """
 		WITH yield_data AS (
@@ -140,6 +249,7 @@ def fetch_training_frame(conn: PGConnection, min_year: int) -> pd.DataFrame:
 			LEFT JOIN crops AS c USING (crop_id)
 			WHERE y.status = 'approved'
 			  AND y.year >= %(min_year)s
+			  AND (%(years)s::int[] IS NULL OR y.year = ANY(%(years)s::int[]))
 		), price_data AS (
 			SELECT
 				p.barangay_id,
@@ -150,6 +260,7 @@ def fetch_training_frame(conn: PGConnection, min_year: int) -> pd.DataFrame:
 			FROM barangay_crop_prices AS p
 			WHERE p.status = 'approved'
 			  AND p.year >= %(min_year)s
+			  AND (%(years)s::int[] IS NULL OR p.year = ANY(%(years)s::int[]))
 			GROUP BY 1, 2, 3, 4
 		)
 		SELECT
@@ -159,30 +270,82 @@ def fetch_training_frame(conn: PGConnection, min_year: int) -> pd.DataFrame:
 			y.crop_name,
 			y.year,
 			y.season,
-			y.total_yield,
-			y.total_area_planted_ha,
-			y.yield_per_hectare,
-			COALESCE(p.avg_price_per_kg, 0) AS avg_price_per_kg
+			y.total_yield::double precision AS total_yield,
+			y.total_area_planted_ha::double precision AS total_area_planted_ha,
+			y.yield_per_hectare::double precision AS yield_per_hectare,
+			COALESCE(p.avg_price_per_kg, 0)::double precision AS avg_price_per_kg
 		FROM yield_data AS y
 		LEFT JOIN price_data AS p
 		  ON p.barangay_id = y.barangay_id
 		 AND p.crop_id = y.crop_id
 		 AND p.year = y.year
 		 AND p.season = y.season
-		ORDER BY y.year, y.barangay_id, y.crop_id
+		ORDER BY y.year, y.barangay_id, y.crop_id, y.season
+	"""
+
+	params = {"min_year": min_year, "years": [int(year) for year in years] if years is not None else None}
+	codes: Dict[str, Dict[object, int]] = {name: {} for name in TRAINING_CATEGORICAL_COLUMNS}
+	with conn.cursor(name="training_frame") as cursor:
+		cursor.itersize = chunk_rows
+		cursor.execute(query, params)
+		rows = cursor.fetchmany(chunk_rows)
+		names = [column.name for column in cursor.description]
+		chunks: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+		while rows:
+			for name, values in zip(names, zip(*rows)):
+				chunks[name].append(_encode_training_chunk(name, values, codes))
+			rows = cursor.fetchmany(chunk_rows)
+
+	data = {}
+	for name in names:
+		values = np.concatenate(chunks.pop(name) or [np.empty(0, dtype=_training_column_dtype(name))])
+		data[name] = _training_categorical(values, codes[name]) if name in codes else values
+	return pd.DataFrame(data, copy=False)
+
+
+def load_training_frame(
+	conn: PGConnection,
+	min_year: int,
+	cache_dir: Optional[Path],
+	refresh: bool = False,
+) -> Tuple[pd.DataFrame, Optional[Dict[str, object]]]:
+	"""Return the training frame, through the year-partitioned cache in ``cache_dir`` when set.
+
+	The second value is the cache report (``None`` when the database was queried directly).
 	"""
 
-	return pd.read_sql_query(query, conn, params={"min_year": min_year})
+	if cache_dir is None:
+		return fetch_training_frame(conn, min_year), None
 
+	cache = TrainingFrameCache(cache_dir, fetch_training_frame)
+	if not cache.available:
+		print("Training frame cache disabled: install pyarrow to enable it.")
+		return fetch_training_frame(conn, min_year), None
 
-def engineer_features(raw_df: pd.DataFrame) -> pd.DataFrame:
-	"""Clean raw records and compute helper columns required for training."""
+	if refresh:
+		cache.clear()
+	frame, report = cache.load(conn, min_year)
+	print(
+		"Training frame cache: reused {} and fetched {} year partitions ({} rows).".format(
+			len(report["reused"]), len(report["fetched"]), report["rows"]
+		)
+	)
+	return frame, report
 
-	df = raw_df.copy()
+
+def engineer_features(raw_df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+	"""Clean raw records and compute helper columns required for training.
+
+	``copy=False`` updates ``raw_df`` in place, which saves a second copy of
+	the training frame when the caller no longer needs the raw records.
+	"""
+
+	df = raw_df.copy() if copy else raw_df
 	if df.empty:
 		raise RuntimeError("The training query returned no rows.")
 
-	df["season"] = df["season"].str.lower()
+	season = df["season"].str.lower()
+	df["season"] = season.astype("category") if isinstance(df["season"].dtype, pd.CategoricalDtype) else season
 
 	# Fill missing measurements with dataset medians to keep the pipeline simple.
 	numeric_cols = ["total_yield", "total_area_planted_ha", "yield_per_hectare", "avg_price_per_kg"]
@@ -216,7 +379,7 @@ def engineer_features(raw_df: pd.DataFrame) -> pd.DataFrame:
 def label_best_crops(df: pd.DataFrame) -> pd.DataFrame:
 	"""Add a binary label indicating the top crop per barangay-season-year."""
 
-	grouped = df.groupby(["barangay_id", "year", "season"])
+	grouped = df.groupby(["barangay_id", "year", "season"], observed=True)
 	df["max_revenue_in_group"] = grouped["expected_revenue"].transform("max")
 	df["is_top_crop"] = (df["expected_revenue"] >= df["max_revenue_in_group"]).astype(int)
 	df = df.drop(columns=["max_revenue_in_group"])
@@ -250,6 +413,8 @@ def split_datasets(df: pd.DataFrame, random_state: int) -> Tuple[pd.DataFrame, p
 		train_df = df.loc[train_mask].reset_index(drop=True)
 		test_df = df.loc[~train_mask].reset_index(drop=True)
 	else:
+		from sklearn.model_selection import train_test_split
+
 		train_df, test_df = train_test_split(
 			df,
 			test_size=0.2,
@@ -267,9 +432,20 @@ def split_datasets(df: pd.DataFrame, random_state: int) -> Tuple[pd.DataFrame, p
 	return X_train, X_test, y_train, y_test
 
 
-def build_pipeline(random_state: int, n_estimators: int, max_depth: Optional[int]) -> Pipeline:
+def build_pipeline(
+	random_state: int,
+	n_estimators: int,
+	max_depth: Optional[int],
+	min_samples_leaf: int = 1,
+	max_features: Union[str, float, None] = "sqrt",
+) -> Pipeline:
 	"""Construct the preprocessing + Random Forest pipeline."""
 
+	from sklearn.compose import ColumnTransformer
+	from sklearn.ensemble import RandomForestClassifier
+	from sklearn.pipeline import Pipeline
+	from sklearn.preprocessing import OneHotEncoder
+
 	categorical_features = ["barangay_id", "season", "crop_id"]
 	numeric_features = ["year", "total_yield", "total_area_planted_ha", "yield_per_hectare", "avg_price_per_kg"]
 
@@ -288,6 +464,8 @@ def build_pipeline(random_state: int, n_estimators: int, max_depth: Optional[int
 	model = RandomForestClassifier(
 		n_estimators=n_estimators,
 		max_depth=max_depth,
+		min_samples_leaf=min_samples_leaf,
+		max_features=max_features,
 		random_state=random_state,
 		n_jobs=-1,
 		class_weight="balanced",
@@ -299,6 +477,8 @@ def build_pipeline(random_state: int, n_estimators: int, max_depth: Optional[int
 def evaluate_model(pipeline: Pipeline, X: pd.DataFrame, y: pd.Series) -> Dict[str, float]:
 	"""Compute classification metrics for the supplied dataset."""
 
+	from sklearn.metrics import accuracy_score, classification_report, f1_score
+
 	predictions = pipeline.predict(X)
 	accuracy = float(accuracy_score(y, predictions))
 	f1 = float(f1_score(y, predictions, zero_division=0))
@@ -312,51 +492,115 @@ def evaluate_model(pipeline: Pipeline, X: pd.DataFrame, y: pd.Series) -> Dict[st
 	}
 
 
+RECOMMENDATION_COLUMNS = (
+	"barangay_id",
+	"barangay_name",
+	"season",
+	"crop_id",
+	"crop_name",
+	"year",
+	"probability",
+	"expected_revenue",
+	"rank",
+)
+
+
+def top_k_recommendations(
+	scored: pd.DataFrame,
+	top_k: int = 3,
+	probability: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+	"""Top-k crops per barangay/season of the newest year, as one columnar frame.
+
+	Within a barangay/season, crops are ranked by probability and then
+	expected revenue, both descending; full ties keep their input order.
+	Rows come out ordered by barangay, season and rank. ``probability``
+	replaces the ``probability`` column, so callers need not copy ``scored``
+	to add it. The whole ranking is a single sort over the newest year's rows.
+	"""
+
+	probability = np.asarray(scored["probability"] if probability is None else probability, dtype=np.float64)
+	year = scored["year"].to_numpy()
+	if len(year) == 0:
+		return pd.DataFrame({column: [] for column in RECOMMENDATION_COLUMNS})
+
+	latest = np.flatnonzero(year == year.max())
+	barangay_codes, _ = pd.factorize(scored["barangay_id"].to_numpy()[latest], sort=True)
+	season_codes, seasons = pd.factorize(scored["season"].to_numpy()[latest], sort=True)
+	revenue = scored["expected_revenue"].to_numpy(dtype=np.float64)
+
+	# np.lexsort orders by its last key first and is stable, like sort_values over several columns.
+	order = np.lexsort((-revenue[latest], -probability[latest], season_codes, barangay_codes))
+	groups = (barangay_codes * len(seasons) + season_codes)[order]
+	positions = np.arange(len(order))
+	group_starts = np.maximum.accumulate(np.where(np.r_[True, groups[1:] != groups[:-1]], positions, 0))
+	rank = positions - group_starts + 1
+	keep = rank <= top_k
+	rows = latest[order[keep]]
+
+	season_labels = np.array([SEASON_MONTH_TO_LABEL.get(season, season.title()) for season in seasons], dtype=object)
+	return pd.DataFrame(
+		{
+			"barangay_id": scored["barangay_id"].to_numpy()[rows].astype(np.int64),
+			"barangay_name": scored["barangay_name"].to_numpy()[rows],
+			"season": season_labels[season_codes[order[keep]]],
+			"crop_id": scored["crop_id"].to_numpy()[rows].astype(np.int64),
+			"crop_name": scored["crop_name"].to_numpy()[rows],
+			"year": year[rows].astype(np.int64),
+			"probability": probability[rows],
+			"expected_revenue": revenue[rows],
+			"rank": rank[keep].astype(np.int64),
+		}
+	)
+
+
+def recommendation_records(ranked: pd.DataFrame) -> List[Dict[str, object]]:
+	"""List-of-dicts view of :func:`top_k_recommendations` with plain Python values (JSON-ready)."""
+
+	return ranked.to_dict("records")
+
+
+def rank_recommendations(scored: pd.DataFrame, top_k: int = 3) -> List[Dict[str, object]]:
+	"""Return top-k crops per barangay/season from a frame with a ``probability`` column."""
+
+	return recommendation_records(top_k_recommendations(scored, top_k=top_k))
+
+
 def generate_recommendations(
 	pipeline: Pipeline,
 	df: pd.DataFrame,
 	feature_cols: Iterable[str],
 	top_k: int = 3,
-) -> List[Dict[str, object]]:
-	"""Return top-k recommended crops per barangay/season using model probabilities."""
-
-	working = df.copy()
-	working["probability"] = pipeline.predict_proba(working[list(feature_cols)])[:, 1]
-
-	latest_year = int(working["year"].max())
-	latest = working[working["year"] == latest_year]
-
-	recommendations: List[Dict[str, object]] = []
-	for (barangay_id, season), group in latest.groupby(["barangay_id", "season"]):
-		top_group = group.sort_values(["probability", "expected_revenue"], ascending=False).head(top_k)
-		for rank, row in enumerate(top_group.itertuples(index=False), start=1):
-			recommendations.append(
-				{
-					"barangay_id": int(row.barangay_id),
-					"barangay_name": row.barangay_name,
-					"season": SEASON_MONTH_TO_LABEL.get(row.season, row.season.title()),
-					"crop_id": int(row.crop_id),
-					"crop_name": row.crop_name,
-					"year": int(row.year),
-					"probability": float(row.probability),
-					"expected_revenue": float(row.expected_revenue),
-					"rank": rank,
-				}
-			)
+	as_records: bool = True,
+) -> Union[pd.DataFrame, List[Dict[str, object]]]:
+	"""Return top-k recommended crops per barangay/season using model probabilities.
+
+	The result is a list of dicts; ``as_records=False`` returns the columnar
+	frame of :func:`top_k_recommendations` instead.
+	"""
+
+	probability = pipeline.predict_proba(df[list(feature_cols)])[:, 1]
+	ranked = top_k_recommendations(df, top_k=top_k, probability=probability)
+	return recommendation_records(ranked) if as_records else ranked
+
 
-	return recommendations
+def artifact_timestamp() -> str:
+	return datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
 
 
 def persist_artifacts(
 	pipeline: Pipeline,
 	metadata: Dict[str, object],
 	save_dir: Path,
+	timestamp: Optional[str] = None,
 ) -> TrainingArtifacts:
 	"""Persist the trained pipeline and metadata JSON."""
 
+	import joblib
+
 	save_dir.mkdir(parents=True, exist_ok=True)
 
-	timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+	timestamp = timestamp or artifact_timestamp()
 	model_path = save_dir / f"random_forest_recommendation_{timestamp}.joblib"
 	metadata_path = save_dir / f"random_forest_recommendation_{timestamp}.json"
 
@@ -368,6 +612,664 @@ def persist_artifacts(
 	return TrainingArtifacts(model_path=model_path, metadata_path=metadata_path)
 
 
+def tree_count_curve(
+	pipeline: Pipeline,
+	X: pd.DataFrame,
+	y: pd.Series,
+	counts: Iterable[int] = COMPACT_TREE_COUNTS,
+) -> List[Dict[str, float]]:
+	"""Holdout accuracy/F1 of the forest truncated to its first ``k`` trees.
+
+	The forest's probability is the mean of its trees' class distributions, so a
+	running sum over ``estimators_`` scores every prefix in a single pass.
+	"""
+
+	from sklearn.metrics import accuracy_score, f1_score
+
+	forest = pipeline.named_steps["model"]
+	encoded = pipeline.named_steps["preprocess"].transform(X)
+	n_trees = len(forest.estimators_)
+	checkpoints = {count for count in counts if 0 < count < n_trees} | {n_trees}
+
+	running = np.zeros((len(X), len(forest.classes_)))
+	curve: List[Dict[str, float]] = []
+	for index, tree in enumerate(forest.estimators_, start=1):
+		running += tree.predict_proba(encoded)
+		if index not in checkpoints:
+			continue
+		predictions = forest.classes_[np.argmax(running, axis=1)]
+		curve.append(
+			{
+				"trees": index,
+				"accuracy": float(accuracy_score(y, predictions)),
+				"f1": float(f1_score(y, predictions, zero_division=0)),
+			}
+		)
+	return curve
+
+
+def select_tree_count(curve: List[Dict[str, float]], tolerance: float) -> int:
+	"""Fewest trees whose holdout F1 is within ``tolerance`` of the full forest."""
+
+	full_f1 = curve[-1]["f1"]
+	for point in curve:
+		if point["f1"] >= full_f1 - tolerance:
+			return int(point["trees"])
+	return int(curve[-1]["trees"])
+
+
+def truncate_forest(pipeline: Pipeline, n_trees: int) -> Pipeline:
+	"""Return a pipeline sharing the preprocessing whose forest keeps its first ``n_trees`` trees."""
+
+	from sklearn.pipeline import Pipeline
+
+	forest = copy.copy(pipeline.named_steps["model"])
+	forest.estimators_ = list(forest.estimators_[:n_trees])
+	forest.n_estimators = n_trees
+	return Pipeline([("preprocess", pipeline.named_steps["preprocess"]), ("model", forest)])
+
+
+def forest_size(pipeline: Pipeline) -> Dict[str, int]:
+	"""Tree, node and leaf counts plus the deepest tree of the pipeline's forest."""
+
+	trees = [estimator.tree_ for estimator in pipeline.named_steps["model"].estimators_]
+	return {
+		"trees": len(trees),
+		"nodes": int(sum(tree.node_count for tree in trees)),
+		"leaves": int(sum(tree.n_leaves for tree in trees)),
+		"max_depth": int(max(tree.max_depth for tree in trees)),
+	}
+
+
+def _single_request_frame(X: pd.DataFrame) -> pd.DataFrame:
+	# One barangay/season of the newest year: what a single /recommend call scores.
+	latest = X[X["year"] == X["year"].max()]
+	sizes = latest.groupby(["barangay_id", "season"], observed=True).size()
+	barangay_id, season = sizes.idxmax()
+	return latest[(latest["barangay_id"] == barangay_id) & (latest["season"] == season)]
+
+
+def _median_seconds(function, repeat: int) -> float:
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		function()
+		timings.append(time.perf_counter() - started)
+	return float(np.median(timings))
+
+
+def request_latency(pipeline: Pipeline, X_single: pd.DataFrame, repeat: int = 50) -> Dict[str, Optional[float]]:
+	"""Median single-request latency in ms with the sklearn and compiled backends (``None`` when not compilable)."""
+
+	from compiled_forest import UnsupportedPipelineError, compile_with_parity
+
+	pipeline.predict_proba(X_single)
+	latency: Dict[str, Optional[float]] = {
+		"sklearn": round(_median_seconds(lambda: pipeline.predict_proba(X_single), repeat) * 1000, 3),
+		"compiled": None,
+	}
+	try:
+		compiled = compile_with_parity(pipeline)
+	except UnsupportedPipelineError:
+		compiled = None
+	if compiled is not None:
+		columns = {column: X_single[column].to_numpy() for column in X_single.columns}
+		compiled.predict_proba(columns)
+		latency["compiled"] = round(_median_seconds(lambda: compiled.predict_proba(columns), repeat) * 1000, 3)
+	return latency
+
+
+def serving_latency(latency: Dict[str, Optional[float]]) -> float:
+	"""Latency the API would see: compiled when available, since the API serves that backend by default."""
+
+	return latency["compiled"] if latency["compiled"] is not None else latency["sklearn"]
+
+
+def measure_artifact(model_path: Path, X_single: pd.DataFrame, repeat: int = 50) -> Dict[str, object]:
+	"""Size, best-of-three load time and median single-request latency of a persisted pipeline."""
+
+	import joblib
+
+	load_seconds = []
+	for _ in range(3):
+		started = time.perf_counter()
+		pipeline = joblib.load(model_path)
+		load_seconds.append(time.perf_counter() - started)
+
+	return {
+		"artifact_bytes": model_path.stat().st_size,
+		"load_seconds": round(min(load_seconds), 4),
+		"latency_ms": request_latency(pipeline, X_single, repeat),
+		"request_rows": int(len(X_single)),
+	}
+
+
+def compact_model(
+	pipeline: Pipeline,
+	metadata: Dict[str, object],
+	artifacts: TrainingArtifacts,
+	X_train: pd.DataFrame,
+	X_test: pd.DataFrame,
+	y_train: pd.Series,
+	y_test: pd.Series,
+	recommendation_view: pd.DataFrame,
+	args: argparse.Namespace,
+) -> Tuple[Path, Dict[str, object]]:
+	"""Write compacted variants of ``pipeline`` and a size/latency/F1 report next to it.
+
+	Every (max depth, min samples per leaf) combination from ``--compact-depths``
+	and ``--compact-min-leaf`` is trained with the same seed and tree count as
+	the main model (which is reused for its own combination). Each forest is
+	persisted whole and, when fewer trees hold F1 within ``--compact-tolerance``
+	on the holdout, truncated to that many trees as well.
+	"""
+
+	import joblib
+
+	output_dir = artifacts.model_path.parent / "compact" / artifacts.model_path.stem
+	output_dir.mkdir(parents=True, exist_ok=True)
+	feature_columns = list(X_train.columns)
+	X_single = _single_request_frame(X_test)
+	base_f1 = float(metadata["training"]["test_metrics"]["f1"])
+
+	base_model = pipeline.named_steps["model"]
+	base_leaf = base_model.min_samples_leaf
+	depths = [args.max_depth] + [depth for depth in args.compact_depths if depth != args.max_depth]
+	leaves = [base_leaf] + [leaf for leaf in args.compact_min_leaf if leaf != base_leaf]
+
+	variants: List[Dict[str, object]] = []
+	curves: List[Dict[str, object]] = []
+	for max_depth in depths:
+		for min_samples_leaf in leaves:
+			if max_depth == args.max_depth and min_samples_leaf == base_leaf:
+				forest = pipeline
+			else:
+				forest = build_pipeline(
+					random_state=args.seed,
+					n_estimators=args.n_estimators,
+					max_depth=max_depth,
+					min_samples_leaf=min_samples_leaf,
+					max_features=base_model.max_features,
+				)
+				forest.fit(X_train, y_train)
+
+			curve = tree_count_curve(forest, X_test, y_test)
+			n_trees = select_tree_count(curve, args.compact_tolerance)
+			depth_label = "none" if max_depth is None else str(max_depth)
+			curves.append({"max_depth": max_depth, "min_samples_leaf": min_samples_leaf, "curve": curve, "selected_trees": n_trees})
+
+			candidates = [forest] if n_trees == args.n_estimators else [forest, truncate_forest(forest, n_trees)]
+			for candidate in candidates:
+				size = forest_size(candidate)
+				name = f"depth{depth_label}_leaf{min_samples_leaf}_trees{size['trees']}"
+				model_path = output_dir / f"{artifacts.model_path.stem}_{name}.joblib"
+
+				test_metrics = evaluate_model(candidate, X_test, y_test)
+				variant_metadata = copy.deepcopy(metadata)
+				variant_metadata["parameters"].update(
+					n_estimators=size["trees"],
+					max_depth=max_depth,
+					min_samples_leaf=min_samples_leaf,
+				)
+				variant_metadata["training"]["train_metrics"] = evaluate_model(candidate, X_train, y_train)
+				variant_metadata["training"]["test_metrics"] = test_metrics
+				variant_metadata["recommendations_preview"] = generate_recommendations(
+					candidate, recommendation_view, feature_columns
+				)
+				variant_metadata["compaction"] = {"variant": name, "source_model": artifacts.model_path.name}
+
+				joblib.dump(candidate, model_path)
+				with model_path.with_suffix(".json").open("w", encoding="utf-8") as f:
+					json.dump(variant_metadata, f, indent=2)
+
+				variants.append(
+					{
+						"variant": name,
+						"model_path": str(model_path),
+						"max_depth": max_depth,
+						"min_samples_leaf": min_samples_leaf,
+						**size,
+						**measure_artifact(model_path, X_single),
+						"test_accuracy": test_metrics["accuracy"],
+						"test_f1": test_metrics["f1"],
+						"test_f1_delta": test_metrics["f1"] - base_f1,
+					}
+				)
+
+	recommended = None
+	if args.latency_budget_ms is not None:
+		within_budget = [variant for variant in variants if serving_latency(variant["latency_ms"]) <= args.latency_budget_ms]
+		if within_budget:
+			best = max(within_budget, key=lambda variant: (variant["test_f1"], -variant["artifact_bytes"]))
+			recommended = best["variant"]
+
+	report = {
+		"generated_at_utc": datetime.now(timezone.utc).isoformat(),
+		"source_model": artifacts.model_path.name,
+		"tolerance": args.compact_tolerance,
+		"latency_budget_ms": args.latency_budget_ms,
+		"recommended": recommended,
+		"variants": variants,
+		"tree_curves": curves,
+	}
+	report_path = output_dir / "compaction_report.json"
+	with report_path.open("w", encoding="utf-8") as f:
+		json.dump(report, f, indent=2)
+
+	return report_path, report
+
+
+def search_grid(
+	depths: Sequence[Optional[int]],
+	min_leaves: Sequence[int],
+	max_features: Sequence[Union[str, float, None]],
+	samples: Optional[int] = None,
+	seed: int = 42,
+) -> List[Dict[str, object]]:
+	"""Forest configurations to search: the full grid, or ``samples`` of them drawn at random."""
+
+	grid = [
+		{"max_depth": depth, "min_samples_leaf": leaf, "max_features": features}
+		for depth, leaf, features in itertools.product(depths, min_leaves, max_features)
+	]
+	if samples is not None and samples < len(grid):
+		grid = random.Random(seed).sample(grid, samples)
+	return grid
+
+
+# Per-process state of --search workers, set once by _init_search_worker.
+_SEARCH_STATE: Dict[str, object] = {}
+
+
+def _init_search_worker(
+	X_train: pd.DataFrame,
+	X_test: pd.DataFrame,
+	y_train: pd.Series,
+	y_test: pd.Series,
+	seed: int,
+	deadline: float,
+	latency_budget_ms: Optional[float],
+) -> None:
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()  # inherited from the parent's stage profiler; it would skew latencies
+	# The preprocessing does not depend on the forest parameters: fit and
+	# apply it once per worker, then grow every forest on the encoded arrays.
+	preprocess = build_pipeline(random_state=seed, n_estimators=1, max_depth=None).named_steps["preprocess"]
+	_SEARCH_STATE.update(
+		preprocess=preprocess,
+		encoded_train=preprocess.fit_transform(X_train),
+		encoded_test=preprocess.transform(X_test),
+		y_train=np.asarray(y_train),
+		y_test=np.asarray(y_test),
+		X_single=_single_request_frame(X_test),
+		seed=seed,
+		deadline=deadline,
+		latency_budget_ms=latency_budget_ms,
+	)
+	# The same rows are refitted on every warm start, so "balanced" class weights stay valid.
+	warnings.filterwarnings("ignore", message=".*class_weight presets.*warm_start.*")
+
+
+def _search_configuration(config: Dict[str, object], tree_counts: Sequence[int]) -> Dict[str, object]:
+	"""Grow one configuration through ``tree_counts`` and score every step (runs in a worker)."""
+
+	import joblib
+	from sklearn.metrics import accuracy_score, f1_score
+
+	state = _SEARCH_STATE
+	steps: List[Dict[str, object]] = []
+	best_index: Optional[int] = None
+	best_bytes: Optional[bytes] = None
+	if time.time() >= state["deadline"]:
+		return {"config": config, "steps": steps, "best_step": None, "model_bytes": None, "stopped_early": True}
+
+	pipeline = build_pipeline(
+		random_state=state["seed"],
+		n_estimators=tree_counts[0],
+		max_depth=config["max_depth"],
+		min_samples_leaf=config["min_samples_leaf"],
+		max_features=config["max_features"],
+	)
+	pipeline.set_params(preprocess=state["preprocess"], model__warm_start=True, model__n_jobs=1)
+	model = pipeline.named_steps["model"]
+	X_single = state["X_single"]
+	budget = state["latency_budget_ms"]
+
+	fit_seconds = 0.0
+	stopped_early = False
+	for n_trees in tree_counts:
+		if steps and time.time() >= state["deadline"]:
+			stopped_early = True
+			break
+		started = time.perf_counter()
+		model.set_params(n_estimators=n_trees)
+		model.fit(state["encoded_train"], state["y_train"])  # warm start: only the new trees are grown
+		fit_seconds += time.perf_counter() - started
+
+		predictions = model.predict(state["encoded_test"])
+		buffer = io.BytesIO()
+		joblib.dump(pipeline, buffer)
+		step = {
+			"n_estimators": n_trees,
+			"test_f1": float(f1_score(state["y_test"], predictions, zero_division=0)),
+			"test_accuracy": float(accuracy_score(state["y_test"], predictions)),
+			"artifact_bytes": buffer.getbuffer().nbytes,
+			"latency_ms": request_latency(pipeline, X_single, SEARCH_LATENCY_REPEAT),
+			"fit_seconds": round(fit_seconds, 3),
+		}
+		steps.append(step)
+		if _search_eligible(step, budget) and (
+			best_index is None or _search_rank(step) > _search_rank(steps[best_index])
+		):
+			best_index, best_bytes = len(steps) - 1, buffer.getvalue()
+
+	return {
+		"config": config,
+		"steps": steps,
+		"best_step": best_index,
+		"model_bytes": best_bytes,
+		"stopped_early": stopped_early,
+	}
+
+
+def _search_eligible(entry: Dict[str, object], latency_budget_ms: Optional[float]) -> bool:
+	return latency_budget_ms is None or serving_latency(entry["latency_ms"]) <= latency_budget_ms
+
+
+def _search_rank(entry: Dict[str, object]) -> Tuple[float, int]:
+	# Highest test F1 wins; a smaller artifact breaks ties.
+	return (entry["test_f1"], -entry["artifact_bytes"])
+
+
+def search_forest(
+	X_train: pd.DataFrame,
+	X_test: pd.DataFrame,
+	y_train: pd.Series,
+	y_test: pd.Series,
+	args: argparse.Namespace,
+) -> Tuple[Pipeline, Dict[str, object]]:
+	"""Search forest parameters in a process pool and return the best pipeline with a report.
+
+	Each configuration from :func:`search_grid` runs in one worker, which grows
+	it through ``--search-trees`` with warm starts (only the added trees are
+	fitted) and scores every step on the holdout. Workers stop growing once
+	``--search-budget-seconds`` has passed; configurations not started by then
+	are skipped. The winner has the best test F1 (ties: smaller artifact)
+	among steps whose serving latency is within ``--latency-budget-ms`` when
+	one is given.
+	"""
+
+	import joblib
+
+	grid = search_grid(
+		args.search_depths,
+		args.search_min_leaf,
+		args.search_max_features,
+		samples=args.search_samples,
+		seed=args.seed,
+	)
+	tree_counts = sorted(set(args.search_trees))
+	workers = max(1, min(args.search_workers or os.cpu_count() or 1, len(grid)))
+	started = time.perf_counter()
+	deadline = time.time() + args.search_budget_seconds
+
+	with ProcessPoolExecutor(
+		max_workers=workers,
+		initializer=_init_search_worker,
+		initargs=(X_train, X_test, y_train, y_test, args.seed, deadline, args.latency_budget_ms),
+	) as executor:
+		futures = [executor.submit(_search_configuration, config, tree_counts) for config in grid]
+		_, pending = wait(futures, timeout=max(0.0, deadline - time.time()))
+		for future in pending:
+			future.cancel()  # running configurations stop at their next growth step
+		results = [future.result() for future in futures if not future.cancelled()]
+
+	leaderboard: List[Dict[str, object]] = []
+	best: Optional[Tuple[Dict[str, object], bytes]] = None
+	for result in results:
+		for step in result["steps"]:
+			leaderboard.append({**result["config"], **step})
+		if result["best_step"] is not None:
+			entry = {**result["config"], **result["steps"][result["best_step"]]}
+			if best is None or _search_rank(entry) > _search_rank(best[0]):
+				best = (entry, result["model_bytes"])
+	if best is None:
+		raise RuntimeError(
+			"The search produced no forest within the time and latency budgets; "
+			"raise --search-budget-seconds or --latency-budget-ms."
+		)
+
+	leaderboard.sort(key=_search_rank, reverse=True)
+	pipeline = joblib.load(io.BytesIO(best[1]))
+	pipeline.named_steps["model"].set_params(warm_start=False, n_jobs=-1)
+
+	report = {
+		"configurations": len(grid),
+		"completed": sum(1 for result in results if result["steps"] and not result["stopped_early"]),
+		"stopped_early": sum(1 for result in results if result["steps"] and result["stopped_early"]),
+		"skipped": len(grid) - sum(1 for result in results if result["steps"]),
+		"tree_counts": tree_counts,
+		"workers": workers,
+		"budget_seconds": args.search_budget_seconds,
+		"elapsed_seconds": round(time.perf_counter() - started, 2),
+		"latency_budget_ms": args.latency_budget_ms,
+		"latency_note": "median single-request latency, timed while other workers were busy",
+		"best": best[0],
+		"leaderboard": leaderboard,
+	}
+	return pipeline, report
+
+
+def latest_model_path(save_dir: Path) -> Optional[Path]:
+	"""Newest ``random_forest_recommendation_*.joblib`` in ``save_dir``, as the API picks it."""
+
+	candidates = sorted(save_dir.glob("random_forest_recommendation_*.joblib"))
+	return candidates[-1] if candidates else None
+
+
+def fetch_new_years(conn: PGConnection, after_year: int) -> List[int]:
+	"""Years after ``after_year`` that have approved yield records."""
+
+	sql = """
+		SELECT DISTINCT year
+		FROM barangay_yields
+		WHERE status = 'approved'
+		  AND year > %s
+		ORDER BY year
+	"""
+
+	with conn.cursor() as cursor:
+		cursor.execute(sql, (after_year,))
+		return [int(row[0]) for row in cursor.fetchall()]
+
+
+def grow_forest(
+	pipeline: Pipeline,
+	X_new: pd.DataFrame,
+	y_new: pd.Series,
+	add_trees: int,
+	retire_trees: int,
+	random_state: int,
+) -> Pipeline:
+	"""Return a pipeline whose forest gains ``add_trees`` trees fitted on the new rows and loses its ``retire_trees`` oldest.
+
+	The preprocessing stays as fitted, so the existing trees keep their input
+	layout; categories it has not seen encode as all zeros, as they do when
+	serving. ``pipeline`` itself is left unchanged.
+	"""
+
+	from sklearn.pipeline import Pipeline
+
+	preprocess = pipeline.named_steps["preprocess"]
+	forest = copy.copy(pipeline.named_steps["model"])
+	forest.estimators_ = list(forest.estimators_)  # warm start extends this list in place
+	if set(np.unique(y_new)) != set(forest.classes_.tolist()):
+		raise RuntimeError("The new rows must contain every label the model was trained on.")
+	if not 0 <= retire_trees <= len(forest.estimators_):
+		raise ValueError(f"Cannot retire {retire_trees} of {len(forest.estimators_)} trees.")
+
+	forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + add_trees, random_state=random_state)
+	with warnings.catch_warnings():
+		# "balanced" weights are computed from the new rows, which is what the new trees should see.
+		warnings.filterwarnings("ignore", message=".*class_weight presets.*warm_start.*")
+		forest.fit(preprocess.transform(X_new), np.asarray(y_new))
+
+	forest.estimators_ = forest.estimators_[retire_trees:]
+	forest.set_params(warm_start=False, n_estimators=len(forest.estimators_))
+	return Pipeline([("preprocess", preprocess), ("model", forest)])
+
+
+def _retire_tree_generations(generations: List[Dict[str, object]], retire_trees: int) -> List[Dict[str, object]]:
+	# Trees are retired oldest first, i.e. from the front of the forest.
+	remaining: List[Dict[str, object]] = []
+	for generation in generations:
+		retired = min(generation["trees"], retire_trees)
+		retire_trees -= retired
+		if generation["trees"] > retired:
+			remaining.append({**generation, "trees": generation["trees"] - retired})
+	return remaining
+
+
+def update_incrementally(args: argparse.Namespace, profiler: StageProfiler, timestamp: str) -> Optional[TrainingArtifacts]:
+	"""Grow the base artifact with trees fitted on the years it has not seen; ``None`` when there are none."""
+
+	import joblib
+	from sklearn.model_selection import train_test_split
+
+	base_path = args.base_model or latest_model_path(args.save_dir)
+	if base_path is None or not base_path.is_file():
+		raise SystemExit(f"No model to update in {args.save_dir}; train one first or pass --base-model.")
+	with base_path.with_suffix(".json").open("r", encoding="utf-8") as f:
+		base_metadata = json.load(f)
+	known_years = base_metadata.get("training", {}).get("data_years")
+	if args.new_years is None and not known_years:
+		raise SystemExit(f"{base_path.name} does not record training.data_years; pass --new-years.")
+
+	with profiler.stage("load_base"):
+		base = joblib.load(base_path)
+	base_trees = len(base.named_steps["model"].estimators_)
+
+	with profiler.stage("fetch"), get_connection(resolve_db_config(args)) as conn:
+		new_years = sorted(args.new_years) if args.new_years is not None else fetch_new_years(conn, max(known_years))
+		raw_df = fetch_training_frame(conn, min(new_years), years=new_years) if new_years else None
+	if raw_df is None or raw_df.empty:
+		print(f"No new approved years since {base_path.name}; nothing to update.")
+		return None
+
+	with profiler.stage("engineer_features"):
+		engineered_df = engineer_features(raw_df, copy=False)
+	with profiler.stage("label_best_crops"):
+		labeled_df = label_best_crops(engineered_df)
+
+	feature_columns = list(base_metadata["training"]["features"])
+	with profiler.stage("split"):
+		fit_df, holdout_df = train_test_split(
+			labeled_df,
+			test_size=args.incremental_holdout,
+			stratify=labeled_df["is_top_crop"] if labeled_df["is_top_crop"].nunique() > 1 else None,
+			random_state=args.seed,
+		)
+		X_fit, y_fit = fit_df[feature_columns], fit_df["is_top_crop"]
+		X_holdout, y_holdout = holdout_df[feature_columns], holdout_df["is_top_crop"]
+
+	lineage = copy.deepcopy(base_metadata.get("lineage")) or {
+		"generation": 0,
+		"root_model": base_path.name,
+		"history": [],
+		"tree_generations": [{"generation": 0, "years": known_years or [], "trees": base_trees}],
+	}
+	generation = int(lineage["generation"]) + 1
+	# A fresh seed per generation: warm start seeds new trees by their position in
+	# the forest, which repeats once older trees have been retired.
+	random_state = args.seed + generation
+
+	with profiler.stage("fit", profile_path=args.fit_profile_path):
+		pipeline = grow_forest(base, X_fit, y_fit, args.add_trees, args.retire_trees, random_state)
+
+	with profiler.stage("evaluate_train"):
+		train_metrics = evaluate_model(pipeline, X_fit, y_fit)
+	with profiler.stage("evaluate_test"):
+		base_metrics = evaluate_model(base, X_holdout, y_holdout)
+		test_metrics = evaluate_model(pipeline, X_holdout, y_holdout)
+
+	recommendation_columns = list(dict.fromkeys(feature_columns + ["barangay_name", "crop_name", "expected_revenue"]))
+	with profiler.stage("recommendations"):
+		recommendation_view = labeled_df[recommendation_columns].drop_duplicates().reset_index(drop=True)
+		recommendations = generate_recommendations(pipeline, recommendation_view, feature_columns)
+	profile_report = profiler.report()
+	profile_report["fit_cprofile"] = args.fit_profile_path.name if args.fit_profile_path is not None else None
+	profiler.stop()
+
+	lineage["history"].append(
+		{
+			"generation": generation,
+			"parent_model": base_path.name,
+			"new_years": new_years,
+			"fit_rows": int(len(X_fit)),
+			"holdout_rows": int(len(X_holdout)),
+			"added_trees": args.add_trees,
+			"retired_trees": args.retire_trees,
+			"trees_before": base_trees,
+			"trees_after": len(pipeline.named_steps["model"].estimators_),
+			"random_state": random_state,
+			"holdout_f1_before": base_metrics["f1"],
+			"holdout_f1_after": test_metrics["f1"],
+			"fit_seconds": profile_report["stages"]["fit"]["wall_seconds"],
+			"generated_at_utc": datetime.now(timezone.utc).isoformat(),
+		}
+	)
+	lineage["tree_generations"] = _retire_tree_generations(lineage["tree_generations"], args.retire_trees)
+	lineage["tree_generations"].append({"generation": generation, "years": new_years, "trees": args.add_trees})
+	lineage.update(generation=generation, parent_model=base_path.name)
+
+	metadata = copy.deepcopy(base_metadata)
+	metadata.pop("search", None)  # describes the parent's search, kept in its own metadata
+	metadata["generated_at_utc"] = datetime.now(timezone.utc).isoformat()
+	metadata["parameters"]["n_estimators"] = len(pipeline.named_steps["model"].estimators_)
+	metadata["training"].update(
+		records=int(len(labeled_df)),
+		frame_cache=None,
+		data_years=sorted(set(known_years or []) | set(new_years)),
+		train_metrics=train_metrics,
+		test_metrics=test_metrics,
+	)
+	metadata["recommendations_preview"] = recommendations
+	metadata["profile"] = profile_report
+	metadata["lineage"] = lineage
+
+	artifacts = persist_artifacts(pipeline, metadata, args.save_dir, timestamp=timestamp)
+	print(f"Incremental update of {base_path.name} (generation {generation}).")
+	print(f"Model saved to: {artifacts.model_path}")
+	print(f"Metadata saved to: {artifacts.metadata_path}")
+	print("New years {}: {} fit rows, {} holdout rows; trees {} -> {} (+{}, -{}).".format(
+		new_years, len(X_fit), len(X_holdout), base_trees, metadata["parameters"]["n_estimators"], args.add_trees, args.retire_trees
+	))
+	print("Holdout F1: {:.3f} before, {:.3f} after | fit {:.2f}s".format(
+		base_metrics["f1"], test_metrics["f1"], profile_report["stages"]["fit"]["wall_seconds"]
+	))
+	return artifacts
+
+
+def _int_list(value: str) -> List[int]:
+	return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _depth_list(value: str) -> List[Optional[int]]:
+	return [None if item.strip().lower() == "none" else int(item) for item in value.split(",") if item.strip()]
+
+
+def _max_features_list(value: str) -> List[Union[str, float, None]]:
+	options: List[Union[str, float, None]] = []
+	for item in (item.strip().lower() for item in value.split(",")):
+		if item in ("sqrt", "log2"):
+			options.append(item)
+		elif item == "none":
+			options.append(None)
+		elif item:
+			options.append(float(item))
+	return options
+
+
 def parse_args() -> argparse.Namespace:
 	parser = argparse.ArgumentParser(description="Train Random Forest crop recommendations.")
 	parser.add_argument("--years", type=int, default=5, help="Number of most recent years to include (minimum 2).")
@@ -380,6 +1282,30 @@ def parse_args() -> argparse.Namespace:
 	parser.add_argument("--database", type=str, default=None, help="PostgreSQL database name override.")
 	parser.add_argument("--user", type=str, default=None, help="PostgreSQL user override.")
 	parser.add_argument("--password", type=str, default=None, help="PostgreSQL password override.")
+	parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Training frame cache directory.")
+	parser.add_argument("--no-cache", action="store_true", help="Query the database without the training frame cache.")
+	parser.add_argument("--refresh-cache", action="store_true", help="Re-fetch every cached year partition.")
+	parser.add_argument("--compact", action="store_true", help="Also write compacted variants and a size/latency/F1 report.")
+	parser.add_argument("--compact-depths", type=_int_list, default=[8, 12], help="Comma-separated depth caps to try.")
+	parser.add_argument("--compact-min-leaf", type=_int_list, default=[5], help="Comma-separated minimum leaf sizes to try.")
+	parser.add_argument("--compact-tolerance", type=float, default=0.01, help="Holdout F1 a truncated forest may give up.")
+	parser.add_argument("--latency-budget-ms", type=float, default=None, help="Recommend the best variant within this latency.")
+	parser.add_argument("--search", action="store_true", help="Search forest parameters instead of fitting one configuration.")
+	parser.add_argument("--search-depths", type=_depth_list, default=[None, 8, 12, 16], help="Comma-separated depth caps ('none' for unlimited).")
+	parser.add_argument("--search-min-leaf", type=_int_list, default=[1, 2, 5], help="Comma-separated minimum leaf sizes.")
+	parser.add_argument("--search-max-features", type=_max_features_list, default=["sqrt", 0.5], help="Comma-separated max_features values (sqrt, log2, none or a fraction).")
+	parser.add_argument("--search-trees", type=_int_list, default=[25, 50, 100, 200, 300], help="Tree counts each configuration grows through.")
+	parser.add_argument("--search-samples", type=int, default=None, help="Evaluate this many random configurations instead of the full grid.")
+	parser.add_argument("--search-budget-seconds", type=float, default=300.0, help="Wall-clock budget for the search.")
+	parser.add_argument("--search-workers", type=int, default=None, help="Worker processes (default: CPU count).")
+	parser.add_argument("--incremental", action="store_true", help="Grow the newest model with trees fitted on years it has not seen.")
+	parser.add_argument("--base-model", type=Path, default=None, help="Artifact to update with --incremental (default: newest in --save-dir).")
+	parser.add_argument("--add-trees", type=int, default=50, help="Trees fitted on the new years with --incremental.")
+	parser.add_argument("--retire-trees", type=int, default=0, help="Oldest trees dropped with --incremental.")
+	parser.add_argument("--new-years", type=_int_list, default=None, help="Years to fit with --incremental (default: years after the base model's data).")
+	parser.add_argument("--incremental-holdout", type=float, default=0.2, help="Share of the new rows held out for evaluation.")
+	parser.add_argument("--profile", action="store_true", help="Dump a cProfile of the fit stage to <model>.fit.prof.")
+	parser.add_argument("--trace-memory", action="store_true", help="Add tracemalloc peaks to the stage profile (slows the run).")
 	return parser.parse_args()
 
 
@@ -390,26 +1316,61 @@ def main() -> None:
 		raise SystemExit("--years must be at least 2 to create meaningful train/test splits.")
 
 	db_config = resolve_db_config(args)
+	if args.incremental and (args.search or args.compact):
+		raise SystemExit("--incremental cannot be combined with --search or --compact.")
+
+	timestamp = artifact_timestamp()
+	fit_profile_path = args.save_dir / f"random_forest_recommendation_{timestamp}.fit.prof" if args.profile else None
+	args.fit_profile_path = fit_profile_path
+	profiler = StageProfiler(trace_memory=args.trace_memory)
+
+	with profiler.stage("import_sklearn"):
+		# The helpers import sklearn lazily; doing it here keeps the import out of the fit timing.
+		import sklearn.compose  # noqa: F401
+		import sklearn.ensemble  # noqa: F401
+		import sklearn.metrics  # noqa: F401
+		import sklearn.model_selection  # noqa: F401
+
+	if args.incremental:
+		update_incrementally(args, profiler, timestamp)
+		return
 
-	with get_connection(db_config) as conn:
+	with profiler.stage("fetch"), get_connection(db_config) as conn:
 		min_year = determine_year_threshold(conn, args.years)
-		raw_df = fetch_training_frame(conn, min_year)
-
-	engineered_df = engineer_features(raw_df)
-	labeled_df = label_best_crops(engineered_df)
-
-	X_train, X_test, y_train, y_test = split_datasets(labeled_df, random_state=args.seed)
+		raw_df, cache_report = load_training_frame(
+			conn,
+			min_year,
+			None if args.no_cache else args.cache_dir,
+			refresh=args.refresh_cache,
+		)
 
-	pipeline = build_pipeline(
-		random_state=args.seed,
-		n_estimators=args.n_estimators,
-		max_depth=args.max_depth,
-	)
+	with profiler.stage("engineer_features"):
+		engineered_df = engineer_features(raw_df, copy=False)
+	with profiler.stage("label_best_crops"):
+		labeled_df = label_best_crops(engineered_df)
+
+	with profiler.stage("split"):
+		X_train, X_test, y_train, y_test = split_datasets(labeled_df, random_state=args.seed)
+
+	search_report = None
+	with profiler.stage("fit", profile_path=fit_profile_path):
+		if args.search:
+			pipeline, search_report = search_forest(X_train, X_test, y_train, y_test, args)
+			args.n_estimators = search_report["best"]["n_estimators"]
+			args.max_depth = search_report["best"]["max_depth"]
+		else:
+			pipeline = build_pipeline(
+				random_state=args.seed,
+				n_estimators=args.n_estimators,
+				max_depth=args.max_depth,
+			)
 
-	pipeline.fit(X_train, y_train)
+			pipeline.fit(X_train, y_train)
 
-	train_metrics = evaluate_model(pipeline, X_train, y_train)
-	test_metrics = evaluate_model(pipeline, X_test, y_test)
+	with profiler.stage("evaluate_train"):
+		train_metrics = evaluate_model(pipeline, X_train, y_train)
+	with profiler.stage("evaluate_test"):
+		test_metrics = evaluate_model(pipeline, X_test, y_test)
 
 	feature_columns = X_train.columns.tolist()
 	recommendation_columns = list(dict.fromkeys(feature_columns + [
@@ -418,13 +1379,17 @@ def main() -> None:
 		"expected_revenue",
 	]))
 
-	recommendation_view = labeled_df[recommendation_columns].drop_duplicates().reset_index(drop=True)
+	with profiler.stage("recommendations"):
+		recommendation_view = labeled_df[recommendation_columns].drop_duplicates().reset_index(drop=True)
 
-	recommendations = generate_recommendations(
-		pipeline,
-		recommendation_view,
-		feature_columns,
-	)
+		recommendations = generate_recommendations(
+			pipeline,
+			recommendation_view,
+			feature_columns,
+		)
+	profile_report = profiler.report()
+	profile_report["fit_cprofile"] = fit_profile_path.name if fit_profile_path is not None else None
+	profiler.stop()
 
 	metadata = {
 		"generated_at_utc": datetime.now(timezone.utc).isoformat(),
@@ -436,14 +1401,23 @@ def main() -> None:
 		},
 		"training": {
 			"records": int(len(labeled_df)),
+			"frame_cache": cache_report,
+			"data_years": sorted(int(year) for year in labeled_df["year"].unique()),
 			"features": feature_columns,
 			"train_metrics": train_metrics,
 			"test_metrics": test_metrics,
 		},
 		"recommendations_preview": recommendations,
+		"profile": profile_report,
 	}
+	if search_report is not None:
+		metadata["parameters"].update(
+			min_samples_leaf=search_report["best"]["min_samples_leaf"],
+			max_features=search_report["best"]["max_features"],
+		)
+		metadata["search"] = search_report
 
-	artifacts = persist_artifacts(pipeline, metadata, args.save_dir)
+	artifacts = persist_artifacts(pipeline, metadata, args.save_dir, timestamp=timestamp)
 
 	print("Training complete.")
 	print(f"Model saved to: {artifacts.model_path}")
@@ -451,6 +1425,59 @@ def main() -> None:
 	print("Test accuracy: {:.3f} | Test F1: {:.3f}".format(
 		test_metrics["accuracy"], test_metrics["f1"]
 	))
+	print("{:<18} {:>9} {:>9} {:>9} {:>12} {:>14}".format("stage", "wall_s", "cpu_s", "child_s", "peak_rss_mb", "peak_traced_mb"))
+	for stage, stats in profile_report["stages"].items():
+		print("{:<18} {:>9.3f} {:>9.3f} {:>9} {:>12} {:>14}".format(
+			stage,
+			stats["wall_seconds"],
+			stats["cpu_seconds"],
+			"-" if stats["child_cpu_seconds"] is None else f"{stats['child_cpu_seconds']:.3f}",
+			"-" if stats["peak_rss_mb"] is None else f"{stats['peak_rss_mb']:.1f}",
+			f"{stats['peak_traced_mb']:.1f}" if "peak_traced_mb" in stats else "-",
+		))
+	if fit_profile_path is not None:
+		print(f"Fit profile saved to: {fit_profile_path}")
+
+	if search_report is not None:
+		print("Search: {completed} configurations completed, {stopped_early} stopped early, {skipped} skipped in {elapsed_seconds}s.".format(**search_report))
+		print("{:>6} {:>6} {:>8} {:>6} {:>8} {:>10} {:>10}".format("depth", "leaf", "features", "trees", "test_f1", "size_kb", "serving_ms"))
+		for entry in search_report["leaderboard"][:10]:
+			print("{:>6} {:>6} {:>8} {:>6} {:>8.3f} {:>10.1f} {:>10.3f}".format(
+				"none" if entry["max_depth"] is None else entry["max_depth"],
+				entry["min_samples_leaf"],
+				str(entry["max_features"]),
+				entry["n_estimators"],
+				entry["test_f1"],
+				entry["artifact_bytes"] / 1024,
+				serving_latency(entry["latency_ms"]),
+			))
+
+	if args.compact:
+		report_path, report = compact_model(
+			pipeline,
+			metadata,
+			artifacts,
+			X_train,
+			X_test,
+			y_train,
+			y_test,
+			recommendation_view,
+			args,
+		)
+		print(f"Compaction report saved to: {report_path}")
+		print("{:<32} {:>10} {:>8} {:>10} {:>12} {:>8}".format("variant", "size_kb", "load_s", "sklearn_ms", "compiled_ms", "test_f1"))
+		for variant in report["variants"]:
+			latency = variant["latency_ms"]
+			print("{:<32} {:>10.1f} {:>8.3f} {:>10.2f} {:>12} {:>8.3f}".format(
+				variant["variant"],
+				variant["artifact_bytes"] / 1024,
+				variant["load_seconds"],
+				latency["sklearn"],
+				"-" if latency["compiled"] is None else f"{latency['compiled']:.3f}",
+				variant["test_f1"],
+			))
+		if report["recommended"]:
+			print(f"Best variant within {args.latency_budget_ms} ms: {report['recommended']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+"""Local, year-partitioned cache of the raw training frame.
+
+``fetch_training_frame`` joins and aggregates every approved yield and price
+row of the last N years on each training or export run, although past years
+almost never change. The cache keeps one Parquet file per year under
+``<directory>/year=<year>/`` plus a ``manifest.json`` with a watermark per
+partition:
+
+* A watermark is the approved row count and an order-independent sum of row
+  hashes of ``barangay_yields`` and ``barangay_crop_prices`` for that year,
+  plus a hash of the barangay and crop names. The watermarks of all years
+  come from one scan without joins or per-group averages, so checking them is
+  far cheaper than the training query.
+* :meth:`TrainingFrameCache.load` re-fetches (with one query) only the years
+  whose watermark changed or whose file is missing. It drops partitions of
+  years that no longer have approved data, and returns the concatenated
+  frame in the training query's row order.
+* Changing ``CACHE_FORMAT_VERSION`` (for example after the training query
+  or its dtypes change) invalidates every partition.
+* Categorical columns stay categorical: the manifest lists them (Parquet
+  reads integer categoricals back as plain integers), and their categories
+  are unioned across partitions before concatenation.
+
+Writing Parquet needs ``pyarrow`` (or ``fastparquet``); without it
+:attr:`TrainingFrameCache.available` is false and callers query the database
+directly.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+try:  # Parquet engine; pandas picks pyarrow or fastparquet
+    import pyarrow  # noqa: F401
+
+    PARQUET_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import fastparquet  # noqa: F401
+
+        PARQUET_AVAILABLE = True
+    except ImportError:
+        PARQUET_AVAILABLE = False
+
+CACHE_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
+PARTITION_WATERMARK_QUERY = """
+    WITH yield_marks AS (
+        SELECT
+            year,
+            COUNT(*) AS row_count,
+            SUM(hashtext(concat_ws('|', yield_id, barangay_id, crop_id, season,
+                total_yield, total_area_planted_ha, yield_per_hectare))::bigint) AS row_hash
+        FROM barangay_yields
+        WHERE status = 'approved'
+          AND year >= %(min_year)s
+        GROUP BY year
+    ), price_marks AS (
+        SELECT
+            year,
+            COUNT(*) AS row_count,
+            SUM(hashtext(concat_ws('|', price_id, barangay_id, crop_id, month, price_per_kg))::bigint) AS row_hash
+        FROM barangay_crop_prices
+        WHERE status = 'approved'
+          AND year >= %(min_year)s
+        GROUP BY year
+    ), names AS (
+        SELECT md5(
+            COALESCE((SELECT string_agg(barangay_id || ':' || COALESCE(adm3_en, ''), ',' ORDER BY barangay_id)
+                      FROM barangays), '')
+            || '/' ||
+            COALESCE((SELECT string_agg(crop_id || ':' || COALESCE(crop_name, ''), ',' ORDER BY crop_id)
+                      FROM crops), '')
+        ) AS names_hash
+    )
+    SELECT
+        y.year,
+        CONCAT_WS(':', y.row_count, y.row_hash, COALESCE(p.row_count, 0), COALESCE(p.row_hash, 0), n.names_hash)
+    FROM yield_marks y
+    LEFT JOIN price_marks p USING (year)
+    CROSS JOIN names n
+    ORDER BY y.year
+"""
+
+
+def fetch_partition_watermarks(conn, min_year: int) -> Dict[int, str]:
+    """Watermark of every year ``>= min_year`` that has approved yield rows.
+
+    Years with prices but no yields are skipped: the training frame has no
+    rows for them.
+    """
+
+    with conn.cursor() as cursor:
+        cursor.execute(PARTITION_WATERMARK_QUERY, {"min_year": min_year})
+        return {int(year): str(watermark) for year, watermark in cursor.fetchall()}
+
+
+def _concat_partitions(frames: List[pd.DataFrame], categorical: Sequence[str]) -> pd.DataFrame:
+    # pd.concat turns categoricals with differing categories into object columns.
+    if not frames:
+        return pd.DataFrame()
+    for column in categorical:
+        for frame in frames:
+            if not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype("category")
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[column].cat.categories)
+        dtype = pd.CategoricalDtype(categories)
+        for frame in frames:
+            frame[column] = frame[column].astype(dtype)
+    return pd.concat(frames, ignore_index=True)
+
+
+class TrainingFrameCache:
+    """Parquet partitions of the training frame, refreshed per year by watermark."""
+
+    def __init__(self, directory: Path, fetch: Callable[..., pd.DataFrame]) -> None:
+        """``fetch(conn, min_year, years=[...])`` returns the training frame rows of ``years``."""
+
+        self.directory = Path(directory)
+        self._fetch = fetch
+
+    @property
+    def available(self) -> bool:
+        return PARQUET_AVAILABLE
+
+    def _partition_path(self, year: int) -> Path:
+        return self.directory / f"year={year}" / "part.parquet"
+
+    def _read_manifest(self) -> Dict[str, object]:
+        path = self.directory / MANIFEST_NAME
+        try:
+            with path.open("r", encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return {"format_version": CACHE_FORMAT_VERSION, "partitions": {}}
+        if manifest.get("format_version") != CACHE_FORMAT_VERSION:
+            return {"format_version": CACHE_FORMAT_VERSION, "partitions": {}}
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, object]) -> None:
+        path = self.directory / MANIFEST_NAME
+        tmp_path = path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _write_partition(self, year: int, frame: pd.DataFrame) -> None:
+        path = self._partition_path(year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def load(self, conn, min_year: int) -> Tuple[pd.DataFrame, Dict[str, object]]:
+        """Return the training frame for years ``>= min_year`` and a report of the cache work."""
+
+        if not self.available:
+            raise RuntimeError("Caching the training frame needs pyarrow or fastparquet.")
+
+        started = time.perf_counter()
+        watermarks = fetch_partition_watermarks(conn, min_year)
+        checked = time.perf_counter()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        partitions: Dict[str, Dict[str, object]] = manifest.setdefault("partitions", {})
+        stale: List[int] = [
+            year
+            for year, watermark in watermarks.items()
+            if partitions.get(str(year), {}).get("watermark") != watermark or not self._partition_path(year).is_file()
+        ]
+
+        if stale:
+            fetched = self._fetch(conn, min_year, years=stale)
+            now = datetime.now(timezone.utc).isoformat()
+            manifest["categorical_columns"] = [
+                str(column) for column, dtype in fetched.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+            ]
+            for year in stale:
+                rows = fetched[fetched["year"] == year].reset_index(drop=True)
+                self._write_partition(year, rows)
+                partitions[str(year)] = {"watermark": watermarks[year], "rows": int(len(rows)), "fetched_at": now}
+        fetched_at = time.perf_counter()
+
+        dropped = [int(year) for year in partitions if int(year) >= min_year and int(year) not in watermarks]
+        for year in dropped:
+            shutil.rmtree(self._partition_path(year).parent, ignore_errors=True)
+            partitions.pop(str(year), None)
+        if stale or dropped:
+            self._write_manifest(manifest)
+
+        frames = [pd.read_parquet(self._partition_path(year)) for year in sorted(watermarks)]
+        frame = _concat_partitions(frames, manifest.get("categorical_columns", []))
+        finished = time.perf_counter()
+
+        report = {
+            "directory": str(self.directory),
+            "years": sorted(watermarks),
+            "reused": sorted(set(watermarks) - set(stale)),
+            "fetched": sorted(stale),
+            "dropped": sorted(dropped),
+            "rows": int(len(frame)),
+            "watermark_seconds": round(checked - started, 4),
+            "fetch_seconds": round(fetched_at - checked, 4),
+            "read_seconds": round(finished - fetched_at, 4),
+        }
+        return frame, report
+
+    def clear(self, years: Optional[Sequence[int]] = None) -> None:
+        """Forget ``years`` (default: every partition) so the next load fetches them again."""
+
+        manifest = self._read_manifest()
+        partitions = manifest.setdefault("partitions", {})
+        for year in list(partitions) if years is None else [str(year) for year in years]:
+            shutil.rmtree(self._partition_path(int(year)).parent, ignore_errors=True)
+            partitions.pop(year, None)
+        if self.directory.exists():
+            self._write_manifest(manifest)